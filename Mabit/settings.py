@@ -75,13 +75,77 @@ WSGI_APPLICATION = 'Mabit.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+# DB_ENGINE=sqlite (default) or postgresql; the scraper threads and the analysis service
+# write concurrently, so both backends are tuned for that.
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite').lower()
+
+# SQLite tuning (also applied to the benchmarks' scratch databases)
+SQLITE_BUSY_TIMEOUT = float(os.environ.get('DB_BUSY_TIMEOUT', '20'))  # seconds to wait for the write lock
+# worker threads keep their connection between jobs (close_old_connections)
+SQLITE_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', '600'))
+SQLITE_OPTIONS = {
+    # WAL: readers never block the writer; NORMAL sync is safe with WAL
+    'init_command': (
+        'PRAGMA journal_mode=WAL;'
+        'PRAGMA synchronous=NORMAL;'
+        f'PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT * 1000)}'
+    ),
+    'timeout': SQLITE_BUSY_TIMEOUT,
+    # take the write lock at BEGIN: a DEFERRED transaction that later writes
+    # fails with "database is locked" instead of waiting out busy_timeout
+    'transaction_mode': 'IMMEDIATE',
 }
 
+if DB_ENGINE in ('postgres', 'postgresql'):
+    # Django's psycopg pool (pip install "psycopg[pool]"); connections go back to the
+    # pool on close, so CONN_MAX_AGE must stay 0
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'mabit'),
+            'USER': os.environ.get('DB_USER', 'mabit'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('DB_POOL_MIN', '2')),
+                    'max_size': int(os.environ.get('DB_POOL_MAX', '20')),  # >= scraper + download workers
+                    'timeout': float(os.environ.get('DB_POOL_TIMEOUT', '30')),
+                },
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': SQLITE_CONN_MAX_AGE,
+            'OPTIONS': SQLITE_OPTIONS,
+        }
+    }
+
+# Cache
+# The stats API is invalidated by writes from the scraper / analysis processes, so the
+# default cache must be shared between processes: file-based (no external service).
+# CACHE_BACKEND=locmem keeps it in-process (single-process dev / tests).
+if os.environ.get('CACHE_BACKEND', 'file') == 'locmem':
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR', os.path.join(BASE_DIR, '.cache')),
+            'OPTIONS': {'MAX_ENTRIES': 2000},
+        }
+    }
+
+# Seconds a cached stats response may be served: bounds the staleness of time-based
+# numbers (last 24h, today's series) when nothing is written
+STATS_CACHE_SECONDS = int(os.environ.get('STATS_CACHE_SECONDS', '60'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -128,4 +192,19 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'instagram_scraper', 'media')
 # Tor Control Configuration
 # Set TOR_CONTROL_PASSWORD environment variable, or set it here directly
 # For security, prefer using environment variable: set TOR_CONTROL_PASSWORD=yourpassword
-TOR_CONTROL_PASSWORD = os.environ.get('TOR_CONTROL_PASSWORD', 'yourpassword')
\ No newline at end of file
+TOR_CONTROL_PASSWORD = os.environ.get('TOR_CONTROL_PASSWORD', 'yourpassword')
+
+# Prometheus text written by scrape_users / scrape_daemon --metrics-file, served at /scraper/metrics/
+SCRAPER_METRICS_FILE = os.environ.get('SCRAPER_METRICS_FILE', os.path.join(BASE_DIR, 'scraper_metrics.prom'))
+
+# Story retention, applied by `manage.py apply_retention` (see instagram_scraper/services/retention.py).
+# Each policy picks stories older than `older_than_days`, optionally only `analyzed` and/or
+# `interesting` (True/False) ones, and applies `action`:
+#   archive      - move the media into zip files under STORY_ARCHIVE_ROOT, keep row + thumbnail
+#   delete_media - delete the media, keep row + thumbnail
+#   delete       - delete the rows (hits, caption index and media references go with them)
+STORY_RETENTION_POLICIES = [
+    {'name': 'archive-uninteresting', 'older_than_days': 30, 'analyzed': True, 'interesting': False, 'action': 'archive'},
+    {'name': 'archive-old', 'older_than_days': 180, 'analyzed': True, 'action': 'archive'},
+]
+STORY_ARCHIVE_ROOT = os.environ.get('STORY_ARCHIVE_ROOT', os.path.join(BASE_DIR, 'archive'))
@@ -15,8 +15,14 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "Mabit.settings")
 import django  # noqa
 django.setup()
 
+from django.db import close_old_connections, transaction  # noqa
 from django.utils import timezone  # noqa
 from instagram_scraper.models import InstagramStory  # noqa
+from instagram_scraper.services.story_hits import replace_story_hits  # noqa
+from instagram_scraper.services.caption_search import index_captions  # noqa
+from instagram_scraper.services.thumbnails import image_thumbnail, save_thumbnail  # noqa
+from instagram_scraper.services.rollups import record_analysis  # noqa
+from instagram_scraper import tracing  # noqa
 
 # -----------------------------
 # Your POC functions (imported)
@@ -45,6 +51,11 @@ MAX_VIDEO_FRAMES = int(os.environ.get("AI_MAX_VIDEO_FRAMES", "60"))
 STATIC_CHECK_SECONDS = int(os.environ.get("AI_STATIC_CHECK_SECONDS", "1"))
 MAX_VIDEO_SECONDS = int(os.environ.get("AI_MAX_VIDEO_SECONDS", "180"))  # 0 = no limit
 
+# Span tracing (Chrome trace JSON); off unless AI_TRACE_FILE is set
+TRACE_FILE = os.environ.get("AI_TRACE_FILE", "").strip()
+TRACE_SAMPLE = float(os.environ.get("AI_TRACE_SAMPLE", "0.05"))
+TRACE_SLOW_SECONDS = float(os.environ["AI_TRACE_SLOW_SECONDS"]) if os.environ.get("AI_TRACE_SLOW_SECONDS") else None
+
 
 # -----------------------------
 # Model init (once)
@@ -52,18 +63,29 @@ MAX_VIDEO_SECONDS = int(os.environ.get("AI_MAX_VIDEO_SECONDS", "180"))  # 0 = no
 IMG2TXT = pipeline("image-to-text", model=CAPTION_MODEL)
 
 
+def caption_frame(path: Path):
+    with tracing.span("caption", file=path.name):
+        return cm.model_generate_caption_and_tags(IMG2TXT, path)
+
+
+def extract_frame(path: Path, out_path: Path, t: int):
+    with tracing.span("extract_frame", t=t):
+        return cm.extract_frame_at_time(path, out_path, t, ffmpeg_path=FFMPEG_PATH)
+
+
 def analyze_image(path: Path) -> Dict[str, Any]:
-    caption, _ = cm.model_generate_caption_and_tags(IMG2TXT, path)
+    caption, _ = caption_frame(path)
     tags = cm.extract_tags_from_text(caption, max_tags=25)
     hits = cm.keyword_hits(tags, KEYWORDS)
     return {
         "caption": caption,
         "hits": hits,
+        "hit_frames": [(h, None, None) for h in hits],  # (keyword, frame_t, score)
         "is_interesting": len(hits) > 0,
     }
 
 
-def analyze_video(path: Path) -> Dict[str, Any]:
+def analyze_video(path: Path, want_poster: bool = False) -> Dict[str, Any]:
     if not cm.ffmpeg_exists(FFMPEG_PATH):
         raise FileNotFoundError(
             f"ffmpeg not found. Tried: {FFMPEG_PATH}. Put ffmpeg in PATH or set AI_FFMPEG_PATH."
@@ -78,17 +100,25 @@ def analyze_video(path: Path) -> Dict[str, Any]:
         f0 = td_path / "frame_000000.png"
         f1 = td_path / "frame_000001.png"
 
-        frame0 = cm.extract_frame_at_time(path, f0, 0, ffmpeg_path=FFMPEG_PATH)
+        frame0 = extract_frame(path, f0, 0)
         if frame0 is None:
             raise RuntimeError("Failed to extract first frame")
 
-        cap0, _ = cm.model_generate_caption_and_tags(IMG2TXT, frame0)
+        # poster frame from the frame we decoded anyway
+        poster = None
+        if want_poster:
+            try:
+                poster = image_thumbnail(Path(frame0).read_bytes())
+            except Exception as e:
+                print(f"[WARN] poster frame for {path.name}: {e}")
+
+        cap0, _ = caption_frame(frame0)
 
         static_video = False
         try:
-            frame1 = cm.extract_frame_at_time(path, f1, STATIC_CHECK_SECONDS, ffmpeg_path=FFMPEG_PATH)
+            frame1 = extract_frame(path, f1, STATIC_CHECK_SECONDS)
             if frame1 is not None:
-                cap1, _ = cm.model_generate_caption_and_tags(IMG2TXT, frame1)
+                cap1, _ = caption_frame(frame1)
                 if cm.captions_similar(cap0, cap1):
                     static_video = True
         except Exception:
@@ -101,7 +131,9 @@ def analyze_video(path: Path) -> Dict[str, Any]:
             return {
                 "caption": cap0,
                 "hits": hits0,
+                "hit_frames": [(h, 0, None) for h in hits0],
                 "is_interesting": len(hits0) > 0,
+                "poster": poster,
             }
 
         # 2) Scan frames with early stop on hit :contentReference[oaicite:8]{index=8}
@@ -128,13 +160,13 @@ def analyze_video(path: Path) -> Dict[str, Any]:
 
                 out_frame = td_path / f"frame_{frames_used:06d}.png"
                 try:
-                    frame_path = cm.extract_frame_at_time(path, out_frame, t, ffmpeg_path=FFMPEG_PATH)
+                    frame_path = extract_frame(path, out_frame, t)
                     if frame_path is None:
                         break
                 except Exception:
                     break
 
-                caption, _ = cm.model_generate_caption_and_tags(IMG2TXT, frame_path)
+                caption, _ = caption_frame(frame_path)
                 tags = cm.extract_tags_from_text(caption, max_tags=25)
                 hits = cm.keyword_hits(tags, KEYWORDS)
 
@@ -156,54 +188,72 @@ def analyze_video(path: Path) -> Dict[str, Any]:
         return {
             "caption": joined_caption,
             "hits": all_hits,
+            "hit_frames": [(h, fs["t"], None) for fs in frame_summaries for h in fs["hits"]],
             "is_interesting": any_hit,
+            "poster": poster,
         }
 
 
-def analyze_path(path_str: str) -> Dict[str, Any]:
+def analyze_path(path_str: str, want_poster: bool = False) -> Dict[str, Any]:
     p = Path(path_str)
     if cm.is_image(p):
-        return analyze_image(p)
+        with tracing.span("analyze_image"):
+            return analyze_image(p)
     if cm.is_video(p):
-        return analyze_video(p)
+        with tracing.span("analyze_video"):
+            return analyze_video(p, want_poster=want_poster)
     raise ValueError(f"Unsupported file type: {p.suffix}")
 
 
 def process_instagram_stories(batch_size: int) -> int:
-    qs = (
-        InstagramStory.objects
-        .filter(media_file__isnull=False, ai_analyzed_at__isnull=True)
-        .order_by("timestamp")[:batch_size]
-    )
+    # served by the ig_story_analysis_poll_idx partial index
+    qs = InstagramStory.objects.analysis_queue()[:batch_size]
 
     stories = list(qs)
     processed = 0
 
     for s in stories:
-        # ensure file path exists
-        try:
-            local_path = s.media_file.path
-        except Exception as e:
-            print(f"[SKIP] story_id={s.story_id} no local file path: {e}")
-            continue
+        with tracing.trace("analyze story", story_id=s.story_id):
+            processed += analyze_story(s)
 
-        try:
-            result = analyze_path(local_path)
-
-            s.ai_caption = result["caption"] or ""
-            s.ai_hits = result["hits"] or []
-            s.ai_is_interesting = bool(result["is_interesting"])
-            s.ai_analyzed_at = timezone.now()
-            s.save(update_fields=["ai_caption", "ai_hits", "ai_is_interesting", "ai_analyzed_at"])
+    return processed
 
-            processed += 1
-            print(f"[OK] IG story_id={s.story_id} interesting={s.ai_is_interesting} hits={s.ai_hits}")
 
-        except Exception as e:
-            # Leave ai_analyzed_at NULL so it retries later
-            print(f"[ERR] IG story_id={s.story_id}: {e}")
-
-    return processed
+def analyze_story(s: InstagramStory) -> int:
+    """Analyze one story and store the result. Returns 1 if it was stored."""
+    # ensure file path exists
+    try:
+        local_path = s.media_file.path
+    except Exception as e:
+        print(f"[SKIP] story_id={s.story_id} no local file path: {e}")
+        return 0
+
+    try:
+        # videos without a poster get one from the analysis' first frame
+        result = analyze_path(local_path, want_poster=s.media_type == "video" and not s.thumbnail)
+
+        s.ai_caption = result["caption"] or ""
+        s.ai_hits = result["hits"] or []
+        s.ai_is_interesting = bool(result["is_interesting"])
+        s.ai_analyzed_at = timezone.now()
+        update_fields = ["ai_caption", "ai_hits", "ai_is_interesting", "ai_analyzed_at"]
+        if result.get("poster"):
+            s.thumbnail = save_thumbnail(s.story_id, result["poster"])
+            update_fields.append("thumbnail")
+        with tracing.span("save"), transaction.atomic():
+            s.save(update_fields=update_fields)
+            # indexed copy of the hits for keyword / per-user queries
+            replace_story_hits(s, result.get("hit_frames", s.ai_hits))
+            index_captions([s])
+            record_analysis(s, s.ai_hits)
+
+        print(f"[OK] IG story_id={s.story_id} interesting={s.ai_is_interesting} hits={s.ai_hits}")
+        return 1
+
+    except Exception as e:
+        # Leave ai_analyzed_at NULL so it retries later
+        print(f"[ERR] IG story_id={s.story_id}: {e}")
+        return 0
 
 
 def main():
@@ -212,10 +262,19 @@ def main():
     print(f"[AI SERVICE] keywords={KEYWORDS}")
     print(f"[AI SERVICE] poll={POLL_SECONDS}s batch={BATCH_SIZE}")
 
+    if TRACE_FILE:
+        tracing.configure(sample_rate=TRACE_SAMPLE, slow_seconds=TRACE_SLOW_SECONDS)
+        print(f"[AI SERVICE] tracing {TRACE_SAMPLE:.0%} of stories -> {TRACE_FILE}")
+
     while True:
+        # long-lived process: drop connections the server closed or that outlived CONN_MAX_AGE
+        close_old_connections()
         total = 0
         total += process_instagram_stories(BATCH_SIZE)
 
+        if TRACE_FILE and total:
+            tracing.get_tracer().write(TRACE_FILE)
+
         # later:
         # total += process_facebook_posts(BATCH_SIZE)
         # total += process_tiktok_videos(BATCH_SIZE)
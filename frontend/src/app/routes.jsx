@@ -1,8 +1,10 @@
 import InstagramDashboard from "../features/instagram/pages/Dashboard";
 import InstagramUsernames from "../features/instagram/pages/Usernames";
+import InstagramStories from "../features/instagram/pages/Stories";
 
 export const routes = [
   { path: "/", element: <InstagramDashboard /> },
   { path: "/instagram/dashboard", element: <InstagramDashboard /> },
   { path: "/instagram/usernames", element: <InstagramUsernames /> },
+  { path: "/instagram/stories", element: <InstagramStories /> },
 ];
@@ -0,0 +1,71 @@
+// Django serves the API under /scraper/ (vite.config.js proxies it in dev)
+const API_BASE = import.meta.env.VITE_API_BASE ?? "";
+
+function buildQuery(params) {
+  const qs = new URLSearchParams();
+  for (const [key, value] of Object.entries(params)) {
+    if (value === undefined || value === null || value === "") continue;
+    if (Array.isArray(value)) value.forEach((v) => qs.append(key, v));
+    else qs.append(key, String(value));
+  }
+  const s = qs.toString();
+  return s ? `?${s}` : "";
+}
+
+async function getJson(path, params = {}, { signal } = {}) {
+  const res = await fetch(`${API_BASE}${path}${buildQuery(params)}`, { signal });
+  const body = await res.json().catch(() => ({}));
+  if (!res.ok) throw new Error(body.error || `Request failed (${res.status})`);
+  return body;
+}
+
+/**
+ * One page of stories, newest first.
+ * filters: { usernames: [], since, until, interesting: true|false, keyword }
+ * Pass the previous page's nextCursor to get the next page; nextCursor is null on the last one.
+ */
+export async function fetchStories({ usernames, since, until, interesting, keyword, cursor, pageSize = 50 } = {}, options) {
+  const body = await getJson(
+    "/scraper/api/stories/",
+    {
+      username: usernames,
+      since,
+      until,
+      interesting,
+      keyword,
+      cursor,
+      page_size: pageSize,
+    },
+    options
+  );
+  return { stories: body.results, nextCursor: body.next_cursor };
+}
+
+/** Caption full-text search, best matches first. */
+export async function searchStories({ q, page = 1, pageSize = 20, usernames, since } = {}, options) {
+  const body = await getJson(
+    "/scraper/api/search/",
+    { q, page, page_size: pageSize, username: usernames, since },
+    options
+  );
+  return { stories: body.results, hasNext: body.has_next, page: body.page };
+}
+
+// Stats endpoints answer polls with ETags; fetch() revalidates them, so an unchanged poll is a 304
+
+/** Dashboard counters + the most interesting users of the last `days` days. */
+export function fetchDashboardStats({ days = 7 } = {}, options) {
+  return getJson("/scraper/api/stats/", { days }, options);
+}
+
+/** Per-day counters, oldest first: [{ day, stories, analyzed, interesting, hits }]. */
+export async function fetchDailyStats({ days = 30, username } = {}, options) {
+  const body = await getJson("/scraper/api/stats/daily/", { days, username }, options);
+  return body.days;
+}
+
+/** Stories per keyword, most hit first: [{ keyword, stories }]. */
+export async function fetchKeywordStats({ days } = {}, options) {
+  const body = await getJson("/scraper/api/stats/keywords/", { days }, options);
+  return body.keywords;
+}
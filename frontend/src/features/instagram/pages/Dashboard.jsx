@@ -1,39 +1,115 @@
-import { useMemo } from "react";
+import { useEffect, useState } from "react";
 import { useNavigate } from "react-router-dom";
 import StatCard from "../components/StatCard";
+import { fetchDailyStats, fetchDashboardStats, fetchKeywordStats } from "../api/instagramApi";
 
-export default function Dashboard() {
-  const navigate = useNavigate();
+const POLL_MS = 30_000;
+const SERIES_DAYS = 14;
+
+function usePolledStats() {
+  const [data, setData] = useState({ stats: null, series: [], keywords: [] });
+  const [error, setError] = useState("");
+
+  useEffect(() => {
+    let controller;
+    async function load() {
+      controller?.abort();
+      controller = new AbortController();
+      const options = { signal: controller.signal };
+      try {
+        const [stats, series, keywords] = await Promise.all([
+          fetchDashboardStats({}, options),
+          fetchDailyStats({ days: SERIES_DAYS }, options),
+          fetchKeywordStats({ days: 30 }, options),
+        ]);
+        setData({ stats, series, keywords });
+        setError("");
+      } catch (e) {
+        if (e.name !== "AbortError") setError(e.message);
+      }
+    }
+    load();
+    const timer = setInterval(load, POLL_MS);
+    return () => {
+      clearInterval(timer);
+      controller?.abort();
+    };
+  }, []);
+
+  return { ...data, error };
+}
 
-  const stats = useMemo(
-    () => ({
-      usernames: 42,
-      stories: 1280,
-      stories24h: 37,
-      militaryRelated: 116,
-      newItems: 12,
-      completeItems: 268,
-    }),
-    []
+function DailyChart({ series }) {
+  const max = Math.max(1, ...series.map((d) => d.stories));
+  return (
+    <div className="bg-gray-900 border border-gray-800 rounded-xl p-6">
+      <div className="text-sm text-gray-400 mb-4">Stories per day (last {SERIES_DAYS} days)</div>
+      <div className="flex items-end gap-1 h-32">
+        {series.map((d) => (
+          <div key={d.day} className="flex-1 flex flex-col justify-end h-full" title={`${d.day}: ${d.stories} stories, ${d.interesting} interesting`}>
+            <div className="bg-blue-600/70 rounded-t" style={{ height: `${(d.stories / max) * 100}%` }}>
+              <div className="bg-amber-400 rounded-t" style={{ height: `${d.stories ? (d.interesting / d.stories) * 100 : 0}%` }} />
+            </div>
+          </div>
+        ))}
+      </div>
+    </div>
   );
+}
+
+function KeywordList({ keywords }) {
+  return (
+    <div className="bg-gray-900 border border-gray-800 rounded-xl p-6">
+      <div className="text-sm text-gray-400 mb-4">Top keywords (30 days)</div>
+      {keywords.length === 0 ? <div className="text-sm text-gray-500">No hits yet</div> : null}
+      <ul className="space-y-1 text-sm">
+        {keywords.slice(0, 10).map((k) => (
+          <li key={k.keyword} className="flex justify-between">
+            <span className="text-gray-200">{k.keyword}</span>
+            <span className="text-gray-400">{k.stories}</span>
+          </li>
+        ))}
+      </ul>
+    </div>
+  );
+}
+
+export default function Dashboard() {
+  const navigate = useNavigate();
+  const { stats, series, keywords, error } = usePolledStats();
+  const value = (key) => (stats ? stats[key] : "—");
 
   return (
     <>
       <div className="text-sm text-gray-400">Instagram</div>
       <h2 className="text-2xl font-bold mb-6">Dashboard</h2>
 
+      {error ? <div className="mb-4 text-sm text-red-400">{error}</div> : null}
+
       <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-3 gap-5">
         <StatCard
           title="Usernames"
-          value={stats.usernames}
+          value={value("usernames")}
           subtitle="Manage scraping targets"
           onClick={() => navigate("/instagram/usernames")}
         />
-        <StatCard title="Stories" value={stats.stories} />
-        <StatCard title="Stories - Last 24h" value={stats.stories24h} />
-        <StatCard title="Military Related" value={stats.militaryRelated} subtitle="AI analyzed as interesting" />
-        <StatCard title="New Items" value={stats.newItems} subtitle="Not seen yet" />
-        <StatCard title="Complete Items" value={stats.completeItems} subtitle="Marked as seen" />
+        <StatCard title="Stories" value={value("stories")} subtitle="Browse stories" onClick={() => navigate("/instagram/stories")} />
+        <StatCard title="Stories - Last 24h" value={value("stories_24h")} />
+        <StatCard
+          title="Military Related"
+          value={value("interesting")}
+          subtitle="AI analyzed as interesting"
+          onClick={() => navigate("/instagram/stories?interesting=true")}
+        />
+        <StatCard title="Analyzed" value={value("analyzed")} subtitle="Stories the AI has looked at" />
+        <StatCard title="Keyword Hits" value={value("hits")} subtitle="Keyword matches across stories" />
+      </div>
+
+      <div className="grid grid-cols-1 lg:grid-cols-3 gap-5 mt-5">
+        <div className="lg:col-span-2">
+          <DailyChart series={series} />
+        </div>
+        <KeywordList keywords={keywords} />
       </div>
     </>
   );
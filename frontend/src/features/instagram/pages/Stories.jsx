@@ -0,0 +1,173 @@
+import { useCallback, useEffect, useState } from "react";
+import { Link, useSearchParams } from "react-router-dom";
+import { fetchStories } from "../api/instagramApi";
+
+const PAGE_SIZE = 48;
+
+const EMPTY_FILTERS = { username: "", since: "", until: "", interesting: "", keyword: "" };
+
+// e.g. /instagram/stories?interesting=true&username=some_user (dashboard links)
+function filtersFromParams(params) {
+  return Object.fromEntries(Object.entries(EMPTY_FILTERS).map(([key, empty]) => [key, params.get(key) ?? empty]));
+}
+
+function toQuery(filters) {
+  return {
+    usernames: filters.username.trim() ? [filters.username.trim()] : undefined,
+    since: filters.since,
+    until: filters.until,
+    interesting: filters.interesting,
+    keyword: filters.keyword.trim(),
+    pageSize: PAGE_SIZE,
+  };
+}
+
+function StoryCard({ story }) {
+  const preview = story.thumbnail_url || (story.media_type === "image" ? story.media_url : null);
+  return (
+    <a
+      href={story.media_url || preview || undefined}
+      target="_blank"
+      rel="noreferrer"
+      className="block bg-gray-900 border border-gray-800 rounded-xl overflow-hidden hover:border-gray-700"
+    >
+      <div className="aspect-[9/16] bg-gray-950 flex items-center justify-center">
+        {preview ? (
+          <img src={preview} alt="" loading="lazy" className="h-full w-full object-cover" />
+        ) : (
+          <span className="text-xs text-gray-500">{story.media_type === "video" ? "Video" : "No preview"}</span>
+        )}
+      </div>
+      <div className="p-3 text-xs space-y-1">
+        <div className="flex items-center justify-between gap-2">
+          <span className="font-medium text-gray-200">@{story.username}</span>
+          {story.ai_is_interesting ? <span className="text-amber-300">Interesting</span> : null}
+        </div>
+        <div className="text-gray-500">{new Date(story.timestamp).toLocaleString()}</div>
+        {story.ai_hits?.length ? <div className="text-gray-400">{story.ai_hits.join(", ")}</div> : null}
+      </div>
+    </a>
+  );
+}
+
+export default function Stories() {
+  const [searchParams] = useSearchParams();
+  const [draft, setDraft] = useState(() => filtersFromParams(searchParams));
+  const [filters, setFilters] = useState(draft);
+  const [stories, setStories] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loading, setLoading] = useState(false);
+  const [error, setError] = useState("");
+
+  // first page whenever the applied filters change
+  useEffect(() => {
+    const controller = new AbortController();
+    setLoading(true);
+    setError("");
+    fetchStories(toQuery(filters), { signal: controller.signal })
+      .then((page) => {
+        setStories(page.stories);
+        setNextCursor(page.nextCursor);
+      })
+      .catch((e) => {
+        if (e.name !== "AbortError") setError(e.message);
+      })
+      .finally(() => {
+        if (!controller.signal.aborted) setLoading(false);
+      });
+    return () => controller.abort();
+  }, [filters]);
+
+  const loadMore = useCallback(() => {
+    if (!nextCursor || loading) return;
+    setLoading(true);
+    fetchStories({ ...toQuery(filters), cursor: nextCursor })
+      .then((page) => {
+        setStories((prev) => [...prev, ...page.stories]);
+        setNextCursor(page.nextCursor);
+      })
+      .catch((e) => setError(e.message))
+      .finally(() => setLoading(false));
+  }, [filters, nextCursor, loading]);
+
+  function update(name) {
+    return (e) => setDraft((prev) => ({ ...prev, [name]: e.target.value }));
+  }
+
+  const inputClass = "rounded-lg bg-gray-900 border border-gray-800 px-3 py-2 outline-none focus:border-gray-700";
+
+  return (
+    <>
+      <div className="mb-6">
+        <div className="text-sm text-gray-400">Instagram</div>
+        <h2 className="text-2xl font-bold">Stories</h2>
+        <Link to="/instagram/dashboard" className="text-sm text-blue-400 hover:underline">
+          ← Back to dashboard
+        </Link>
+      </div>
+
+      <form
+        className="flex flex-wrap items-end gap-3 mb-6"
+        onSubmit={(e) => {
+          e.preventDefault();
+          setFilters(draft);
+        }}
+      >
+        <input value={draft.username} onChange={update("username")} placeholder="Username" className={inputClass} />
+        <input value={draft.keyword} onChange={update("keyword")} placeholder="Keyword" className={inputClass} />
+        <label className="text-xs text-gray-400">
+          From
+          <input type="date" value={draft.since} onChange={update("since")} className={`${inputClass} block mt-1`} />
+        </label>
+        <label className="text-xs text-gray-400">
+          Until
+          <input type="date" value={draft.until} onChange={update("until")} className={`${inputClass} block mt-1`} />
+        </label>
+        <select value={draft.interesting} onChange={update("interesting")} className={inputClass}>
+          <option value="">All stories</option>
+          <option value="true">Interesting</option>
+          <option value="false">Not interesting</option>
+        </select>
+        <button type="submit" className="h-10 px-4 rounded-lg bg-blue-600 text-white hover:bg-blue-500">
+          Apply
+        </button>
+        <button
+          type="button"
+          onClick={() => {
+            setDraft(EMPTY_FILTERS);
+            setFilters(EMPTY_FILTERS);
+          }}
+          className="h-10 px-4 rounded-lg border border-gray-800 text-gray-200 hover:border-gray-700"
+        >
+          Clear
+        </button>
+      </form>
+
+      {error ? <div className="mb-4 text-sm text-red-400">{error}</div> : null}
+
+      <div className="grid grid-cols-2 sm:grid-cols-3 lg:grid-cols-4 gap-4">
+        {stories.map((s) => (
+          <StoryCard key={s.id} story={s} />
+        ))}
+      </div>
+
+      {!loading && stories.length === 0 && !error ? (
+        <div className="py-10 text-center text-gray-400">No results</div>
+      ) : null}
+
+      <div className="flex justify-center mt-6">
+        {nextCursor ? (
+          <button
+            onClick={loadMore}
+            disabled={loading}
+            className="px-4 py-2 rounded-lg border border-gray-800 text-gray-200 hover:border-gray-700 disabled:opacity-40"
+          >
+            {loading ? "Loading…" : "Load more"}
+          </button>
+        ) : loading ? (
+          <span className="text-sm text-gray-400">Loading…</span>
+        ) : null}
+      </div>
+    </>
+  );
+}
@@ -1,7 +1,15 @@
 from django.contrib import admin
-from .models import InstagramUser, InstagramStory
+from .models import InstagramUser, InstagramStory, MediaBlob, ScrapeRun, ScrapeCheckpoint, StoryHit
+from .models import DailyStats, UserDailyStats, KeywordDailyStats
 
 admin.site.register(InstagramUser)
 admin.site.register(InstagramStory)
+admin.site.register(MediaBlob)
+admin.site.register(ScrapeRun)
+admin.site.register(ScrapeCheckpoint)
+admin.site.register(StoryHit)
+admin.site.register(DailyStats)
+admin.site.register(UserDailyStats)
+admin.site.register(KeywordDailyStats)
 
 # Register your models here.
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class InstagramScraperConfig(AppConfig):
     name = 'instagram_scraper'
+
+    def ready(self):
+        # blob reference counting, caption index and rollup upkeep on row deletion
+        from . import signals  # noqa
@@ -0,0 +1,169 @@
+"""
+DB write-contention benchmark: N threads replaying the scraper's write pattern
+(profile upsert, story bulk insert, blob ref + media attach per story) while
+analyzer threads poll the analysis queue and store results, as ai_analysis_service does.
+Reports committed writes/s per role, lock errors and write latency.
+Used by the `bench_db` command, which runs every round on its own scratch DB (scratch_db).
+"""
+import hashlib
+import threading
+import time
+from datetime import timedelta
+from django.db import OperationalError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from instagram_scraper.models import InstagramUser, InstagramStory, MediaBlob
+
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+class _RoleStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.writes = 0
+        self.lock_errors = 0
+        self.latencies = []
+
+    def timed(self, fn, *args) -> bool:
+        """Run one write transaction; a lock error counts and is skipped (as a worker would)."""
+        started = time.perf_counter()
+        try:
+            fn(*args)
+        except OperationalError as e:
+            if "locked" not in str(e) and "busy" not in str(e):
+                raise
+            with self.lock:
+                self.lock_errors += 1
+            return False
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.writes += 1
+            self.latencies.append(elapsed)
+        return True
+
+    def report(self, seconds: float) -> dict:
+        return {
+            "writes": self.writes,
+            "writes_per_s": self.writes / seconds,
+            "lock_errors": self.lock_errors,
+            "p50_ms": _percentile(self.latencies, 0.5) * 1000,
+            "p95_ms": _percentile(self.latencies, 0.95) * 1000,
+            "max_ms": max(self.latencies, default=0.0) * 1000,
+        }
+
+
+def _scrape_once(prefix: str, worker: int, n: int, stories_per_user: int) -> list[str]:
+    username = f"{prefix}_user_{worker}_{n % 50}"
+    now = timezone.now()
+    user, _ = InstagramUser.objects.get_or_create(username=username, defaults={"is_private": False})
+    user.last_scraped = now
+    user.save(update_fields=["last_scraped"])
+
+    ids = [f"{prefix}_{worker}_{n}_{i}" for i in range(stories_per_user)]
+    with transaction.atomic():
+        InstagramStory.objects.bulk_create(
+            [
+                InstagramStory(
+                    username=user,
+                    story_id=story_id,
+                    media_url=f"https://example.com/{story_id}.jpg",
+                    media_type="image",
+                    media_status=InstagramStory.MEDIA_PENDING,
+                    timestamp=now - timedelta(minutes=i),
+                )
+                for i, story_id in enumerate(ids)
+            ],
+            ignore_conflicts=True,
+        )
+    return ids
+
+
+def _attach_media(prefix: str, story_id: str) -> None:
+    # same two writes as store_blob() + attaching the file in story_saver
+    sha = hashlib.sha256(story_id.encode("utf-8")).hexdigest()
+    with transaction.atomic():
+        MediaBlob.objects.get_or_create(sha256=sha, defaults={"file": f"blobs/{prefix}/{sha}.jpg", "size": 1})
+        MediaBlob.objects.filter(pk=sha).update(ref_count=F("ref_count") + 1)
+    InstagramStory.objects.filter(story_id=story_id).update(
+        media_file=f"stories/{prefix}/{story_id}.jpg",
+        media_status=InstagramStory.MEDIA_READY,
+    )
+
+
+def _store_analysis(story: InstagramStory) -> None:
+    story.ai_caption = "a benchmark caption"
+    story.ai_hits = []
+    story.ai_is_interesting = False
+    story.ai_analyzed_at = timezone.now()
+    story.save(update_fields=["ai_caption", "ai_hits", "ai_is_interesting", "ai_analyzed_at"])
+
+
+def run_contention_benchmark(
+    writers: int = 6,
+    analyzers: int = 1,
+    seconds: float = 10.0,
+    stories_per_user: int = 5,
+    analyze_ms: float = 20.0,
+    prefix: str = "dbbench",
+) -> dict:
+    stop = threading.Event()
+    scrape_stats, analyze_stats = _RoleStats(), _RoleStats()
+    errors = []
+
+    def writer(worker: int):
+        n = 0
+        try:
+            while not stop.is_set():
+                ids = []
+                if scrape_stats.timed(lambda: ids.extend(_scrape_once(prefix, worker, n, stories_per_user))):
+                    for story_id in ids:
+                        scrape_stats.timed(_attach_media, prefix, story_id)
+                n += 1
+        except Exception as e:
+            errors.append(f"writer {worker}: {e}")
+        finally:
+            connection.close()
+
+    def analyzer():
+        try:
+            while not stop.is_set():
+                batch = list(InstagramStory.objects.analysis_queue().filter(story_id__startswith=f"{prefix}_")[:10])
+                if not batch:
+                    time.sleep(0.05)
+                    continue
+                for story in batch:
+                    time.sleep(analyze_ms / 1000)  # model time between the poll and the write
+                    analyze_stats.timed(_store_analysis, story)
+                close_old_connections()
+        except Exception as e:
+            errors.append(f"analyzer: {e}")
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=writer, args=(i,), name=f"db-writer-{i}") for i in range(writers)]
+    threads += [threading.Thread(target=analyzer, name=f"db-analyzer-{i}") for i in range(analyzers)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    scrape, analyze = scrape_stats.report(elapsed), analyze_stats.report(elapsed)
+    return {
+        "vendor": connection.vendor,
+        "writers": writers,
+        "analyzers": analyzers,
+        "elapsed_s": elapsed,
+        "scrape": scrape,
+        "analyze": analyze,
+        "total_writes_per_s": (scrape["writes"] + analyze["writes"]) / elapsed,
+        "errors": errors,
+    }
@@ -0,0 +1,177 @@
+"""
+Parser throughput benchmark over the recorded response corpus in testdata/.
+Used by the `bench_parsers` command and the parser regression tests.
+Absolute MB/s depends on the machine, so the baseline and the regression gate use each
+parser's throughput relative to a reference workload timed in the same run: the
+BeautifulSoup story-card fallback on stories_small (pure-Python parsing, like ours),
+interleaved with each measurement so load changes during the run hit both sides.
+"""
+import gc
+import json
+import math
+import time
+from django.utils import timezone
+from pathlib import Path
+from instagram_scraper.scraper import parsers
+from instagram_scraper.scraper.parsers import (
+    parse_profile_request,
+    parse_stories_request,
+    extract_story_id,
+    parse_time_ago,
+    story_nodes,
+)
+
+TESTDATA = Path(__file__).resolve().parent.parent / "testdata"
+BASELINE_FILE = TESTDATA / "parser_bench_baseline.json"
+HUGE_STORY_COUNT = 1000
+# small responses parse in microseconds: time them in batches of repeated calls so one
+# sample covers at least this much input and timer noise stays far below the tolerance
+BATCH_BYTES = 256 * 1024
+MIN_SAMPLES = 5
+# the regression gate compares throughput relative to a pure-Python reference parser timed
+# alongside each measurement, so it holds on any machine; this many reference calls per sample
+REFERENCE_BATCH = 8
+# lxml story-card extraction vs. the BeautifulSoup fallback (~10-15x on a typical machine)
+MIN_LXML_SPEEDUP = 5
+
+
+def load_corpus() -> dict[str, str]:
+    """name -> raw response text (stories_huge is synthesized from stories_small)."""
+    corpus = {
+        path.stem: path.read_text(encoding="utf-8")
+        for path in sorted(TESTDATA.iterdir())
+        if path.stem.startswith(("profile_", "stories_")) and path.suffix in (".json", ".html")
+    }
+    corpus["stories_huge"] = build_huge_stories(corpus["stories_small"])
+    return corpus
+
+
+def build_huge_stories(small_raw: str, count: int = HUGE_STORY_COUNT) -> str:
+    """A very active account: the small page's story cards repeated with unique ids."""
+    html = json.loads(small_raw)["html"]
+    head, _, rest = html.partition('<div class="col-md-4')
+    cards = '<div class="col-md-4' + rest
+    blocks = [
+        cards
+        .replace("_Instagram_example_user_37962144969609747", f"_Instagram_example_user_{i:04d}37962144969609747")
+        .replace("video_x_n.jpg", f"video_x{i}_n.jpg")
+        for i in range(max(1, count // 5))
+    ]
+    return json.dumps({"status": "ok", "html": head + "".join(blocks)})
+
+
+def _targets(name: str, raw: str) -> list[tuple[str, callable, int]]:
+    """(function name, zero-arg callable, items per call) applicable to a corpus entry."""
+    if name.startswith("profile_"):
+        return [("parse_profile_request", lambda: parse_profile_request(raw), 1)]
+
+    nodes = story_nodes(json.loads(raw).get("html", ""))
+    urls = [url for _, url, _ in nodes]
+    time_texts = [text for _, _, text in nodes]
+    targets = [("parse_stories_request", lambda: parse_stories_request(raw), 1)]
+    if urls:
+        targets.append(("extract_story_id", lambda: [extract_story_id(u) for u in urls], len(urls)))
+        now = timezone.now()
+        targets.append(("parse_time_ago", lambda: [parse_time_ago(t, now) for t in time_texts], len(time_texts)))
+    return targets
+
+
+def _time_batch(call, batch: int) -> float:
+    # like timeit: a collection landing in one side's batch would skew the ratio
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(batch):
+            call()
+        return (time.perf_counter() - start) / batch
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def time_per_call(call, size: int, min_seconds: float, reference=None) -> float | tuple[float, float]:
+    """
+    Seconds per call: the fastest batch of ceil(BATCH_BYTES / size) calls, sampled
+    for `min_seconds` (at least MIN_SAMPLES batches).
+    With a `reference` callable, a batch of REFERENCE_BATCH reference calls runs after each
+    sample and (per call, per reference call) is returned, both seen under the same load.
+    """
+    batch = max(1, math.ceil(BATCH_BYTES / max(1, size)))
+    best = best_reference = math.inf
+    samples = 0
+    deadline = time.perf_counter() + min_seconds
+    while samples < MIN_SAMPLES or time.perf_counter() < deadline:
+        best = min(best, _time_batch(call, batch))
+        if reference is not None:
+            best_reference = min(best_reference, _time_batch(reference, REFERENCE_BATCH))
+        samples += 1
+    return best if reference is None else (best, best_reference)
+
+
+def reference_workload(corpus: dict) -> tuple[callable, int]:
+    """(callable, input bytes) of the reference: BeautifulSoup story cards on stories_small."""
+    html = json.loads(corpus["stories_small"])["html"]
+    return (lambda: parsers._story_nodes_bs(html)), len(html.encode("utf-8"))
+
+
+def run_parser_benchmark(min_seconds: float = 0.2) -> list[dict]:
+    """
+    Time every parser on every corpus entry (see time_per_call).
+    "relative" is the row's MB/s over the reference workload's MB/s, timed alongside it.
+    """
+    corpus = load_corpus()
+    reference, reference_size = reference_workload(corpus)
+    rows = []
+    for name, raw in corpus.items():
+        size = len(raw.encode("utf-8"))
+        for func, call, items in _targets(name, raw):
+            best, best_reference = time_per_call(call, size, min_seconds, reference=reference)
+            reference_mb_per_s = reference_size / best_reference / (1024 * 1024)
+            rows.append({
+                "fixture": name,
+                "function": func,
+                "bytes": size,
+                "ms_per_response": best * 1000,
+                "us_per_item": best / items * 1_000_000,
+                "mb_per_s": size / best / (1024 * 1024),
+                "relative": size / best / (1024 * 1024) / reference_mb_per_s,
+            })
+    return rows
+
+
+def lxml_speedup(min_seconds: float = 0.2) -> float:
+    """How many times faster the lxml story-card extraction is than the BeautifulSoup fallback."""
+    html = json.loads(load_corpus()["stories_small"])["html"] * 100
+    size = len(html.encode("utf-8"))
+    lxml_s = time_per_call(lambda: parsers._story_nodes_lxml(html), size, min_seconds)
+    bs_s = time_per_call(lambda: parsers._story_nodes_bs(html), size, min_seconds)
+    return bs_s / lxml_s
+
+
+def load_baseline() -> dict:
+    """"fixture:function" -> throughput relative to the reference ({} without a baseline)."""
+    if not BASELINE_FILE.exists():
+        return {}
+    return json.loads(BASELINE_FILE.read_text(encoding="utf-8")).get("relative", {})
+
+
+def save_baseline(rows: list[dict]) -> None:
+    baseline = {
+        "reference": "BeautifulSoup story cards on stories_small (benchmarks.parsers.reference_workload)",
+        "relative": {f"{r['fixture']}:{r['function']}": round(r["relative"], 4) for r in rows},
+    }
+    BASELINE_FILE.write_text(json.dumps(baseline, indent=1, sort_keys=True) + "\n", encoding="utf-8")
+
+
+def find_regressions(rows: list[dict], baseline: dict, tolerance: float) -> list[str]:
+    """Measurements whose relative throughput dropped more than `tolerance` (0.3 = 30%) below the baseline."""
+    problems = []
+    for r in rows:
+        key = f"{r['fixture']}:{r['function']}"
+        expected = baseline.get(key)
+        if expected and r["relative"] < expected * (1 - tolerance):
+            problems.append(
+                f"{key}: {r['relative']:.3f}x reference < baseline {expected:.3f}x (-{tolerance:.0%})"
+            )
+    return problems
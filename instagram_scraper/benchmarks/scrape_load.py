@@ -0,0 +1,84 @@
+"""
+End-to-end scrape load benchmark:
+scrape_users -> scrape_instagram -> save_profile / save_stories -> download_media,
+against the local stand-in upstream instead of the real site, on a scratch database
+(scratch_db) so the configured DB and media are never touched.
+Used by the `bench_scrape` command.
+"""
+import io
+import time
+from django.core.management import call_command
+from django.db.models import Sum
+from instagram_scraper.models import InstagramUser, InstagramStory, MediaBlob
+from .scratch_db import WriteCounter, scratch_database
+from .upstream import StandInUpstream, UpstreamConfig
+
+
+def _db_counts(usernames: list[str]) -> dict:
+    return {
+        "users": InstagramUser.objects.filter(username__in=usernames).count(),
+        "stories": InstagramStory.objects.filter(username__username__in=usernames).count(),
+        "media_failed": InstagramStory.objects.filter(
+            username__username__in=usernames, media_status=InstagramStory.MEDIA_FAILED
+        ).count(),
+        "blob_bytes": MediaBlob.objects.aggregate(total=Sum("size"))["total"] or 0,
+    }
+
+
+def run_scrape_benchmark(
+    users: int = 200,
+    workers: int = 6,
+    download_workers: int = 4,
+    config: UpstreamConfig | None = None,
+    prefix: str = "bench",
+    extra_args: list[str] | None = None,
+    keep: bool = False,
+) -> dict:
+    """
+    Scrape `users` synthetic usernames (`<prefix>_user_<n>`) through the stand-in upstream
+    into a fresh scratch DB (its temp dir is kept, and returned as "scratch_dir", with `keep`).
+    """
+    usernames = [f"{prefix}_user_{i}" for i in range(users)]
+    output = io.StringIO()
+
+    with scratch_database(keep=keep) as scratch_dir:
+        path = scratch_dir / "usernames.txt"
+        path.write_text("\n".join(usernames), encoding="utf-8")
+
+        with StandInUpstream(config) as upstream, WriteCounter() as writes:
+            started = time.perf_counter()
+            call_command(
+                "scrape_users",
+                "--file", str(path),
+                "--workers", str(workers),
+                "--download-workers", str(download_workers),
+                "--base-url", upstream.url,
+                "--no-tor",
+                *(extra_args or []),
+                stdout=output,
+            )
+            elapsed = time.perf_counter() - started
+            served = upstream.stats()
+
+        counts = _db_counts(usernames)
+
+    minutes = elapsed / 60
+    return {
+        "users": users,
+        "workers": workers,
+        "download_workers": download_workers,
+        "elapsed_s": elapsed,
+        "users_per_min": users / minutes,
+        "stories_per_min": counts["stories"] / minutes,
+        "bytes_per_s": served.get("bytes_sent", 0) / elapsed,
+        "db_writes": writes.statements,
+        "db_rows_written": writes.rows,
+        "db_writes_per_s": writes.statements / elapsed,
+        "new_users": counts["users"],
+        "new_stories": counts["stories"],
+        "media_failed": counts["media_failed"],
+        "new_blob_bytes": counts["blob_bytes"],
+        "upstream": served,
+        "output": output.getvalue(),
+        "scratch_dir": str(scratch_dir) if keep else None,
+    }
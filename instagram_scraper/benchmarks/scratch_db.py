@@ -0,0 +1,104 @@
+"""
+Throwaway databases for the benchmarks, so they never touch the configured DB.
+`scratch_database()` points the default alias (every thread's connection) at a new,
+migrated SQLite file in a temp dir, with MEDIA_ROOT and the cache there too, and puts
+everything back on exit. `WriteCounter` counts the write statements actually executed.
+"""
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from django.conf import settings
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+
+SQLITE_CONFIGS = ("defaults", "tuned")
+
+
+def sqlite_config(name: str) -> dict:
+    """
+    DATABASES entries to compare: Django's SQLite defaults (rollback journal, DEFERRED
+    transactions, 5s timeout, a connection per request) or the tuned settings.SQLITE_OPTIONS.
+    """
+    if name == "defaults":
+        return {"OPTIONS": {}, "CONN_MAX_AGE": 0}
+    if name == "tuned":
+        return {"OPTIONS": dict(settings.SQLITE_OPTIONS), "CONN_MAX_AGE": settings.SQLITE_CONN_MAX_AGE}
+    raise ValueError(f"unknown SQLite config {name!r} (use one of {SQLITE_CONFIGS})")
+
+
+def _drop_connection() -> None:
+    # the next access builds a new wrapper from the (changed) settings dict
+    connections.close_all()
+    try:
+        del connections[DEFAULT_DB_ALIAS]
+    except AttributeError:
+        pass
+
+
+@contextmanager
+def scratch_database(config: str = "tuned", keep: bool = False):
+    """Run the block against a fresh SQLite DB; yields its temp dir (removed unless `keep`)."""
+    tmp = Path(tempfile.mkdtemp(prefix="mabit-bench-"))
+    db = connections.settings[DEFAULT_DB_ALIAS]
+    saved = dict(db)
+    _drop_connection()
+    db.update(
+        ENGINE="django.db.backends.sqlite3",
+        NAME=str(tmp / "bench.sqlite3"),
+        CONN_HEALTH_CHECKS=False,
+        **sqlite_config(config),
+    )
+    try:
+        with override_settings(
+            MEDIA_ROOT=str(tmp / "media"),
+            CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+        ):
+            call_command("migrate", verbosity=0, interactive=False)
+            yield tmp
+    finally:
+        _drop_connection()
+        db.clear()
+        db.update(saved)
+        if not keep:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+class WriteCounter:
+    """
+    Counts INSERT / UPDATE / DELETE statements and the rows they touched, on the current
+    connection and on every connection opened (by any thread) while the block runs.
+    """
+
+    WRITES = ("INSERT", "UPDATE", "DELETE")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.statements = 0
+        self.rows = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        if sql.lstrip()[:6].upper() in self.WRITES:
+            rows = max(context["cursor"].rowcount, 0)
+            with self._lock:
+                self.statements += 1
+                self.rows += rows
+        return result
+
+    def _attach(self, sender=None, connection=connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+    def __enter__(self):
+        connection_created.connect(self._attach, weak=False)
+        self._attach()
+        return self
+
+    def __exit__(self, *exc):
+        connection_created.disconnect(self._attach)
+        if self in connection.execute_wrappers:
+            connection.execute_wrappers.remove(self)
@@ -0,0 +1,269 @@
+"""
+Local stand-in for media.mollygram.com, for load-testing the scraper without the real site.
+Serves the same JSON shapes as the recorded corpus in testdata/:
+- GET /?url=<username>                    profile (public / private / error)
+- GET /?url=<username>&method=allstories  story cards
+- GET /media.php?media=...&name=...       synthetic media bytes
+Used by the `fake_upstream` and `bench_scrape` commands.
+"""
+import hashlib
+import io
+import json
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, quote
+from PIL import Image
+
+# same texts the real site answers with (see testdata/profile_*.json)
+MSG_BLOCKED = "Your IP has been temporarily blocked. Please try again later."
+MSG_UNAVAILABLE = "Service Temporarily Unavailable, please retry in a few minutes."
+MSG_NOT_FOUND = "User not found. Please check the username and try again."
+MSG_NO_STORIES = "No stories found"
+
+_CDN = "https://scontent.cdninstagram.com/v/t51.2885-15/"
+
+
+def _small_jpeg() -> bytes:
+    out = io.BytesIO()
+    Image.new("RGB", (64, 64), (40, 90, 160)).save(out, "JPEG")
+    return out.getvalue()
+
+
+# decodable prefix of every media body, so ingest thumbnails work against the stand-in
+_JPEG = _small_jpeg()
+
+
+@dataclass
+class UpstreamConfig:
+    latency_ms: float = 50.0        # mean response latency (uniform 0.5x - 1.5x)
+    media_latency_ms: float = 20.0
+    private_rate: float = 0.1       # share of usernames that are private (stable per username)
+    not_found_rate: float = 0.05    # share of usernames that don't exist (stable per username)
+    blocked_rate: float = 0.0       # per profile request: "temporarily blocked"
+    unavailable_rate: float = 0.0   # per profile request: "temporarily unavailable"
+    http_error_rate: float = 0.0    # per request: HTTP 503 (retried by ScraperClient)
+    stories_per_user: int = 5       # public users get 0..2x this many
+    video_rate: float = 0.3
+    media_kb: int = 200             # mean media size (uniform 0.5x - 1.5x)
+    seed: int = 0
+
+
+def _user_hash(seed: int, username: str) -> int:
+    return int.from_bytes(hashlib.blake2b(f"{seed}:{username}".encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class StandInUpstream:
+    """
+    Threaded HTTP server in a background thread.
+    Whether a user is public/private/missing and which stories they have is derived
+    from the username, so repeated polls see the same accounts and story ids.
+    """
+
+    def __init__(self, config: UpstreamConfig | None = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or UpstreamConfig()
+        self._stats_lock = threading.Lock()
+        self._stats = Counter()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stand-in-upstream", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        if self._thread:
+            # shutdown() waits for serve_forever, so only call it when that is running
+            self._server.shutdown()
+            self._thread.join()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def count(self, key: str, n: int = 1):
+        with self._stats_lock:
+            self._stats[key] += n
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return dict(self._stats)
+
+    # ---------- accounts ----------
+
+    def account_kind(self, username: str) -> str:
+        cfg = self.config
+        x = (_user_hash(cfg.seed, username) % 10_000) / 10_000
+        if x < cfg.not_found_rate:
+            return "not_found"
+        if x < cfg.not_found_rate + cfg.private_rate:
+            return "private"
+        return "public"
+
+    def user_stories(self, username: str) -> list[tuple[str, str, str]]:
+        """(story_id, media_type, time_text) for a public user."""
+        cfg = self.config
+        h = _user_hash(cfg.seed + 1, username)
+        rnd = random.Random(h)
+        count = rnd.randint(0, 2 * cfg.stories_per_user)
+        stories = []
+        for i in range(count):
+            # 19-digit ids like the real ones, unique per (username, i)
+            story_id = str(10**18 + (h + i * 7919) % (9 * 10**18))
+            media_type = "video" if rnd.random() < cfg.video_rate else "image"
+            stories.append((story_id, media_type, f"{rnd.randint(1, 23)} hours ago"))
+        return stories
+
+    # ---------- responses ----------
+
+    def media_url(self, username: str, inner: str, name: str = "") -> str:
+        url = f"{self.url}media.php?media={quote(_CDN + inner, safe='')}"
+        return f"{url}&name=anonimostory.com_Instagram_{username}_{name}" if name else url
+
+    def profile_body(self, username: str) -> dict:
+        cfg = self.config
+        roll = random.random()
+        if roll < cfg.blocked_rate:
+            self.count("profile_blocked")
+            return {"status": "error", "msg": MSG_BLOCKED}
+        if roll < cfg.blocked_rate + cfg.unavailable_rate:
+            self.count("profile_unavailable")
+            return {"status": "error", "msg": MSG_UNAVAILABLE}
+
+        kind = self.account_kind(username)
+        self.count(f"profile_{kind}")
+        if kind == "not_found":
+            return {"status": "error", "msg": MSG_NOT_FOUND}
+        if kind == "private":
+            return {
+                "status": "ok",
+                "source": "AccountPrivate",
+                "html": '<div class="alert alert-warning">This account is private</div>',
+            }
+        pic = self.media_url(username, f"{username}_avatar_n.jpg")
+        return {
+            "status": "ok",
+            "source": "AccountPublic",
+            "html": (
+                f'<div class="container"><div class="row text-center"><div class="col-12">'
+                f'<h4>Stories of <b>{username}</b></h4>\n'
+                f'<img class="profile-pic" src="{pic}" alt=""></div></div></div>'
+            ),
+        }
+
+    def stories_body(self, username: str) -> dict:
+        stories = self.user_stories(username) if self.account_kind(username) == "public" else []
+        self.count("stories_listed", len(stories))
+        if not stories:
+            return {"status": "error", "msg": MSG_NO_STORIES}
+
+        cards = []
+        for story_id, media_type, time_text in stories:
+            url = self.media_url(username, f"{media_type}_{story_id}_n.jpg", story_id).replace("&", "&amp;")
+            footer = (
+                f'<div class="card-body"><p class="card-text"><small class="text-muted">'
+                f'<i class="fa fa-clock"></i> {time_text}</small></p>'
+            )
+            if media_type == "video":
+                cards.append(
+                    f'<div class="col-md-4 col-sm-6 mb-4"><div class="card shadow-sm">'
+                    f'<video controls playsinline preload="none"><source src="{url}" type="video/mp4"></video>'
+                    f'{footer}<a id="download-video" class="btn btn-primary btn-sm" href="{url}&amp;dl=1">Download HD</a>'
+                    f'</div></div></div>'
+                )
+            else:
+                cards.append(
+                    f'<div class="col-md-4 col-sm-6 mb-4"><div class="card shadow-sm">'
+                    f'<img class="img-fluid rounded" loading="lazy" src="{url}" alt="story">'
+                    f'{footer}<a class="btn btn-primary btn-sm" href="{url}">Download</a></div></div></div>'
+                )
+        html = (
+            f'<div class="container"><div class="row text-center"><div class="col-12">'
+            f'<h4>Stories of <b>{username}</b></h4></div></div><div class="row">\n'
+            + "\n".join(cards) + "</div></div>"
+        )
+        return {"status": "ok", "html": html}
+
+    def media_body(self, key: str) -> bytes:
+        """Deterministic bytes per media URL (so re-downloads hash the same): a small JPEG padded with noise."""
+        rnd = random.Random(_user_hash(self.config.seed + 2, key))
+        size = max(1, int(self.config.media_kb * 1024 * rnd.uniform(0.5, 1.5)))
+        return _JPEG + rnd.randbytes(max(0, size - len(_JPEG)))
+
+    def _handler_class(self):
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body: bytes, content_type: str, headers: dict | None = None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(body)
+                upstream.count("bytes_sent", len(body))
+
+            def _sleep(self, mean_ms: float):
+                if mean_ms > 0:
+                    time.sleep(mean_ms / 1000 * random.uniform(0.5, 1.5))
+
+            def do_GET(self):
+                cfg = upstream.config
+                parsed = urlparse(self.path)
+                qs = parse_qs(parsed.query)
+                upstream.count("requests")
+
+                if random.random() < cfg.http_error_rate:
+                    upstream.count("http_503")
+                    self._send(503, b"Service Unavailable", "text/plain")
+                    return
+
+                if parsed.path == "/media.php":
+                    self._sleep(cfg.media_latency_ms)
+                    key = qs.get("media", [""])[0]
+                    etag = f'"{hashlib.sha1(key.encode("utf-8")).hexdigest()}"'
+                    if self.headers.get("If-None-Match") == etag:
+                        upstream.count("media_not_modified")
+                        self._send(304, b"", "image/jpeg", {"ETag": etag})
+                        return
+                    upstream.count("media")
+                    self._send(200, upstream.media_body(key), "image/jpeg", {"ETag": etag})
+                    return
+
+                username = qs.get("url", [""])[0]
+                if parsed.path != "/" or not username:
+                    self._send(404, b"not found", "text/plain")
+                    return
+
+                self._sleep(cfg.latency_ms)
+                if qs.get("method", [""])[0] == "allstories":
+                    upstream.count("stories_requests")
+                    body = upstream.stories_body(username)
+                else:
+                    upstream.count("profile_requests")
+                    body = upstream.profile_body(username)
+                self._send(200, json.dumps(body).encode("utf-8"), "application/json")
+
+        return Handler
@@ -0,0 +1,74 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from instagram_scraper.services.blob_store import collect_garbage
+from instagram_scraper.services.retention import apply_policy, load_policies, CHUNK_SIZE
+
+
+def _mb(n: int) -> str:
+    return f"{n / (1024 * 1024):.1f}MB"
+
+
+class Command(BaseCommand):
+    help = "Archive or delete old stories according to settings.STORY_RETENTION_POLICIES."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--policy", action="append", help="Only apply this policy (repeatable).")
+        parser.add_argument("--dry-run", action="store_true", help="Only report what each policy would touch.")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=CHUNK_SIZE,
+            help=f"Stories per transaction (default: {CHUNK_SIZE}).",
+        )
+        parser.add_argument(
+            "--pause-ms",
+            type=float,
+            default=50,
+            help="Sleep between chunks so scrapers get the write lock (default: 50).",
+        )
+        parser.add_argument(
+            "--gc",
+            action="store_true",
+            help="Run the blob GC afterwards (deletes blobs unreferenced for --gc-grace-minutes).",
+        )
+        parser.add_argument("--gc-grace-minutes", type=int, default=60, help="Blob GC grace period (default: 60).")
+
+    def handle(self, *args, **options):
+        try:
+            policies = load_policies(options["policy"])
+        except (TypeError, ValueError) as e:
+            raise CommandError(str(e))
+        if not policies:
+            self.stdout.write("No retention policies configured.")
+            return
+
+        dry_run = options["dry_run"]
+        released = 0
+        for policy in policies:
+            r = apply_policy(
+                policy,
+                chunk_size=options["chunk_size"],
+                pause=options["pause_ms"] / 1000,
+                dry_run=dry_run,
+                log_callback=lambda msg: self.stdout.write(msg) if options["verbosity"] > 1 else None,
+            )
+            released += r.released_bytes
+            verb = "would" if dry_run else "did"
+            line = f"[{r.policy}] {verb} {r.action} {r.stories} stories, media {_mb(r.media_bytes)}"
+            if r.action == "archive" and not dry_run:
+                line += f" -> {_mb(r.archived_bytes)} in {len(r.archives)} archives"
+            if r.action == "delete" and not dry_run and (r.archives_deleted or r.archive_bytes_kept):
+                line += f", {len(r.archives_deleted)} archives deleted ({_mb(r.archive_bytes_freed)})"
+                if r.archive_bytes_kept:
+                    line += f", {_mb(r.archive_bytes_kept)} of archives still hold other stories"
+            if r.thumbnails:
+                line += f", {r.thumbnails} thumbnails made"
+            if not dry_run:
+                line += f", {_mb(r.released_bytes)} of blobs released"
+            self.stdout.write(self.style.SUCCESS(line))
+
+        if options["gc"] and not dry_run:
+            deleted, reclaimed = collect_garbage(grace=timedelta(minutes=options["gc_grace_minutes"]))
+            self.stdout.write(f"Blob GC: deleted {deleted} blobs, {_mb(reclaimed)} reclaimed")
+        elif released and not dry_run:
+            self.stdout.write(f"{_mb(released)} is reclaimed by the next gc_media_blobs run after its grace period.")
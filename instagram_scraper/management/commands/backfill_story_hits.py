@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from instagram_scraper.services.story_hits import backfill_story_hits, BACKFILL_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Fill the StoryHit table from the ai_hits JSON of already analysed stories."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BACKFILL_BATCH_SIZE,
+            help=f"Stories per transaction (default: {BACKFILL_BATCH_SIZE}).",
+        )
+        parser.add_argument("--rebuild", action="store_true", help="Rewrite hit rows for every analysed story.")
+
+    def handle(self, *args, **options):
+        stories, hits = backfill_story_hits(batch_size=options["batch_size"], rebuild=options["rebuild"])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {hits} hits for {stories} stories"))
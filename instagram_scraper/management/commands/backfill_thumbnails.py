@@ -0,0 +1,89 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from instagram_scraper.models import InstagramStory
+from instagram_scraper.services.thumbnails import render_thumbnail, save_thumbnail
+
+
+class Command(BaseCommand):
+    help = "Make WebP thumbnails / video poster frames for stories that have media but no thumbnail."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=max(1, (os.cpu_count() or 2) - 1),
+            help="Decoder processes (default: CPU count - 1).",
+        )
+        parser.add_argument(
+            "--max-pending",
+            type=int,
+            default=0,
+            help="Decodes queued or running at once (default: 2x workers).",
+        )
+        parser.add_argument("--batch-size", type=int, default=100, help="Rows updated per transaction (default: 100).")
+        parser.add_argument("--limit", type=int, default=0, help="Stop after this many stories (0 = all).")
+
+    def handle(self, *args, **options):
+        workers = options["workers"]
+        max_pending = options["max_pending"] or 2 * workers
+        batch_size = options["batch_size"]
+
+        qs = (
+            InstagramStory.objects
+            .filter(media_file__isnull=False)
+            .exclude(media_file="")
+            .filter(Q(thumbnail__isnull=True) | Q(thumbnail=""))
+            .order_by("id")
+            .values_list("id", "story_id", "media_file", "media_type")
+        )
+        if options["limit"]:
+            qs = qs[:options["limit"]]
+
+        stats = {"made": 0, "failed": 0, "missing": 0}
+        done = []  # (id, thumbnail name) waiting for the next batch update
+
+        def flush():
+            with transaction.atomic():
+                for pk, name in done:
+                    InstagramStory.objects.filter(pk=pk).update(thumbnail=name)
+            done.clear()
+
+        def collect(futures):
+            for future in futures:
+                pk, story_id = pending.pop(future)
+                try:
+                    data = future.result()
+                except Exception as e:
+                    data = None
+                    self.stderr.write(f"[THUMB] {story_id}: {e}")
+                if not data:
+                    stats["failed"] += 1
+                    continue
+                done.append((pk, save_thumbnail(story_id, data)))
+                stats["made"] += 1
+                if len(done) >= batch_size:
+                    flush()
+
+        # ✅ bounded: at most max_pending decodes queued, so memory stays flat on big tables
+        pending = {}
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for pk, story_id, media_name, media_type in qs.iterator(chunk_size=1000):
+                if not default_storage.exists(media_name):
+                    stats["missing"] += 1
+                    continue
+                while len(pending) >= max_pending:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(finished)
+                future = pool.submit(render_thumbnail, default_storage.path(media_name), media_type)
+                pending[future] = (pk, story_id)
+            collect(list(pending))
+        if done:
+            flush()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Thumbnails: made={stats['made']} failed={stats['failed']} missing media={stats['missing']}"
+        ))
@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand, CommandError
+from instagram_scraper.benchmarks.db_contention import run_contention_benchmark
+from instagram_scraper.benchmarks.scratch_db import SQLITE_CONFIGS, scratch_database
+
+
+class Command(BaseCommand):
+    help = (
+        "DB write-contention benchmark: N scraper-like writer threads plus the analyzer, "
+        "each round on a fresh throwaway SQLite DB."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--writers",
+            type=str,
+            default="1,4,8",
+            help="Comma-separated writer thread counts to compare (default: 1,4,8).",
+        )
+        parser.add_argument(
+            "--config",
+            type=str,
+            default=",".join(SQLITE_CONFIGS),
+            help="Comma-separated SQLite settings to compare: defaults (Django's) and/or tuned "
+                 "(settings.SQLITE_OPTIONS) (default: defaults,tuned).",
+        )
+        parser.add_argument("--analyzers", type=int, default=1, help="Analyzer threads (default: 1).")
+        parser.add_argument("--seconds", type=float, default=10, help="Duration of each round (default: 10).")
+        parser.add_argument("--stories-per-user", type=int, default=5, help="Stories inserted per scrape (default: 5).")
+        parser.add_argument("--analyze-ms", type=float, default=20, help="Simulated model time per story (default: 20).")
+        parser.add_argument("--prefix", type=str, default="dbbench", help="Username / story id prefix.")
+
+    def handle(self, *args, **options):
+        counts = [int(n) for n in options["writers"].split(",") if n.strip()]
+        configs = [c.strip() for c in options["config"].split(",") if c.strip()]
+        unknown = set(configs) - set(SQLITE_CONFIGS)
+        if unknown:
+            raise CommandError(f"unknown --config {', '.join(sorted(unknown))} (use {', '.join(SQLITE_CONFIGS)})")
+
+        for config in configs:
+            for writers in counts:
+                # a new file per round: journal mode (WAL) sticks to the file, and rows
+                # left by the previous round would change the workload
+                with scratch_database(config):
+                    r = run_contention_benchmark(
+                        writers=writers,
+                        analyzers=options["analyzers"],
+                        seconds=options["seconds"],
+                        stories_per_user=options["stories_per_user"],
+                        analyze_ms=options["analyze_ms"],
+                        prefix=options["prefix"],
+                    )
+                self.report(config, writers, r)
+
+    def report(self, config: str, writers: int, r: dict) -> None:
+        self.stdout.write(
+            f"[{config}] writers={writers} analyzers={r['analyzers']} "
+            f"total {r['total_writes_per_s']:.0f} writes/s"
+        )
+        for role in ("scrape", "analyze"):
+            stats = r[role]
+            line = (
+                f"  {role:<8} {stats['writes_per_s']:>7.0f}/s  p50 {stats['p50_ms']:.1f}ms "
+                f"p95 {stats['p95_ms']:.1f}ms max {stats['max_ms']:.0f}ms  lock errors={stats['lock_errors']}"
+            )
+            self.stdout.write(self.style.ERROR(line) if stats["lock_errors"] else line)
+        for error in r["errors"]:
+            self.stdout.write(self.style.ERROR(f"  {error}"))
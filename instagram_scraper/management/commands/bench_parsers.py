@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+from instagram_scraper.benchmarks.parsers import (
+    run_parser_benchmark,
+    load_baseline,
+    save_baseline,
+    find_regressions,
+    lxml_speedup,
+    BASELINE_FILE,
+    MIN_LXML_SPEEDUP,
+)
+
+
+class Command(BaseCommand):
+    help = "Benchmark the response parsers on the recorded corpus and fail on throughput regressions."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-seconds",
+            type=float,
+            default=0.5,
+            help="Time spent measuring each parser/fixture pair (default: 0.5).",
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.3,
+            help="Allowed drop in throughput relative to the reference parser vs. the baseline "
+                 "before failing (default: 0.3 = 30%%).",
+        )
+        parser.add_argument("--update-baseline", action="store_true", help=f"Write results to {BASELINE_FILE.name}.")
+
+    def handle(self, *args, **options):
+        rows = run_parser_benchmark(min_seconds=options["min_seconds"])
+
+        self.stdout.write(
+            f"{'fixture':<28} {'function':<22} {'KB':>9} {'ms/resp':>10} {'us/item':>10} {'MB/s':>9} {'x ref':>8}"
+        )
+        for r in rows:
+            self.stdout.write(
+                f"{r['fixture']:<28} {r['function']:<22} {r['bytes'] / 1024:>9.1f} "
+                f"{r['ms_per_response']:>10.3f} {r['us_per_item']:>10.2f} {r['mb_per_s']:>9.2f} {r['relative']:>8.2f}"
+            )
+
+        speedup = lxml_speedup(min_seconds=options["min_seconds"])
+        self.stdout.write(f"\nlxml story cards: {speedup:.1f}x faster than BeautifulSoup")
+
+        if options["update_baseline"]:
+            save_baseline(rows)
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {BASELINE_FILE}"))
+            return
+
+        baseline = load_baseline()
+        if not baseline:
+            self.stdout.write(self.style.WARNING("No baseline yet; run with --update-baseline to record one."))
+            return
+
+        problems = find_regressions(rows, baseline, options["tolerance"])
+        if speedup < MIN_LXML_SPEEDUP:
+            problems.append(f"lxml story cards only {speedup:.1f}x faster than BeautifulSoup (< {MIN_LXML_SPEEDUP}x)")
+        if problems:
+            for p in problems:
+                self.stdout.write(self.style.ERROR(f"[REGRESSION] {p}"))
+            raise CommandError(f"{len(problems)} parser throughput regressions")
+
+        self.stdout.write(self.style.SUCCESS("No parser throughput regressions."))
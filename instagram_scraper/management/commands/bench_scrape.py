@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from instagram_scraper.benchmarks.scrape_load import run_scrape_benchmark
+from .fake_upstream import add_upstream_arguments, upstream_config
+
+
+class Command(BaseCommand):
+    help = "End-to-end scrape load benchmark against a local stand-in upstream, on a throwaway SQLite DB."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=200, help="Synthetic usernames to scrape (default: 200).")
+        parser.add_argument("--workers", type=int, default=6, help="Scraper threads (default: 6).")
+        parser.add_argument("--download-workers", type=int, default=4, help="Media download threads (default: 4).")
+        parser.add_argument("--prefix", type=str, default="bench", help="Username prefix for the synthetic users.")
+        parser.add_argument("--keep", action="store_true", help="Keep the scratch DB and media afterwards (path is printed).")
+        parser.add_argument("--verbose-scrape", action="store_true", help="Print the scrape_users output.")
+        add_upstream_arguments(parser)
+
+    def handle(self, *args, **options):
+        r = run_scrape_benchmark(
+            users=options["users"],
+            workers=options["workers"],
+            download_workers=options["download_workers"],
+            config=upstream_config(options),
+            prefix=options["prefix"],
+            keep=options["keep"],
+        )
+
+        if options["verbose_scrape"]:
+            self.stdout.write(r["output"])
+
+        up = r["upstream"]
+        self.stdout.write(
+            f"{r['users']} users in {r['elapsed_s']:.1f}s "
+            f"(workers={r['workers']} download_workers={r['download_workers']})"
+        )
+        self.stdout.write(f"  users/min:   {r['users_per_min']:.0f}")
+        self.stdout.write(f"  stories/min: {r['stories_per_min']:.0f} ({r['new_stories']} stories, media failed={r['media_failed']})")
+        self.stdout.write(f"  bytes/s:     {r['bytes_per_s'] / (1024 * 1024):.2f}MB/s")
+        self.stdout.write(f"  DB writes/s: {r['db_writes_per_s']:.0f} ({r['db_writes']} statements, {r['db_rows_written']} rows)")
+        self.stdout.write(
+            f"  upstream: requests={up.get('requests', 0)} media={up.get('media', 0)} "
+            f"blocked={up.get('profile_blocked', 0)} unavailable={up.get('profile_unavailable', 0)} "
+            f"http_503={up.get('http_503', 0)}"
+        )
+        if r["scratch_dir"]:
+            self.stdout.write(f"Scratch DB and media kept in {r['scratch_dir']}")
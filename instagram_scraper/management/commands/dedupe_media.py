@@ -0,0 +1,102 @@
+import hashlib
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from instagram_scraper.models import InstagramUser, InstagramStory
+from instagram_scraper.services.blob_store import store_blob, is_blob_name
+
+LEGACY_DIRS = ("stories", "profile_pics")
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = "Move existing stories/ and profile_pics/ files into the content-addressed blob store."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report how much would be deduplicated.")
+        parser.add_argument(
+            "--delete-orphans",
+            action="store_true",
+            help="Also delete files in the legacy folders that no row references.",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        stats = {"files": 0, "missing": 0, "bytes_before": 0}
+        seen_hashes = {}  # sha256 -> size (for dry-run / reporting)
+
+        def migrate(model, field_name):
+            rows = (
+                model.objects
+                .exclude(**{f"{field_name}__isnull": True})
+                .exclude(**{field_name: ""})
+                .exclude(**{f"{field_name}__startswith": "blobs/"})
+                .only("pk", field_name)
+                .order_by("pk")
+            )
+            # ✅ id-keyset batches: each batch is read completely before its rows are
+            # updated (SQLite can skip or repeat rows updated under an open cursor)
+            last_pk = 0
+            while True:
+                batch = list(rows.filter(pk__gt=last_pk)[:BATCH_SIZE])
+                if not batch:
+                    return
+                last_pk = batch[-1].pk
+                for row in batch:
+                    migrate_row(model, field_name, row)
+
+        def migrate_row(model, field_name, row):
+            old_name = getattr(row, field_name).name
+            if is_blob_name(old_name):
+                return
+            if not default_storage.exists(old_name):
+                stats["missing"] += 1
+                return
+
+            with default_storage.open(old_name, "rb") as fh:
+                data = fh.read()
+
+            stats["files"] += 1
+            stats["bytes_before"] += len(data)
+            seen_hashes[hashlib.sha256(data).hexdigest()] = len(data)
+            if dry_run:
+                return
+
+            ext = old_name.rsplit(".", 1)[-1] if "." in old_name else "bin"
+            new_name = store_blob(data, ext)
+            model.objects.filter(pk=row.pk).update(**{field_name: new_name})
+            default_storage.delete(old_name)
+
+        migrate(InstagramStory, "media_file")
+        migrate(InstagramUser, "profile_pic")
+
+        bytes_after = sum(seen_hashes.values())
+        self.stdout.write(
+            f"{'Would migrate' if dry_run else 'Migrated'} {stats['files']} files "
+            f"({stats['bytes_before'] / (1024 * 1024):.1f}MB) into {len(seen_hashes)} blobs "
+            f"({bytes_after / (1024 * 1024):.1f}MB). Missing files: {stats['missing']}"
+        )
+
+        # Whatever is left in the legacy folders is not referenced by any row
+        orphans = []
+        for folder in LEGACY_DIRS:
+            if not default_storage.exists(folder):
+                continue
+            _, files = default_storage.listdir(folder)
+            orphans.extend(f"{folder}/{name}" for name in files)
+
+        referenced = set()
+        if dry_run and orphans:
+            referenced.update(InstagramStory.objects.values_list("media_file", flat=True).iterator(chunk_size=5000))
+            referenced.update(InstagramUser.objects.values_list("profile_pic", flat=True).iterator(chunk_size=5000))
+        orphans = [name for name in orphans if name not in referenced]
+
+        orphan_bytes = sum(default_storage.size(name) for name in orphans)
+        if options["delete_orphans"] and not dry_run:
+            for name in orphans:
+                default_storage.delete(name)
+            self.stdout.write(f"Deleted {len(orphans)} orphan files ({orphan_bytes / (1024 * 1024):.1f}MB)")
+        elif orphans:
+            self.stdout.write(
+                f"{len(orphans)} unreferenced files ({orphan_bytes / (1024 * 1024):.1f}MB) remain; "
+                f"use --delete-orphans to remove them"
+            )
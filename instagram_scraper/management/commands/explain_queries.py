@@ -0,0 +1,82 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from instagram_scraper.models import InstagramStory, InstagramUser
+from instagram_scraper.services.story_feed import story_queryset
+from instagram_scraper.services.story_hits import keyword_hits, user_hits
+
+
+def hot_queries() -> dict:
+    """The story queries the scraper, daemon, analysis service and browsing pages run most."""
+    user = InstagramUser.objects.order_by("id").first()
+    user_id = user.id if user else 0
+    username = user.username if user else ""
+    since = timezone.now() - timedelta(days=7)
+    return {
+        "analysis poll": InstagramStory.objects.analysis_queue()[:10],
+        "user timeline": InstagramStory.objects.filter(username_id=user_id).order_by("-timestamp")[:50],
+        "daemon history": InstagramStory.objects.filter(username__username=username, timestamp__gte=since)
+        .values_list("timestamp", flat=True),
+        "interesting stories": InstagramStory.objects.filter(ai_is_interesting=True).order_by("-timestamp")[:50],
+        "global timeline": InstagramStory.objects.order_by("-timestamp")[:50],
+        "pending sweep": InstagramStory.objects.unready().filter(media_status=InstagramStory.MEDIA_PENDING),
+        "keyword hits": keyword_hits("tank", since=since, usernames=[username]),
+        "user hits": user_hits(username, since=since),
+        # stories API, a page deep into the feed: (timestamp, id) keyset
+        "stories page": story_queryset(before=(since, 1000))[:50],
+        "user stories page": story_queryset(usernames=[username], before=(since, 1000))[:50],
+    }
+
+
+def plan_problems(plan: str, vendor: str) -> list[str]:
+    """Plan lines that mean a full scan or an extra sort."""
+    problems = []
+    for line in plan.splitlines():
+        if vendor == "sqlite":
+            if "SCAN" in line and not any(ok in line for ok in ("USING INDEX", "COVERING INDEX", "INTEGER PRIMARY KEY")):
+                problems.append(line.strip())
+            elif "USE TEMP B-TREE" in line:
+                problems.append(line.strip())
+        elif vendor == "postgresql" and "Seq Scan" in line:
+            problems.append(line.strip())
+    return problems
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the hot story queries and fail if any of them scans the table or sorts without an index."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--no-fail", action="store_true", help="Report problems without a non-zero exit.")
+
+    def _explain(self, qs) -> str:
+        if connection.vendor != "postgresql":
+            return qs.explain()
+        # a near-empty table always gets a Seq Scan; ask whether an index plan exists at all
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+            return qs.explain()
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        self.stdout.write(f"Database: {vendor}, {InstagramStory.objects.count()} stories")
+
+        flagged = 0
+        for name, qs in hot_queries().items():
+            plan = self._explain(qs)
+            started = time.perf_counter()
+            list(qs)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+            problems = plan_problems(plan, vendor)
+            status = self.style.ERROR("FULL SCAN / SORT") if problems else self.style.SUCCESS("ok")
+            self.stdout.write(f"\n[{name}] {elapsed_ms:.1f}ms {status}")
+            for line in plan.splitlines():
+                self.stdout.write(f"    {line}")
+            flagged += bool(problems)
+
+        if flagged and not options["no_fail"]:
+            raise CommandError(f"{flagged} queries without a usable index")
+        self.stdout.write(self.style.SUCCESS(f"\nDone. {flagged} queries flagged"))
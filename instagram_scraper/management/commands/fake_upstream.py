@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from instagram_scraper.benchmarks.upstream import StandInUpstream, UpstreamConfig
+
+
+def add_upstream_arguments(parser):
+    """Options shared by `fake_upstream` and `bench_scrape`."""
+    defaults = UpstreamConfig()
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms, help="Mean profile/stories latency.")
+    parser.add_argument("--media-latency-ms", type=float, default=defaults.media_latency_ms, help="Mean media latency.")
+    parser.add_argument("--private-rate", type=float, default=defaults.private_rate, help="Share of private accounts.")
+    parser.add_argument("--not-found-rate", type=float, default=defaults.not_found_rate, help="Share of missing accounts.")
+    parser.add_argument("--blocked-rate", type=float, default=defaults.blocked_rate, help="Share of 'temporarily blocked' answers.")
+    parser.add_argument(
+        "--unavailable-rate",
+        type=float,
+        default=defaults.unavailable_rate,
+        help="Share of 'temporarily unavailable' answers.",
+    )
+    parser.add_argument("--http-error-rate", type=float, default=defaults.http_error_rate, help="Share of HTTP 503 answers.")
+    parser.add_argument("--stories-per-user", type=int, default=defaults.stories_per_user, help="Mean stories per public user.")
+    parser.add_argument("--media-kb", type=int, default=defaults.media_kb, help="Mean media size in KB.")
+    parser.add_argument("--seed", type=int, default=defaults.seed, help="Changes which accounts/stories exist.")
+
+
+def upstream_config(options) -> UpstreamConfig:
+    return UpstreamConfig(
+        latency_ms=options["latency_ms"],
+        media_latency_ms=options["media_latency_ms"],
+        private_rate=options["private_rate"],
+        not_found_rate=options["not_found_rate"],
+        blocked_rate=options["blocked_rate"],
+        unavailable_rate=options["unavailable_rate"],
+        http_error_rate=options["http_error_rate"],
+        stories_per_user=options["stories_per_user"],
+        media_kb=options["media_kb"],
+        seed=options["seed"],
+    )
+
+
+class Command(BaseCommand):
+    help = "Run a local stand-in for the upstream story site (point scrape_users --base-url at it)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", type=str, default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        add_upstream_arguments(parser)
+
+    def handle(self, *args, **options):
+        upstream = StandInUpstream(upstream_config(options), host=options["host"], port=options["port"])
+        self.stdout.write(f"Stand-in upstream listening on {upstream.url} (Ctrl+C to stop)")
+        self.stdout.write(f"  e.g. python manage.py scrape_users --file users.txt --base-url {upstream.url} --no-tor")
+        try:
+            upstream.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stdout.write(f"Served: {upstream.stats()}")
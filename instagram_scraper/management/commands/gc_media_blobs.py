@@ -0,0 +1,24 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from instagram_scraper.services.blob_store import collect_garbage
+
+
+class Command(BaseCommand):
+    help = "Delete content-addressed media blobs that no story or profile references."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-minutes",
+            type=int,
+            default=60,
+            help="Only collect blobs unreferenced for at least this long (default: 60).",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be deleted.")
+
+    def handle(self, *args, **options):
+        deleted, reclaimed = collect_garbage(
+            grace=timedelta(minutes=options["grace_minutes"]),
+            dry_run=options["dry_run"],
+        )
+        verb = "Would delete" if options["dry_run"] else "Deleted"
+        self.stdout.write(f"{verb} {deleted} unreferenced blobs, {reclaimed / (1024 * 1024):.1f}MB reclaimed")
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from instagram_scraper.services.caption_search import rebuild_caption_index, BACKFILL_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Rebuild the SQLite FTS5 caption index from ai_caption (Postgres indexes captions by itself)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BACKFILL_BATCH_SIZE,
+            help=f"Stories per batch (default: {BACKFILL_BATCH_SIZE}).",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            self.stdout.write(f"Nothing to do on {connection.vendor}: the caption index is an expression index.")
+            return
+        indexed = rebuild_caption_index(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} captions"))
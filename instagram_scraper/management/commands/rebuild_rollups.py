@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from instagram_scraper.services.rollups import compute_rollups, current_rollups, diff_rollups, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the dashboard rollup tables from the story table (or only compare them with --check)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report rows that drifted; exit non-zero if any did.",
+        )
+
+    def handle(self, *args, **options):
+        expected = compute_rollups()
+        diffs = diff_rollups(expected, current_rollups())
+        drifted = sum(diffs.values())
+        self.stdout.write(
+            f"Rollup rows differing from the story table: daily={diffs['daily']} "
+            f"user={diffs['user']} keyword={diffs['keyword']}"
+        )
+
+        if options["check"]:
+            if drifted:
+                raise CommandError(f"{drifted} rollup rows out of date (run rebuild_rollups)")
+            self.stdout.write(self.style.SUCCESS("Rollups are consistent"))
+            return
+
+        counts = rebuild_rollups(expected)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt rollups: daily={counts['daily']} user={counts['user']} keyword={counts['keyword']} rows"
+        ))
@@ -0,0 +1,237 @@
+import random
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from instagram_scraper.models import InstagramUser, InstagramStory
+from instagram_scraper.scraper.instagram import scrape_instagram
+from instagram_scraper.scraper.client import PAUSE_GATE, pause_wait_stats
+from instagram_scraper.scraper.scheduler import DueHeap, next_poll_interval
+from instagram_scraper import metrics, tracing
+from instagram_scraper.metrics import MetricsFileWriter
+from instagram_scraper.services.download_pool import DownloadPool
+from instagram_scraper.services.story_saver import pending_download_count, reset_pending_downloads
+from instagram_scraper.services.story_index import load_known_story_index
+
+
+class Command(BaseCommand):
+    help = "Long-running story poller: scrapes each user when due, at a rate adapted to their activity."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--file", type=str, help="Optional txt file with extra usernames (re-read on every refresh).")
+        parser.add_argument(
+            "--reset-pending",
+            action="store_true",
+            help="Retry downloads left PENDING by an interrupted run. Only use it when no other "
+                 "scrape_users / scrape_daemon is running: their in-flight downloads are PENDING too.",
+        )
+        parser.add_argument("--workers", type=int, default=6, help="Number of scraper threads (default: 6).")
+        parser.add_argument("--download-workers", type=int, default=4, help="Number of media download threads (default: 4).")
+        parser.add_argument("--download-queue", type=int, default=200, help="Max queued media downloads (default: 200).")
+        parser.add_argument("--download-rate", type=int, default=0, help="Download limit in bytes/second (default: 0 = unlimited).")
+        parser.add_argument(
+            "--history-days",
+            type=int,
+            default=14,
+            help="Days of stored stories used to estimate how often a user posts (default: 14).",
+        )
+        parser.add_argument(
+            "--jitter",
+            type=float,
+            default=0.1,
+            help="Random +/- fraction applied to every interval to spread load (default: 0.1).",
+        )
+        parser.add_argument(
+            "--metrics-file",
+            type=str,
+            default=None,
+            help="Keep Prometheus metrics in this file (point settings.SCRAPER_METRICS_FILE at it for /scraper/metrics/).",
+        )
+        parser.add_argument("--metrics-interval", type=float, default=15, help="Seconds between metrics file updates (default: 15).")
+        parser.add_argument("--trace-file", type=str, default=None, help="Write sampled per-user traces here (Chrome trace JSON).")
+        parser.add_argument("--trace-sample", type=float, default=0.01, help="Share of users traced with --trace-file (default: 0.01).")
+        parser.add_argument(
+            "--trace-slow-seconds",
+            type=float,
+            default=None,
+            help="With --trace-file, also keep the trace of every user slower than this.",
+        )
+        parser.add_argument(
+            "--refresh-minutes",
+            type=float,
+            default=10,
+            help="How often to pick up new usernames from the DB / --file (default: 10).",
+        )
+
+    def check_pending(self, reset: bool) -> None:
+        # PENDING rows are downloads in flight, here or in another scraper process; ones
+        # left by an interrupted run only come back with --reset-pending
+        if reset:
+            stale = reset_pending_downloads()
+            if stale:
+                self.stdout.write(self.style.WARNING(f"{stale} pending downloads reset, they will be re-downloaded"))
+            return
+        pending = pending_download_count()
+        if pending:
+            self.stdout.write(
+                f"{pending} stories have downloads pending (another run, or an interrupted one: "
+                f"--reset-pending retries them)"
+            )
+
+    def handle(self, *args, **options):
+        self.options = options
+        workers = options["workers"]
+
+        self.check_pending(options["reset_pending"])
+
+        known_index = load_known_story_index("set")
+        download_pool = DownloadPool(
+            workers=options["download_workers"],
+            max_pending=options["download_queue"],
+            bytes_per_second=options["download_rate"],
+        )
+
+        heap = DueHeap()
+        in_flight = {}  # future -> username
+        self.outcomes = Counter()
+        started = time.time()
+        refresh_every = options["refresh_minutes"] * 60
+        next_refresh = 0.0
+
+        def poll(username):
+            try:
+                return scrape_instagram(
+                    username,
+                    log_callback=lambda msg: self.stdout.write(f"[{username}] {msg}"),
+                    download_pool=download_pool,
+                    known_index=known_index,
+                )
+            finally:
+                close_old_connections()
+
+        if options["trace_file"]:
+            tracing.configure(sample_rate=options["trace_sample"], slow_seconds=options["trace_slow_seconds"])
+
+        metrics_writer = None
+        if options["metrics_file"]:
+            metrics_writer = MetricsFileWriter(options["metrics_file"], options["metrics_interval"]).start()
+
+        self.stdout.write(f"[DAEMON] Started. Workers={workers} DownloadWorkers={download_pool.workers}")
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as ex:
+                while True:
+                    now = time.time()
+                    if now >= next_refresh:
+                        added = self._load_targets(heap, in_flight.values(), now)
+                        next_refresh = now + refresh_every
+                        if options["trace_file"]:
+                            tracing.get_tracer().write(options["trace_file"])
+                        polls = sum(self.outcomes.values())
+                        hours = max((now - started) / 3600, 1 / 3600)
+                        ps = pause_wait_stats()
+                        self.stdout.write(
+                            f"[DAEMON] users scheduled={len(heap) + len(in_flight)} (+{added} new) "
+                            f"polls={polls} ({polls / hours:.0f}/h) outcomes={dict(self.outcomes)} "
+                            f"pause_waited={ps['wait_seconds']:.0f}s"
+                        )
+
+                    # ✅ hand due users to free workers, earliest first; nothing new during a global pause
+                    remaining = PAUSE_GATE.remaining()
+                    while remaining <= 0 and len(in_flight) < workers:
+                        u = heap.pop_due(now)
+                        if u is None:
+                            break
+                        in_flight[ex.submit(poll, u)] = u
+
+                    metrics.USER_QUEUE_DEPTH.set(len(heap))
+                    metrics.USERS_IN_FLIGHT.set(len(in_flight))
+
+                    timeout = next_refresh - now
+                    if len(in_flight) < workers:
+                        delay = heap.next_delay(now)
+                        if delay is not None:
+                            timeout = min(timeout, delay)
+                    if remaining > 0:
+                        timeout = min(timeout, remaining)
+                    timeout = max(timeout, 0.05)
+
+                    if not in_flight:
+                        if remaining > 0:
+                            # released the moment the pause ends (or is cleared)
+                            PAUSE_GATE.wait(timeout)
+                        else:
+                            time.sleep(timeout)
+                        continue
+
+                    done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        self._reschedule(in_flight.pop(fut), fut, heap)
+        except KeyboardInterrupt:
+            self.stdout.write("[DAEMON] Stopping, waiting for queued media downloads...")
+        finally:
+            download_pool.shutdown(wait=True)
+            if metrics_writer:
+                metrics_writer.stop()
+            if options["trace_file"]:
+                tracing.get_tracer().write(options["trace_file"])
+
+    def _load_targets(self, heap: DueHeap, busy, now: float) -> int:
+        """Schedule every known user (DB + --file) that isn't queued or running yet."""
+        busy = set(busy)
+        added = 0
+
+        due_times = dict(InstagramUser.objects.values_list("username", "next_due_at").iterator(chunk_size=5000))
+
+        path = self.options.get("file")
+        if path:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    due_times.setdefault(line.strip(), None)
+            due_times.pop("", None)
+
+        for username, due_at in due_times.items():
+            if username in heap or username in busy:
+                continue
+            # never polled by the daemon -> due now
+            heap.schedule(username, due_at.timestamp() if due_at else now)
+            added += 1
+
+        return added
+
+    def _reschedule(self, username: str, fut, heap: DueHeap) -> None:
+        now = time.time()
+        try:
+            res = fut.result()
+            profile = res.get("profile", "unknown") if isinstance(res, dict) else "error"
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"[FAIL] {username}: {e}"))
+            res, profile = {}, "error"
+
+        self.outcomes[profile] += 1
+
+        since = datetime.fromtimestamp(now, tz=dt_timezone.utc) - timedelta(days=self.options["history_days"])
+        story_times = [
+            ts.timestamp()
+            for ts in InstagramStory.objects
+            .filter(username__username=username, timestamp__gte=since)
+            .values_list("timestamp", flat=True)
+        ]
+
+        jitter = self.options["jitter"]
+        interval = next_poll_interval(profile, story_times, now) * random.uniform(1 - jitter, 1 + jitter)
+        if profile == "blocked":
+            interval = max(interval, PAUSE_GATE.remaining())
+        due = now + interval
+
+        InstagramUser.objects.filter(username=username).update(
+            next_due_at=datetime.fromtimestamp(due, tz=dt_timezone.utc)
+        )
+        heap.schedule(username, due)
+
+        self.stdout.write(
+            f"[{profile.upper()}] {username} stories found={int(res.get('stories_found', 0) or 0)} "
+            f"saved={int(res.get('stories_saved', 0) or 0)} -> next poll in {interval / 3600:.1f}h"
+        )
@@ -1,8 +1,26 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from django.core.management.base import BaseCommand
+from django.db import close_old_connections
 from instagram_scraper.scraper.instagram import scrape_instagram
-from instagram_scraper.scraper.client import wait_for_pause_to_end, get_pause_remaining_seconds
+from instagram_scraper.scraper.client import PAUSE_GATE, wait_for_pause_to_end, pause_wait_stats
+from instagram_scraper.scraper.scheduler import RetryQueue, UtilizationTracker
+from instagram_scraper.scraper.event_log import EventLog
+from instagram_scraper import metrics, tracing
+from instagram_scraper.metrics import MetricsFileWriter
+from instagram_scraper.services.download_pool import DownloadPool
+from instagram_scraper.services.story_saver import pending_download_count, reset_pending_downloads
+from instagram_scraper.services.story_index import load_known_story_index
+from instagram_scraper.services.profile_saver import profile_pic_stats
+from instagram_scraper.services.checkpoints import (
+    start_or_resume_run,
+    skip_recently_scraped,
+    record_attempt,
+    record_checkpoint,
+    finish_run,
+)
 import threading
+import time
+from datetime import timedelta
 
 
 class Command(BaseCommand):
@@ -10,6 +28,12 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("--file", type=str, required=True, help="Path to a txt file with usernames (one per line).")
+        parser.add_argument(
+            "--reset-pending",
+            action="store_true",
+            help="Retry downloads left PENDING by an interrupted run. Only use it when no other "
+                 "scrape_users / scrape_daemon is running: their in-flight downloads are PENDING too.",
+        )
         parser.add_argument("--workers", type=int, default=6, help="Number of threads (default: 6).")
         parser.add_argument(
             "--blocked-retries",
@@ -17,17 +41,127 @@ class Command(BaseCommand):
             default=2,
             help="How many times to retry a username if temporarily blocked (default: 2).",
         )
+        parser.add_argument("--download-workers", type=int, default=4, help="Number of media download threads (default: 4).")
+        parser.add_argument(
+            "--download-queue",
+            type=int,
+            default=200,
+            help="Max queued media downloads before scraper threads wait (default: 200).",
+        )
+        parser.add_argument(
+            "--download-rate",
+            type=int,
+            default=0,
+            help="Total media download rate limit in bytes/second (default: 0 = unlimited).",
+        )
+        parser.add_argument(
+            "--known-index",
+            choices=["set", "bloom", "none"],
+            default="set",
+            help="In-memory index of stored story IDs: exact set, compact Bloom filter, or none (default: set).",
+        )
+        parser.add_argument(
+            "--bloom-fp-rate",
+            type=float,
+            default=0.001,
+            help="Target false-positive rate for --known-index=bloom (default: 0.001).",
+        )
+        parser.add_argument(
+            "--fresh",
+            action="store_true",
+            help="Start a new run instead of resuming the last unfinished run over the same usernames file.",
+        )
+        parser.add_argument(
+            "--min-interval",
+            type=float,
+            default=0,
+            help="Skip users scraped less than this many minutes ago (default: 0 = scrape everyone).",
+        )
+        parser.add_argument(
+            "--base-url",
+            type=str,
+            default=None,
+            help="Scrape this upstream instead of the real site (e.g. a local `fake_upstream` server).",
+        )
+        parser.add_argument("--no-tor", action="store_true", help="Send requests directly instead of through Tor.")
+        parser.add_argument(
+            "--metrics-file",
+            type=str,
+            default=None,
+            help="Keep Prometheus metrics in this file (point settings.SCRAPER_METRICS_FILE at it for /scraper/metrics/).",
+        )
+        parser.add_argument("--metrics-interval", type=float, default=15, help="Seconds between metrics file updates (default: 15).")
+        parser.add_argument("--trace-file", type=str, default=None, help="Write sampled per-user traces here (Chrome trace JSON).")
+        parser.add_argument("--trace-sample", type=float, default=0.01, help="Share of users traced with --trace-file (default: 0.01).")
+        parser.add_argument(
+            "--trace-slow-seconds",
+            type=float,
+            default=None,
+            help="With --trace-file, also keep the trace of every user slower than this.",
+        )
+        parser.add_argument("--log-jsonl", type=str, default=None, help="Also append every event as one JSON line to this file.")
+        parser.add_argument(
+            "--log-rate",
+            type=int,
+            default=0,
+            help="Max routine console lines per second; the rest only show up in summaries (default: 0 = no limit).",
+        )
+        parser.add_argument(
+            "--summary-seconds",
+            type=float,
+            default=30,
+            help="Print a progress summary this often (default: 30, 0 = only at the end).",
+        )
+
+    def check_pending(self, reset: bool) -> None:
+        # PENDING rows are downloads in flight, here or in another scraper process; ones
+        # left by an interrupted run only come back with --reset-pending
+        if reset:
+            stale = reset_pending_downloads()
+            if stale:
+                self.stdout.write(self.style.WARNING(f"{stale} pending downloads reset, they will be re-downloaded"))
+            return
+        pending = pending_download_count()
+        if pending:
+            self.stdout.write(
+                f"{pending} stories have downloads pending (another run, or an interrupted one: "
+                f"--reset-pending retries them)"
+            )
 
     def handle(self, *args, **options):
         path = options["file"]
         workers = options["workers"]
         blocked_retries = options["blocked_retries"]
 
+        self.check_pending(options["reset_pending"])
+
+        known_index = None
+        if options["known_index"] != "none":
+            known_index = load_known_story_index(options["known_index"], fp_rate=options["bloom_fp_rate"])
+            self.stdout.write(f"Loaded {len(known_index)} known story IDs ({options['known_index']} index)")
+
+        download_pool = DownloadPool(
+            workers=options["download_workers"],
+            max_pending=options["download_queue"],
+            bytes_per_second=options["download_rate"],
+        )
+
         with open(path, "r", encoding="utf-8") as f:
             usernames = [line.strip() for line in f if line.strip()]
 
+        # ✅ resume the last unfinished run over this file (pending + failed users), skip users scraped recently
+        run, usernames, prior_attempts, resumed = start_or_resume_run(path, usernames, fresh=options["fresh"])
+        if resumed:
+            self.stdout.write(self.style.WARNING(f"Resuming run #{run.pk}: {len(usernames)} usernames left"))
+
+        min_interval = timedelta(minutes=options["min_interval"])
+        before = len(usernames)
+        usernames = skip_recently_scraped(run, usernames, min_interval)
+        if before != len(usernames):
+            self.stdout.write(f"Skipping {before - len(usernames)} usernames scraped in the last {options['min_interval']:g} minutes")
+
         total_users = len(usernames)
-        self.stdout.write(f"Loaded {total_users} usernames. Workers={workers}")
+        self.stdout.write(f"Loaded {total_users} usernames. Workers={workers} DownloadWorkers={download_pool.workers}")
 
         results = {"ok": 0, "skipped": 0, "failed": 0}
         done_users = 0  # ✅ counts only final outcomes (OK/SKIP/FAIL)
@@ -38,8 +172,29 @@ class Command(BaseCommand):
         # attempt count per user (for logging)
         attempts = {u: 0 for u in usernames}
 
-        # pending usernames queue
-        pending = list(usernames)
+        def record_outcome(u, key):
+            """Count a final outcome and checkpoint it so a restarted run won't redo this user."""
+            results[key] += 1
+            record_checkpoint(run, u, key, prior_attempts.get(u, 0) + attempts[u])
+
+        # ✅ workers only enqueue events; one writer thread prints them (and writes JSONL)
+        events = EventLog(
+            self.stdout,
+            styles={
+                "success": self.style.SUCCESS,
+                "warning": self.style.WARNING,
+                "error": self.style.ERROR,
+                "summary": self.style.MIGRATE_HEADING,
+            },
+            jsonl_path=options["log_jsonl"],
+            summary_every=options["summary_seconds"],
+            max_lines_per_second=options["log_rate"],
+            total=total_users,
+        )
+
+        # pending usernames queue (+ delayed retries)
+        queue = RetryQueue(usernames)
+        utilization = UtilizationTracker(workers)
 
         # Thread tracking - assign sequential numbers to worker threads only
         # Map thread identifiers to worker numbers (1 to workers)
@@ -62,137 +217,215 @@ class Command(BaseCommand):
         def scrape_with_thread_info(username):
             """Wrapper to capture thread info and return it with the result"""
             thread_num = get_thread_number()
-            
-            # Create logging callback that includes thread info and progress
-            def log_message(message):
-                # Use done_users (not incremented yet) for the progress display
-                current_progress = done_users
-                self.stdout.write(self.style.SUCCESS(
-                    f"[{current_progress}/{total_users}] [Thread {thread_num}] [OK] {message}"
-                ))
-            
-            result = scrape_instagram(username, log_callback=log_message)
+
+            # worker messages become structured events; the writer thread renders them
+            log_message = events.callback(user=username, thread=thread_num, stage="scrape", tag="OK", level="success")
+
+            started = time.monotonic()
+            try:
+                result = scrape_instagram(
+                    username,
+                    log_callback=log_message,
+                    download_pool=download_pool,
+                    known_index=known_index,
+                    base_url=options["base_url"],
+                    use_tor=not options["no_tor"],
+                )
+            finally:
+                duration = time.monotonic() - started
+                utilization.record(duration)
+                # worker threads outlive the command's own connection handling
+                close_old_connections()
             if isinstance(result, dict):
                 result['_thread_num'] = thread_num
+                result['_duration'] = duration
             return result
 
-        with ThreadPoolExecutor(max_workers=workers) as ex:
-            while pending:
-                # Respect any active pause before submitting more work
-                remaining = get_pause_remaining_seconds()
-                if remaining > 0:
-                    self.stdout.write(self.style.WARNING(f"[PAUSE] Waiting {remaining}s before retrying..."))
-                    wait_for_pause_to_end()
-
-                # Submit up to `workers` jobs at a time
-                batch = []
-                while pending and len(batch) < workers:
-                    u = pending.pop(0)
-                    attempts[u] += 1
-                    batch.append(u)
-
-                future_map = {ex.submit(scrape_with_thread_info, u): u for u in batch}
-
-                for fut in as_completed(future_map):
-                    u = future_map[fut]
-
-                    try:
-                        res = fut.result()
-                        if not isinstance(res, dict):
-                            results["failed"] += 1
-                            done_users += 1
-                            thread_num = get_thread_number()
-                            self.stdout.write(self.style.ERROR(
-                                f"[{done_users}/{total_users}] [Thread {thread_num}] [FAIL] {u}: bad result type"
-                            ))
-                            continue
-
-                        profile = res.get("profile", "unknown")
-                        sf = int(res.get("stories_found", 0) or 0)
-                        ss = int(res.get("stories_saved", 0) or 0)
-                        thread_num = res.get("_thread_num", get_thread_number())
-
-                        # ✅ BLOCKED -> retry without incrementing done_users
-                        if profile == "blocked":
-                            if retries_left.get(u, 0) > 0:
-                                retries_left[u] -= 1
-                                pause_s = res.get("pause_seconds", "?")
-                                total_attempts_allowed = blocked_retries + 1
-                                self.stdout.write(self.style.WARNING(
-                                    f"[{done_users}/{total_users}] [Thread {thread_num}] [BLOCKED] {u} "
-                                    f"(attempt {attempts[u]}/{total_attempts_allowed}) -> pausing {pause_s}s, "
-                                    f"will retry (left={retries_left[u]})"
-                                ))
-                                pending.append(u)
-                                wait_for_pause_to_end()
-                            else:
-                                results["skipped"] += 1
-                                done_users += 1
-                                self.stdout.write(self.style.WARNING(
-                                    f"[{done_users}/{total_users}] [Thread {thread_num}] [SKIP] {u} blocked (no retries left)"
-                                ))
-                            continue
-
-                        # ✅ ERROR -> simple retry without pause/circuit rotation
-                        # Just retry the request - sometimes website returns temporary errors
-                        if profile == "error":
-                            if retries_left.get(u, 0) > 0:
-                                retries_left[u] -= 1
-                                total_attempts_allowed = blocked_retries + 1
-                                self.stdout.write(self.style.WARNING(
-                                    f"[{done_users}/{total_users}] [Thread {thread_num}] [ERROR] {u} "
-                                    f"(attempt {attempts[u]}/{total_attempts_allowed}) -> will retry (left={retries_left[u]})"
-                                ))
-                                # Small delay before retry (no pause, no circuit rotation)
-                                import time
-                                time.sleep(1)  # Just a small delay
-                                pending.append(u)
-                            else:
-                                results["skipped"] += 1
-                                done_users += 1
-                                self.stdout.write(self.style.WARNING(
-                                    f"[{done_users}/{total_users}] [Thread {thread_num}] [SKIP] {u} error after {blocked_retries + 1} attempts (assuming user doesn't exist)"
-                                ))
-                            continue
-
-                        # ✅ FINAL OUTCOMES (increment done_users once per username)
-                        if profile == "public":
-                            results["ok"] += 1
-                            done_users += 1
-                            if sf == 0:
-                                self.stdout.write(self.style.SUCCESS(
-                                    f"[{done_users}/{total_users}] [Thread {thread_num}] [OK] {u} public, no stories "
-                                    f"(attempt {attempts[u]}/{blocked_retries + 1})"
-                                ))
-                            else:
-                                self.stdout.write(self.style.SUCCESS(
-                                    f"[{done_users}/{total_users}] [Thread {thread_num}] [OK] {u} public, stories found={sf}, saved={ss} "
-                                    f"(attempt {attempts[u]}/{blocked_retries + 1})"
-                                ))
-
-                        elif profile == "not_found":
-                            results["skipped"] += 1
-                            done_users += 1
-                            self.stdout.write(self.style.WARNING(
-                                f"[{done_users}/{total_users}] [Thread {thread_num}] [SKIP] {u} not found "
-                                f"(attempt {attempts[u]}/{blocked_retries + 1})"
-                            ))
+        def report(u, tag, text, level="success", outcome=None, thread_num=None, **fields):
+            """Queue one per-user event; final outcomes also count towards the summaries."""
+            events.emit(
+                "retry" if outcome is None else "outcome",
+                level=level,
+                tag=tag,
+                user=u,
+                thread=thread_num,
+                progress=f"{done_users}/{total_users}",
+                outcome=outcome,
+                attempt=attempts[u],
+                max_attempts=blocked_retries + 1,
+                msg=f"{text} (attempt {attempts[u]}/{blocked_retries + 1})",
+                **fields,
+            )
 
-                        else:
-                            results["skipped"] += 1
-                            done_users += 1
-                            self.stdout.write(self.style.WARNING(
-                                f"[{done_users}/{total_users}] [Thread {thread_num}] [SKIP] {u} is {profile} (skipping stories) "
-                                f"(attempt {attempts[u]}/{blocked_retries + 1})"
-                            ))
-
-                    except Exception as e:
-                        results["failed"] += 1
+        def handle_result(u, fut):
+            """Log the outcome of one finished job and requeue it if it should be retried."""
+            nonlocal done_users
+            try:
+                res = fut.result()
+                if not isinstance(res, dict):
+                    record_outcome(u, "failed")
+                    done_users += 1
+                    report(u, "FAIL", f"{u}: bad result type", level="error", outcome="failed")
+                    return
+
+                profile = res.get("profile", "unknown")
+                sf = int(res.get("stories_found", 0) or 0)
+                ss = int(res.get("stories_saved", 0) or 0)
+                thread_num = res.get("_thread_num", get_thread_number())
+                timing = {
+                    "thread_num": thread_num,
+                    "profile": profile,
+                    "stories_found": sf,
+                    "stories_saved": ss,
+                    "duration_s": res.get("_duration"),
+                }
+
+                # ✅ BLOCKED -> retry without incrementing done_users
+                if profile == "blocked":
+                    if retries_left.get(u, 0) > 0:
+                        retries_left[u] -= 1
+                        pause_s = res.get("pause_seconds", "?")
+                        report(u, "BLOCKED", f"{u} -> pausing {pause_s}s, will retry (left={retries_left[u]})",
+                               level="warning", **timing)
+                        # back in line once the global pause is over; other workers keep going
+                        queue.push_later(u, PAUSE_GATE.remaining())
+                    else:
+                        record_outcome(u, "skipped")
                         done_users += 1
-                        thread_num = get_thread_number()
-                        self.stdout.write(self.style.ERROR(
-                            f"[{done_users}/{total_users}] [Thread {thread_num}] [FAIL] {u}: {e} "
-                            f"(attempt {attempts[u]}/{blocked_retries + 1})"
-                        ))
+                        report(u, "SKIP", f"{u} blocked (no retries left)", level="warning", outcome="skipped", **timing)
+                    return
+
+                # ✅ ERROR -> simple retry without pause/circuit rotation
+                # Just retry the request - sometimes website returns temporary errors
+                if profile == "error":
+                    if retries_left.get(u, 0) > 0:
+                        retries_left[u] -= 1
+                        report(u, "ERROR", f"{u} -> will retry (left={retries_left[u]})", level="warning", **timing)
+                        # Small delay before retry (no pause, no circuit rotation)
+                        queue.push_later(u, 1.0)
+                    else:
+                        record_outcome(u, "skipped")
+                        done_users += 1
+                        report(u, "SKIP", f"{u} error after {blocked_retries + 1} attempts (assuming user doesn't exist)",
+                               level="warning", outcome="skipped", **timing)
+                    return
+
+                # ✅ FINAL OUTCOMES (increment done_users once per username)
+                if profile == "public":
+                    record_outcome(u, "ok")
+                    done_users += 1
+                    text = f"{u} public, no stories" if sf == 0 else f"{u} public, stories found={sf}, saved={ss}"
+                    report(u, "OK", text, outcome="ok", **timing)
+
+                elif profile == "not_found":
+                    record_outcome(u, "skipped")
+                    done_users += 1
+                    report(u, "SKIP", f"{u} not found", level="warning", outcome="skipped", **timing)
+
+                else:
+                    record_outcome(u, "skipped")
+                    done_users += 1
+                    report(u, "SKIP", f"{u} is {profile} (skipping stories)", level="warning", outcome="skipped", **timing)
+
+            except Exception as e:
+                record_outcome(u, "failed")
+                done_users += 1
+                report(u, "FAIL", f"{u}: {e}", level="error", outcome="failed")
+
+        in_flight = {}  # future -> username
+
+        if options["trace_file"]:
+            tracing.configure(sample_rate=options["trace_sample"], slow_seconds=options["trace_slow_seconds"])
+
+        metrics_writer = None
+        if options["metrics_file"]:
+            metrics_writer = MetricsFileWriter(options["metrics_file"], options["metrics_interval"]).start()
+
+        events.start()
+        events.attach_logging()
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as ex:
+                while queue or in_flight:
+                    # ✅ refill every free worker as soon as one finishes (no lockstep batches),
+                    # but don't hand out new work during a global pause
+                    remaining = PAUSE_GATE.remaining()
+                    while remaining <= 0 and len(in_flight) < workers:
+                        u = queue.pop_ready()
+                        if u is None:
+                            break
+                        attempts[u] += 1
+                        record_attempt(run, u, prior_attempts.get(u, 0) + attempts[u])
+                        in_flight[ex.submit(scrape_with_thread_info, u)] = u
+
+                    if not in_flight:
+                        if remaining > 0:
+                            events.emit("pause", level="warning", msg=f"Waiting {remaining:.0f}s before retrying...")
+                            wait_for_pause_to_end()
+                        else:
+                            # only delayed retries left
+                            time.sleep(queue.next_delay() or 0)
+                        continue
+
+                    metrics.USER_QUEUE_DEPTH.set(len(queue))
+                    metrics.USERS_IN_FLIGHT.set(len(in_flight))
+
+                    # wake up for whichever comes first: a finished job, a due retry, the end of a pause
+                    if remaining > 0:
+                        # ready items can't be handed out until the pause ends: only a
+                        # delayed retry may wake us earlier (else wait(timeout=0) spins)
+                        retry = queue.next_retry_delay()
+                        timeout = remaining if retry is None else min(retry, remaining)
+                    else:
+                        timeout = queue.next_delay() if len(in_flight) < workers else None
+                    done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+
+                    for fut in done:
+                        handle_result(in_flight.pop(fut), fut)
+
+            events.emit("stage", msg="Scraping done, waiting for queued media downloads...")
+            download_pool.shutdown(wait=True)
+        finally:
+            # flushes every queued event (including late download messages) and prints the last summary
+            events.close()
+            if metrics_writer:
+                metrics.USERS_IN_FLIGHT.set(0)
+                metrics_writer.stop()
+            # also on Ctrl+C / errors: the traces of an aborted run are the interesting ones
+            if options["trace_file"]:
+                traced = tracing.get_tracer().write(options["trace_file"])
+                self.stdout.write(f"Traces: {traced} users written to {options['trace_file']}")
+
+        finish_run(run)
+
+        util = utilization.stats()
+        self.stdout.write(
+            f"Workers: utilization={util['utilization']:.1%} "
+            f"(busy {util['busy_seconds']:.0f}s over {util['wall_seconds']:.0f}s x {workers} workers, jobs={util['jobs']})"
+        )
+
+        dl = download_pool.stats()
 
         self.stdout.write(f"Done. OK={results['ok']} SKIP={results['skipped']} FAIL={results['failed']}")
+        self.stdout.write(f"Downloads: queued={dl['submitted']} completed={dl['completed']} failed={dl['failed']}")
+
+        pics = profile_pic_stats()
+        skipped_pics = pics.get("unchanged_url", 0) + pics.get("not_modified", 0) + pics.get("same_content", 0)
+        self.stdout.write(
+            f"Profile pics: replaced={pics.get('replaced', 0)} skipped={skipped_pics} "
+            f"(unchanged_url={pics.get('unchanged_url', 0)} not_modified={pics.get('not_modified', 0)} "
+            f"same_content={pics.get('same_content', 0)}) failed={pics.get('failed', 0)}"
+        )
+
+        if known_index is not None:
+            ks = known_index.stats()
+            self.stdout.write(
+                f"Known-story index: entries={ks['entries']} memory={ks['memory_bytes'] / (1024 * 1024):.1f}MB "
+                f"lookups={ks['lookups']} hits={ks['hits']} db_checks={ks['db_checks']} "
+                f"false_positive_rate={ks['false_positive_rate']:.4%}"
+            )
+
+        ps = pause_wait_stats()
+        self.stdout.write(
+            f"Global pause: pauses={ps['pauses']} waits={ps['waits']} "
+            f"waited={ps['wait_seconds']:.1f}s (avg {ps['avg_wait_seconds']:.1f}s, max {ps['max_wait_seconds']:.1f}s)"
+        )
@@ -0,0 +1,209 @@
+"""
+In-process scraper metrics (counters, gauges, histograms) rendered as Prometheus text.
+Scraper commands write them to --metrics-file; the `metrics` view serves that file
+(settings.SCRAPER_METRICS_FILE) or, without one, this process's own registry.
+"""
+import bisect
+import os
+import threading
+
+_REGISTRY = []
+_REGISTRY_LOCK = threading.Lock()
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (16_384, 65_536, 262_144, 1_048_576, 4_194_304, 16_777_216, 67_108_864)
+
+
+def _labels_text(names, values, extra=()):
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)] + [f'{n}="{v}"' for n, v in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _fmt(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        with _REGISTRY_LOCK:
+            _REGISTRY.append(self)
+
+    def _key(self, labels: dict):
+        return tuple(labels.get(n, "") for n in self.label_names)
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels_text(self.label_names, k)} {_fmt(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    """Set/inc/dec value, or a callback evaluated at render time."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labels=(), callback=None):
+        super().__init__(name, help_text, labels)
+        self.callback = callback
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def _samples(self):
+        if self.callback is not None:
+            return [f"{self.name} {_fmt(self.callback())}"]
+        return super()._samples()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        lines = []
+        for key, row in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, row):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_labels_text(self.label_names, key, [('le', repr(float(bound)))])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels_text(self.label_names, key, [('le', '+Inf')])} {row[-1]}")
+            lines.append(f"{self.name}_sum{_labels_text(self.label_names, key)} {_fmt(float(row[-2]))}")
+            lines.append(f"{self.name}_count{_labels_text(self.label_names, key)} {row[-1]}")
+        return lines
+
+
+def render_prometheus() -> str:
+    with _REGISTRY_LOCK:
+        metrics = list(_REGISTRY)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics_file(path: str) -> None:
+    """Atomically replace `path` with the current metrics (safe to read while scraping)."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    os.replace(tmp, path)
+
+
+class MetricsFileWriter:
+    """Background thread rewriting a metrics file every `interval` seconds (and once more on stop)."""
+
+    def __init__(self, path: str, interval: float = 15.0):
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-file", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            write_metrics_file(self.path)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        write_metrics_file(self.path)
+
+
+# =========================
+# Scraper metrics
+# =========================
+
+# client.py
+HTTP_REQUEST_SECONDS = Histogram("scraper_http_request_seconds", "Latency of one upstream HTTP attempt.")
+HTTP_RESPONSES = Counter("scraper_http_responses_total", "Upstream HTTP responses by status code.", ["status"])
+HTTP_RETRIES = Counter("scraper_http_retries_total", "Upstream request retries by reason.", ["reason"])
+HTTP_FAILURES = Counter("scraper_http_failures_total", "Upstream requests that failed after all retries.")
+
+# instagram.py
+SCRAPES = Counter("scraper_scrapes_total", "scrape_instagram results by profile outcome.", ["profile"])
+SCRAPE_SECONDS = Histogram("scraper_scrape_seconds", "Wall time of one scrape_instagram call.", ["profile"])
+UPSTREAM_ERRORS = Counter("scraper_upstream_errors_total", "Error answers from the upstream by kind.", ["kind"])
+STORIES_FOUND = Counter("scraper_stories_found_total", "Stories listed by the upstream.")
+
+# story_saver.py
+STORIES_SAVED = Counter("scraper_stories_saved_total", "New story rows recorded.")
+STORY_SAVE_SECONDS = Histogram("scraper_story_save_seconds", "Time spent in save_stories per user.")
+STORY_DOWNLOADS = Counter("scraper_story_downloads_total", "Story media downloads by result.", ["result"])
+THUMBNAILS = Counter("scraper_thumbnails_total", "Thumbnails made at ingest by result.", ["result"])
+
+# media_downloader.py
+MEDIA_REQUESTS = Counter("scraper_media_requests_total", "Media fetches by result.", ["result"])
+MEDIA_BYTES = Counter("scraper_media_bytes_total", "Media bytes downloaded.")
+MEDIA_SECONDS = Histogram("scraper_media_download_seconds", "Time to fetch one media file.")
+MEDIA_SIZE = Histogram("scraper_media_size_bytes", "Size of downloaded media files.", buckets=SIZE_BUCKETS)
+
+# queues (set by the commands / download pool)
+USER_QUEUE_DEPTH = Gauge("scraper_user_queue_depth", "Usernames waiting for a scraper worker (incl. delayed retries).")
+USERS_IN_FLIGHT = Gauge("scraper_users_in_flight", "Usernames currently being scraped.")
+DOWNLOAD_QUEUE_DEPTH = Gauge("scraper_download_queue_depth", "Media downloads queued or running in the download pool.")
+
+
+def _pause_stat(key):
+    def read():
+        from instagram_scraper.scraper.client import pause_wait_stats
+        return pause_wait_stats()[key]
+    return read
+
+
+PAUSES = Gauge("scraper_global_pauses", "Global pauses started (incl. extensions).", callback=_pause_stat("pauses"))
+PAUSE_WAIT_SECONDS = Gauge(
+    "scraper_pause_wait_seconds",
+    "Total time threads spent held by the global pause.",
+    callback=_pause_stat("wait_seconds"),
+)
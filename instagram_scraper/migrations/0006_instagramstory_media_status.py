@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instagram_scraper', '0005_instagramstory_ai_analyzed_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='instagramstory',
+            name='media_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='ready', max_length=10),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-18 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instagram_scraper', '0007_mediablob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='instagramuser',
+            name='profile_pic_etag',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='instagramuser',
+            name='profile_pic_last_modified',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='instagramuser',
+            name='profile_pic_sha256',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='instagramuser',
+            name='profile_pic_source',
+            field=models.CharField(blank=True, default='', max_length=500),
+        ),
+    ]
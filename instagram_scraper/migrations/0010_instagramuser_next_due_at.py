@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instagram_scraper', '0009_scraperun_scrapecheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='instagramuser',
+            name='next_due_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-19 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instagram_scraper', '0010_instagramuser_next_due_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='instagramstory',
+            index=models.Index(condition=models.Q(('ai_analyzed_at__isnull', True), ('media_file__isnull', False), ('media_status', 'ready')), fields=['timestamp'], name='ig_story_analysis_poll_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='instagramstory',
+            index=models.Index(fields=['username', '-timestamp'], name='ig_story_user_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='instagramstory',
+            index=models.Index(condition=models.Q(('ai_is_interesting', True)), fields=['-timestamp'], name='ig_story_interesting_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='instagramstory',
+            index=models.Index(fields=['-timestamp'], name='ig_story_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='instagramstory',
+            index=models.Index(condition=models.Q(('media_status', 'ready'), _negated=True), fields=['media_status'], name='ig_story_unready_idx'),
+        ),
+    ]
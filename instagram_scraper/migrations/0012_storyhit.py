@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-19 11:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instagram_scraper', '0011_instagramstory_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoryHit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('keyword', models.CharField(max_length=64)),
+                ('frame_t', models.FloatField(blank=True, null=True)),
+                ('score', models.FloatField(blank=True, null=True)),
+                ('timestamp', models.DateTimeField()),
+                ('story', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hit_rows', to='instagram_scraper.instagramstory')),
+                ('username', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='story_hits', to='instagram_scraper.instagramuser')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['keyword', '-timestamp'], name='ig_hit_keyword_ts_idx'), models.Index(fields=['username', '-timestamp'], name='ig_hit_user_ts_idx'), models.Index(fields=['username', 'keyword', '-timestamp'], name='ig_hit_user_kw_ts_idx')],
+            },
+        ),
+    ]
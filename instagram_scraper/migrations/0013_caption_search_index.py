@@ -0,0 +1,44 @@
+# Generated by Django 6.0 on 2026-10-19 12:05
+
+from django.db import migrations
+
+STORY_TABLE = "instagram_scraper_instagramstory"
+FTS_TABLE = "instagram_scraper_story_fts"
+PG_INDEX = "ig_story_caption_fts_idx"
+
+
+def create_caption_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        # rowid = story id; the analysis service keeps it in sync (services/caption_search.py)
+        schema_editor.execute(f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(caption, tokenize='porter unicode61')")
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, caption) SELECT id, ai_caption FROM {STORY_TABLE} WHERE ai_caption != ''"
+        )
+    elif vendor == "postgresql":
+        # expression index: always in sync, used by queries on the same expression
+        schema_editor.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {PG_INDEX} ON {STORY_TABLE} "
+            f"USING GIN (to_tsvector('english', ai_caption))"
+        )
+
+
+def drop_caption_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {PG_INDEX}")
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('instagram_scraper', '0012_storyhit'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_caption_index, drop_caption_index),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-19 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instagram_scraper', '0013_caption_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='instagramstory',
+            name='archive_file',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='instagramstory',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='instagramstory',
+            name='thumbnail',
+            field=models.ImageField(blank=True, null=True, upload_to='thumbs/'),
+        ),
+    ]
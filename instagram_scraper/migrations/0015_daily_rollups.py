@@ -0,0 +1,54 @@
+# Generated by Django 6.0 on 2026-10-19 14:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instagram_scraper', '0014_instagramstory_retention'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('stories', models.IntegerField(default=0)),
+                ('analyzed', models.IntegerField(default=0)),
+                ('interesting', models.IntegerField(default=0)),
+                ('hits', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='KeywordDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('keyword', models.CharField(max_length=64)),
+                ('day', models.DateField()),
+                ('stories', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='ig_keyword_stats_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('keyword', 'day'), name='ig_keyword_day_stats_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='UserDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('stories', models.IntegerField(default=0)),
+                ('analyzed', models.IntegerField(default=0)),
+                ('interesting', models.IntegerField(default=0)),
+                ('hits', models.IntegerField(default=0)),
+                ('username', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='instagram_scraper.instagramuser')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='ig_user_stats_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('username', 'day'), name='ig_user_day_stats_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-19 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instagram_scraper', '0015_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='instagramstory',
+            name='ig_story_user_ts_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='instagramstory',
+            name='ig_story_interesting_ts_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='instagramstory',
+            name='ig_story_ts_idx',
+        ),
+        migrations.AddIndex(
+            model_name='instagramstory',
+            index=models.Index(fields=['username', '-timestamp', '-id'], name='ig_story_user_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='instagramstory',
+            index=models.Index(condition=models.Q(('ai_is_interesting', True)), fields=['-timestamp', '-id'], name='ig_story_interesting_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='instagramstory',
+            index=models.Index(fields=['-timestamp', '-id'], name='ig_story_ts_idx'),
+        ),
+    ]
@@ -1,25 +1,61 @@
 from django.db import models
 import uuid
 from django.utils import timezone
+from instagram_scraper.scraper.records import FILENAME_TS_FORMAT
 
 # Create your models here.
 
 class InstagramUser(models.Model):
     username = models.CharField(max_length=50, unique=True)
     profile_pic = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
+    profile_pic_source = models.CharField(max_length=500, blank=True, default="")       # stable id parsed from the pic URL
+    profile_pic_etag = models.CharField(max_length=200, blank=True, default="")
+    profile_pic_last_modified = models.CharField(max_length=64, blank=True, default="")  # raw Last-Modified header
+    profile_pic_sha256 = models.CharField(max_length=64, blank=True, default="")
     is_private = models.BooleanField(default=True)
     last_scraped = models.DateTimeField(default=timezone.now)
+    next_due_at = models.DateTimeField(null=True, blank=True, db_index=True)   # set by the scrape_daemon scheduler
 
     def __str__(self):
         return self.username
 
+class StoryQuerySet(models.QuerySet):
+    """Hot story queries, written to match the partial indexes in InstagramStory.Meta."""
+
+    def unready(self):
+        """Pending or failed downloads (ig_story_unready_idx)."""
+        return self.exclude(media_status=InstagramStory.MEDIA_READY)
+
+    def analysis_queue(self):
+        """Stories waiting for AI analysis, oldest first (ig_story_analysis_poll_idx)."""
+        return self.filter(
+            media_status=InstagramStory.MEDIA_READY,
+            media_file__isnull=False,
+            ai_analyzed_at__isnull=True,
+        ).order_by("timestamp")
+
+
 class InstagramStory(models.Model):
+    MEDIA_PENDING = "pending"
+    MEDIA_READY = "ready"
+    MEDIA_FAILED = "failed"
+
+    objects = StoryQuerySet.as_manager()
+
     username = models.ForeignKey(InstagramUser,on_delete=models.CASCADE,related_name="stories")
     story_id = models.CharField(max_length=100, unique=True)
     media_url = models.URLField()
     media_file = models.FileField(upload_to='stories/', blank=True, null=True)
     media_type = models.CharField(max_length=20,choices=[("image", "Image"), ("video", "Video")])
+    media_status = models.CharField(
+        max_length=10,
+        choices=[(MEDIA_PENDING, "Pending"), (MEDIA_READY, "Ready"), (MEDIA_FAILED, "Failed")],
+        default=MEDIA_READY,
+    )                                                                     # pending until the download pool stores the file
     timestamp = models.DateTimeField()
+    thumbnail = models.ImageField(upload_to='thumbs/', blank=True, null=True)      # small WebP, kept after media is retired
+    archived_at = models.DateTimeField(null=True, blank=True)                     # media left the hot store (apply_retention)
+    archive_file = models.CharField(max_length=200, blank=True, default="")       # zip holding the media ("" = media deleted)
 
         # --- AI fields (minimal) ---
     ai_caption = models.TextField(blank=True, default="")                 # image caption OR joined video frame captions
@@ -29,9 +65,160 @@ class InstagramStory(models.Model):
 
     def __str__(self):
         # Format timestamp to match filename format: dd.mm.yy_HH.MM
-        ts_str = self.timestamp.strftime("%d.%m.%y_%H.%M")
+        ts_str = timezone.localtime(self.timestamp).strftime(FILENAME_TS_FORMAT)
         return f"{self.username.username}-{ts_str}-{self.story_id}"
 
     class Meta:
         verbose_name = "Instagram Story"
-        verbose_name_plural = "Instagram Stories"
\ No newline at end of file
+        verbose_name_plural = "Instagram Stories"
+        indexes = [
+            # analysis poll: ready, not analyzed yet, oldest first (partial -> stays tiny)
+            models.Index(
+                fields=["timestamp"],
+                name="ig_story_analysis_poll_idx",
+                condition=models.Q(
+                    ai_analyzed_at__isnull=True,
+                    media_status="ready",
+                    media_file__isnull=False,
+                ),
+            ),
+            # per-user timelines / recent stories of a user (-id: keyset pages of the stories API)
+            models.Index(fields=["username", "-timestamp", "-id"], name="ig_story_user_ts_idx"),
+            # browsing interesting stories, newest first
+            models.Index(
+                fields=["-timestamp", "-id"],
+                name="ig_story_interesting_ts_idx",
+                condition=models.Q(ai_is_interesting=True),
+            ),
+            # global timeline
+            models.Index(fields=["-timestamp", "-id"], name="ig_story_ts_idx"),
+            # pending / failed downloads (swept at startup, retried by save_stories)
+            models.Index(
+                fields=["media_status"],
+                name="ig_story_unready_idx",
+                condition=~models.Q(media_status="ready"),
+            ),
+        ]
+
+
+
+class StoryHit(models.Model):
+    """
+    One keyword hit of a story's AI analysis (the indexed form of ai_hits).
+    username / timestamp are copied from the story so keyword and per-user
+    queries over a time range are a single index range scan, no join.
+    """
+    story = models.ForeignKey(InstagramStory, on_delete=models.CASCADE, related_name="hit_rows")
+    keyword = models.CharField(max_length=64)
+    frame_t = models.FloatField(null=True, blank=True)                   # video second of the hit frame (null = image)
+    score = models.FloatField(null=True, blank=True)                     # matcher confidence, when it provides one
+    username = models.ForeignKey(
+        InstagramUser, on_delete=models.CASCADE, related_name="story_hits", db_index=False
+    )                                                                    # covered by the composite indexes
+    timestamp = models.DateTimeField()                                   # story timestamp
+
+    def __str__(self):
+        return f"{self.keyword} @ {self.story_id}"
+
+    class Meta:
+        indexes = [
+            # "stories that hit <keyword> this week"
+            models.Index(fields=["keyword", "-timestamp"], name="ig_hit_keyword_ts_idx"),
+            # "hits of these users in a time range"
+            models.Index(fields=["username", "-timestamp"], name="ig_hit_user_ts_idx"),
+            # "hits of these users for <keyword> in a time range"
+            models.Index(fields=["username", "keyword", "-timestamp"], name="ig_hit_user_kw_ts_idx"),
+        ]
+
+
+# =========================
+# Dashboard rollups (services/rollups.py keeps them in step with the story table)
+# =========================
+
+class DailyStats(models.Model):
+    """Story counts per day (story timestamp, local date)."""
+    day = models.DateField(unique=True)
+    stories = models.IntegerField(default=0)
+    analyzed = models.IntegerField(default=0)
+    interesting = models.IntegerField(default=0)
+    hits = models.IntegerField(default=0)                                # (story, keyword) pairs
+
+    def __str__(self):
+        return f"{self.day}: {self.stories} stories"
+
+
+class UserDailyStats(models.Model):
+    username = models.ForeignKey(InstagramUser, on_delete=models.CASCADE, related_name="daily_stats")
+    day = models.DateField()
+    stories = models.IntegerField(default=0)
+    analyzed = models.IntegerField(default=0)
+    interesting = models.IntegerField(default=0)
+    hits = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.username_id} {self.day}: {self.stories} stories"
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["username", "day"], name="ig_user_day_stats_uniq")]
+        indexes = [models.Index(fields=["day"], name="ig_user_stats_day_idx")]
+
+
+class KeywordDailyStats(models.Model):
+    keyword = models.CharField(max_length=64)
+    day = models.DateField()
+    stories = models.IntegerField(default=0)                             # stories that hit the keyword
+
+    def __str__(self):
+        return f"{self.keyword} {self.day}: {self.stories}"
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["keyword", "day"], name="ig_keyword_day_stats_uniq")]
+        indexes = [models.Index(fields=["day"], name="ig_keyword_stats_day_idx")]
+
+class MediaBlob(models.Model):
+    """
+    Content-addressed media file (keyed by SHA-256 of its bytes).
+    Story media_file / user profile_pic names point at blob files;
+    ref_count tracks how many of those rows reference each blob.
+    """
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    file = models.FileField(upload_to='blobs/', max_length=200)
+    size = models.BigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    released_at = models.DateTimeField(null=True, blank=True)            # last time ref_count went down
+
+    def __str__(self):
+        return f"{self.sha256[:12]} refs={self.ref_count}"
+
+
+class ScrapeRun(models.Model):
+    """One scrape_users run over a usernames file; unfinished runs are resumed."""
+    source = models.CharField(max_length=500, db_index=True)             # usernames file (resolved path)
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.source} @ {self.started_at:%Y-%m-%d %H:%M}"
+
+
+class ScrapeCheckpoint(models.Model):
+    OUTCOME_PENDING = ""
+    OUTCOME_OK = "ok"
+    OUTCOME_SKIPPED = "skipped"
+    OUTCOME_FAILED = "failed"
+    OUTCOME_RECENT = "recent"          # skipped by --min-interval
+
+    run = models.ForeignKey(ScrapeRun, on_delete=models.CASCADE, related_name="checkpoints")
+    username = models.CharField(max_length=50)
+    outcome = models.CharField(max_length=10, blank=True, default=OUTCOME_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.username}: {self.outcome or 'pending'}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["run", "username"], name="unique_checkpoint_per_run"),
+        ]
@@ -5,6 +5,8 @@ import logging
 import requests
 import os
 from requests.exceptions import RequestException
+from .pause_gate import PauseGate
+from instagram_scraper import metrics, tracing
 
 logger = logging.getLogger(__name__)
 
@@ -16,8 +18,7 @@ TOR_PROXY = f"socks5h://127.0.0.1:{TOR_SOCKS_PORT}"
 # =========================
 # Global pause gate (shared by all threads)
 # =========================
-_PAUSE_LOCK = threading.Lock()
-_PAUSE_UNTIL = 0.0  # monotonic timestamp
+PAUSE_GATE = PauseGate()
 
 # =========================
 # Circuit rotation lock (only one thread rotates at a time)
@@ -28,21 +29,13 @@ _CIRCUIT_ROTATION_IN_PROGRESS = False
 
 def _maybe_pause():
     """
-    If a global pause is active, sleep until it expires.
+    If a global pause is active, block until it expires.
     All threads will respect this before making a request.
     """
-    while True:
-        with _PAUSE_LOCK:
-            remaining = _PAUSE_UNTIL - time.monotonic()
-
-        if remaining <= 0:
-            return
-
-        # Log only once per pause period to avoid spam
-        if remaining > 0.5:  # Only log if more than 0.5 seconds remaining
-            logger.debug(f"[PAUSE] Waiting {remaining:.1f}s before next request...")
-        
-        time.sleep(min(remaining, 1.0))
+    remaining = PAUSE_GATE.remaining()
+    if remaining > 0.5:  # Only log if more than 0.5 seconds remaining
+        logger.debug(f"[PAUSE] Waiting {remaining:.1f}s before next request...")
+    PAUSE_GATE.wait()
 
 
 def trigger_global_pause(seconds: int):
@@ -50,35 +43,30 @@ def trigger_global_pause(seconds: int):
     Activate or extend a global pause window.
     Called when we detect 'temporarily blocked'.
     """
-    global _PAUSE_UNTIL
-    until = time.monotonic() + seconds
-
-    with _PAUSE_LOCK:
-        if until > _PAUSE_UNTIL:
-            _PAUSE_UNTIL = until
-            logger.info(f"[PAUSE] Global pause activated for {seconds} seconds - all threads will wait")
+    if PAUSE_GATE.trigger(seconds):
+        logger.info(f"[PAUSE] Global pause activated for {seconds} seconds - all threads will wait")
 
 
 def get_pause_remaining_seconds() -> int:
     """How many seconds remain in the current global pause (0 if none)."""
-    with _PAUSE_LOCK:
-        remaining = _PAUSE_UNTIL - time.monotonic()
-    return max(0, int(remaining))
+    return int(PAUSE_GATE.remaining())
 
 
-def wait_for_pause_to_end():
-    """Block until the global pause is finished."""
+def wait_for_pause_to_end(timeout: float | None = None) -> bool:
+    """Block until the global pause is finished (False if `timeout` ran out first)."""
     initial_remaining = get_pause_remaining_seconds()
     if initial_remaining > 0:
         logger.info(f"[PAUSE] Waiting for global pause to end ({initial_remaining}s remaining)...")
-    
-    while True:
-        remaining = get_pause_remaining_seconds()
-        if remaining <= 0:
-            if initial_remaining > 0:
-                logger.info("[PAUSE] Global pause ended, resuming work")
-            return
-        time.sleep(min(remaining, 1))
+
+    over = PAUSE_GATE.wait(timeout)
+    if over and initial_remaining > 0:
+        logger.info("[PAUSE] Global pause ended, resuming work")
+    return over
+
+
+def pause_wait_stats() -> dict:
+    """How often and how long threads were held by the global pause."""
+    return PAUSE_GATE.stats()
 
 
 def rotate_circuit_if_needed(log_callback=None):
@@ -165,31 +153,43 @@ class ScraperClient:
 
         for attempt in range(1, self.max_retries + 1):
             # ⏸ respect global pause before every request
-            _maybe_pause()
+            if PAUSE_GATE.remaining() > 0:
+                with tracing.span("global pause"):
+                    _maybe_pause()
 
+            started = time.monotonic()
             try:
-                resp = self.session.get(
-                    url,
-                    headers=self._headers(),
-                    timeout=self.timeout,
-                )
+                with tracing.span("ScraperClient.get", url=url, attempt=attempt) as sp:
+                    resp = self.session.get(
+                        url,
+                        headers=self._headers(),
+                        timeout=self.timeout,
+                    )
+                    sp.set(status=resp.status_code, bytes=len(resp.content))
+                metrics.HTTP_REQUEST_SECONDS.observe(time.monotonic() - started)
+                metrics.HTTP_RESPONSES.inc(status=resp.status_code)
 
                 # Retry on transient server errors
                 if resp.status_code in (429, 500, 502, 503, 504):
+                    metrics.HTTP_RETRIES.inc(reason=resp.status_code)
                     self._sleep_backoff(attempt)
                     continue
 
                 return resp
 
             except (requests.Timeout, requests.ConnectionError) as e:
+                metrics.HTTP_REQUEST_SECONDS.observe(time.monotonic() - started)
+                metrics.HTTP_RETRIES.inc(reason="timeout" if isinstance(e, requests.Timeout) else "connection")
                 last_exc = e
                 self._sleep_backoff(attempt)
                 continue
 
+        metrics.HTTP_FAILURES.inc()
         if last_exc:
             raise last_exc
         raise RuntimeError("Request failed after retries")
 
     def _sleep_backoff(self, attempt: int) -> None:
         delay = (self.backoff_base ** attempt) + random.uniform(0.0, 0.35)
-        time.sleep(delay)
+        with tracing.span("backoff", attempt=attempt):
+            time.sleep(delay)
@@ -0,0 +1,180 @@
+import json
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+
+_STOP = object()
+
+
+class EventLog:
+    """
+    Structured, non-blocking log for scraper workers.
+    - `emit()` only puts a dict on an unbounded queue (never blocks, no formatting in the worker)
+    - One writer thread renders console lines and, optionally, one JSON object per line
+    - Console lines above `max_lines_per_second` are dropped (still written to JSONL) and
+      counted; every `summary_every` seconds a summary line reports progress and drops
+    """
+
+    def __init__(self, stdout, styles=None, jsonl_path=None, summary_every=30.0, max_lines_per_second=0, total=0):
+        self.stdout = stdout
+        self.styles = styles or {}  # level -> callable(str) -> str (e.g. BaseCommand.style.SUCCESS)
+        self.jsonl_path = jsonl_path
+        self.summary_every = summary_every
+        self.max_lines_per_second = max_lines_per_second
+        self.total = total
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="event-log", daemon=True)
+        self._handler = None
+        # writer-thread state (never touched by workers)
+        self._outcomes = Counter()
+        self._retries = 0
+        self._durations = []
+        self._suppressed = 0
+        self._window_start = 0.0
+        self._window_lines = 0
+        self._started = time.monotonic()
+
+    # ---------- producer side (any thread) ----------
+
+    def emit(self, event: str, level: str = "info", **fields) -> None:
+        """Queue one event. Common fields: user, thread, stage, outcome, duration_s, msg."""
+        fields["event"] = event
+        fields["level"] = level
+        fields["ts"] = time.time()
+        self._queue.put(fields)
+
+    def callback(self, **context):
+        """A `log_callback(message)` for scrape_instagram that emits structured events."""
+        def log_callback(message):
+            self.emit("message", msg=message, **context)
+        return log_callback
+
+    def attach_logging(self, logger_name: str = "instagram_scraper", level=logging.WARNING) -> None:
+        """Route library log records (e.g. failed downloads) through the same writer."""
+        log = self
+
+        class _Handler(logging.Handler):
+            def emit(self, record):
+                log.emit(
+                    "log",
+                    level="error" if record.levelno >= logging.ERROR else "warning",
+                    logger=record.name,
+                    thread_name=record.threadName,
+                    msg=record.getMessage(),
+                )
+
+        self._handler = (logger_name, _Handler(level))
+        logging.getLogger(logger_name).addHandler(self._handler[1])
+
+    # ---------- lifecycle (main thread) ----------
+
+    def start(self):
+        self._started = time.monotonic()
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        """Flush everything queued, print a final summary and stop the writer."""
+        if self._handler:
+            logger_name, handler = self._handler
+            logging.getLogger(logger_name).removeHandler(handler)
+            self._handler = None
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- writer thread ----------
+
+    def _run(self):
+        jsonl = open(self.jsonl_path, "a", encoding="utf-8") if self.jsonl_path else None
+        next_summary = time.monotonic() + self.summary_every if self.summary_every > 0 else None
+        try:
+            while True:
+                timeout = max(0.0, next_summary - time.monotonic()) if next_summary else None
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+
+                if item is _STOP:
+                    break
+                if item is not None:
+                    self._handle(item, jsonl)
+
+                if next_summary and time.monotonic() >= next_summary:
+                    self._write_summary()
+                    next_summary = time.monotonic() + self.summary_every
+        finally:
+            self._write_summary(final=True)
+            if jsonl:
+                jsonl.close()
+
+    def _handle(self, item: dict, jsonl) -> None:
+        if item["event"] == "retry":
+            self._retries += 1
+        elif item.get("outcome"):
+            self._outcomes[item["outcome"]] += 1
+            if item.get("duration_s") is not None:
+                self._durations.append(item["duration_s"])
+
+        if jsonl:
+            jsonl.write(json.dumps(item, default=str) + "\n")
+
+        # warnings/errors are never dropped
+        if item["level"] in ("info", "success") and not self._allow_line():
+            self._suppressed += 1
+            return
+        self._write(self.render(item), item["level"])
+
+    def _allow_line(self) -> bool:
+        if self.max_lines_per_second <= 0:
+            return True
+        now = time.monotonic()
+        if now - self._window_start >= 1.0:
+            self._window_start = now
+            self._window_lines = 0
+        self._window_lines += 1
+        return self._window_lines <= self.max_lines_per_second
+
+    def _write(self, line: str, level: str) -> None:
+        style = self.styles.get(level)
+        self.stdout.write(style(line) if style else line)
+
+    @staticmethod
+    def render(item: dict) -> str:
+        """Human-readable line: [done/total] [Thread n] [TAG] user message"""
+        parts = []
+        if item.get("progress"):
+            parts.append(f"[{item['progress']}]")
+        if item.get("thread") is not None:
+            parts.append(f"[Thread {item['thread']}]")
+        parts.append(f"[{item.get('tag') or item['event'].upper()}]")
+        if item.get("msg"):
+            parts.append(item["msg"])
+        if item.get("duration_s") is not None:
+            parts.append(f"in {item['duration_s']:.2f}s")
+        return " ".join(parts)
+
+    def _write_summary(self, final: bool = False) -> None:
+        done = sum(self._outcomes.values())
+        if not done and not self._suppressed and not final:
+            return
+        minutes = max(time.monotonic() - self._started, 1e-6) / 60
+        durations = sorted(self._durations)
+        avg = sum(durations) / len(durations) if durations else 0.0
+        p95 = durations[int(len(durations) * 0.95) - 1] if len(durations) >= 20 else (durations[-1] if durations else 0.0)
+        progress = f"{done}/{self.total}" if self.total else str(done)
+        line = (
+            f"[SUMMARY] {progress} users {dict(self._outcomes)} retries={self._retries} "
+            f"{done / minutes:.0f} users/min, avg {avg:.2f}s p95 {p95:.2f}s per user"
+        )
+        if self._suppressed:
+            line += f", {self._suppressed} lines suppressed"
+        self._write(line, "summary")
@@ -3,17 +3,50 @@ from .parsers import parse_stories_request, parse_profile_request
 from instagram_scraper.services.profile_saver import save_profile
 from instagram_scraper.services.story_saver import save_stories
 from django.conf import settings
+from instagram_scraper import metrics, tracing
 import time
 
 
 BASE_URL = "https://media.mollygram.com/"
 
-def scrape_instagram(username: str, log_callback=None):
-    client = ScraperClient()
+# Without Tor there is no circuit to rotate: a block just pauses every thread
+BLOCK_PAUSE_SECONDS = 60
 
-    profile_url = f"{BASE_URL}?url={username}"
+
+def scrape_instagram(
+    username: str,
+    log_callback=None,
+    download_pool=None,
+    known_index=None,
+    base_url: str | None = None,
+    use_tor: bool = True,
+):
+    """
+    base_url: override BASE_URL (e.g. the local stand-in server used by `bench_scrape`)
+    use_tor: route requests through Tor (disable for local targets)
+    """
+    started = time.monotonic()
+    profile = "exception"
+    try:
+        with tracing.trace("scrape_instagram", username=username) as root:
+            result = _scrape_instagram(username, log_callback, download_pool, known_index, base_url, use_tor)
+            profile = result.get("profile", "unknown")
+            root.set(profile=profile, stories_found=result.get("stories_found", 0))
+        metrics.STORIES_FOUND.inc(result.get("stories_found", 0))
+        return result
+    finally:
+        metrics.SCRAPES.inc(profile=profile)
+        metrics.SCRAPE_SECONDS.observe(time.monotonic() - started, profile=profile)
+
+
+def _scrape_instagram(username, log_callback, download_pool, known_index, base_url, use_tor):
+    base_url = base_url or BASE_URL
+    client = ScraperClient(use_tor=use_tor)
+
+    profile_url = f"{base_url}?url={username}"
     profile_response = client.get(profile_url)
-    profile_data = parse_profile_request(profile_response.text)
+    with tracing.span("parse_profile_request", bytes=len(profile_response.content)):
+        profile_data = parse_profile_request(profile_response.text)
 
     status = (profile_data.get("status") or "").lower()
     msg = (profile_data.get("msg") or "").strip()  # Keep original case for comparison
@@ -21,6 +54,19 @@ def scrape_instagram(username: str, log_callback=None):
 
     # ✅ BLOCK DETECTION
     if "temporarily blocked" in msg:
+        metrics.UPSTREAM_ERRORS.inc(kind="blocked")
+        if not use_tor:
+            if log_callback:
+                log_callback(f"{username}: Block detected, pausing all threads for {BLOCK_PAUSE_SECONDS}s")
+            trigger_global_pause(BLOCK_PAUSE_SECONDS)
+            return {
+                "username": username,
+                "profile": "blocked",
+                "stories_found": 0,
+                "stories_saved": 0,
+                "pause_seconds": BLOCK_PAUSE_SECONDS,
+            }
+
         if log_callback:
             log_callback(f"{username}: Block detected, Attempting to rotate Tor IP")
         
@@ -67,6 +113,8 @@ def scrape_instagram(username: str, log_callback=None):
         if "temporarily unavailable" in msg_lower:
             is_temporary_error = True
         
+        metrics.UPSTREAM_ERRORS.inc(kind="unavailable" if is_temporary_error else "not_found")
+
         if is_temporary_error:
             if log_callback:
                 log_callback(f"{username}: Temporary server error detected - will retry...")
@@ -90,21 +138,30 @@ def scrape_instagram(username: str, log_callback=None):
             }
 
     # save profile normally (if not blocked or error)
-    save_profile(username, profile_data)
+    with tracing.span("save_profile"):
+        save_profile(username, profile_data)
 
     if status != "public":
         # treat private/unknown/not_found however you already do
         return {"username": username, "profile": status or "unknown", "stories_found": 0, "stories_saved": 0}
 
-    stories_url = f"{BASE_URL}?url={username}&method=allstories"
+    stories_url = f"{base_url}?url={username}&method=allstories"
     stories_response = client.get(stories_url)
-    stories = parse_stories_request(stories_response.text)
+    with tracing.span("parse_stories_request", bytes=len(stories_response.content)) as sp:
+        stories = parse_stories_request(stories_response.text)
+        sp.set(stories=len(stories))
 
     # Log starting to download stories if there are any
     if stories and log_callback:
         log_callback(f"{username} public, starting to download stories")
 
-    saved_count = save_stories(username, stories, log_callback=log_callback)
+    saved_count = save_stories(
+        username,
+        stories,
+        log_callback=log_callback,
+        download_pool=download_pool,
+        known_index=known_index,
+    )
 
     return {
         "username": username,
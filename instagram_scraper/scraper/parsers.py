@@ -2,9 +2,23 @@ import json
 import re
 import hashlib
 from bs4 import BeautifulSoup
+from lxml import etree
+from lxml import html as lxml_html
 from urllib.parse import urlparse, parse_qs, unquote
-from datetime import timedelta
+from datetime import datetime, timedelta
 from django.utils import timezone
+from .records import StoryRecord
+
+
+# Compiled once; reused for every response
+_XP_FIRST_IMG = etree.XPath("(//img)[1]")
+_XP_MEDIA = etree.XPath("//img | //video")
+_XP_CONTAINER = etree.XPath(
+    "ancestor::div[contains(concat(' ', normalize-space(@class), ' '), ' col-md-4 ')][1]"
+)
+_XP_SOURCE = etree.XPath("(.//source)[1]")
+_XP_DOWNLOAD = etree.XPath("(.//a[@id='download-video'])[1]")
+_XP_SMALL = etree.XPath("(.//small)[1]")
 
 
 def parse_profile_request(raw: str) -> dict:
@@ -44,15 +58,20 @@ def parse_profile_request(raw: str) -> dict:
     # Extract profile picture from HTML (only when public)
     html = data.get("html", "")
     if html:
-        soup = BeautifulSoup(html, "html.parser")
-        img_tag = soup.find("img")
-        if img_tag:
-            result["profile_pic_url"] = img_tag.get("src", "")
+        try:
+            img_tags = _XP_FIRST_IMG(lxml_html.fromstring(html))
+            result["profile_pic_url"] = img_tags[0].get("src", "") if img_tags else ""
+        except (etree.ParserError, etree.XMLSyntaxError, ValueError):
+            # malformed HTML -> slower but more forgiving parser
+            soup = BeautifulSoup(html, "html.parser")
+            img_tag = soup.find("img")
+            if img_tag:
+                result["profile_pic_url"] = img_tag.get("src", "")
 
     return result
 
 
-def parse_stories_request(raw: str):
+def parse_stories_request(raw: str, now: datetime | None = None) -> list[StoryRecord]:
     data = json.loads(raw)
 
     # handle "no stories"
@@ -60,10 +79,78 @@ def parse_stories_request(raw: str):
         return []
 
     html = data.get("html", "")
-    soup = BeautifulSoup(html, "html.parser")
 
+    # one "now" for the whole response
+    now = now or timezone.now()
     stories = []
 
+    for media_type, media_url, time_text in story_nodes(html):
+        if "media.php" not in media_url:
+            continue
+
+        stories.append(StoryRecord(
+            story_id=extract_story_id(media_url),
+            media_url=media_url,
+            media_type=media_type,
+            timestamp=parse_time_ago(time_text, now),  # ✅ aware datetime
+        ))
+
+    return stories
+
+
+def story_nodes(html: str) -> list[tuple[str, str, str | None]]:
+    """
+    (media_type, media_url, time_text) for every story media node.
+    lxml fast path; BeautifulSoup fallback for HTML lxml refuses.
+    """
+    if not html:
+        return []
+    try:
+        return _story_nodes_lxml(html)
+    except (etree.ParserError, etree.XMLSyntaxError, ValueError):
+        return _story_nodes_bs(html)
+
+
+def _story_nodes_lxml(html: str) -> list[tuple[str, str, str | None]]:
+    root = lxml_html.fromstring(html)
+    nodes = []
+
+    for node in _XP_MEDIA(root):
+        containers = _XP_CONTAINER(node)
+        if not containers:
+            continue
+        container = containers[0]
+
+        # detect type + url
+        if node.tag == "video":
+            sources = _XP_SOURCE(node)
+            if not sources or not sources[0].get("src"):
+                continue
+            media_url = sources[0].get("src")
+            media_type = "video"
+        else:
+            if not node.get("src"):
+                continue
+            media_url = node.get("src")
+            media_type = "image"
+
+        # prefer "Download HD" link if exists
+        links = _XP_DOWNLOAD(container)
+        if links and links[0].get("href"):
+            media_url = links[0].get("href")
+
+        smalls = _XP_SMALL(container)
+        time_text = "".join(t.strip() for t in smalls[0].itertext()) if smalls else None
+
+        nodes.append((media_type, media_url, time_text))
+
+    return nodes
+
+
+def _story_nodes_bs(html: str) -> list[tuple[str, str, str | None]]:
+    soup = BeautifulSoup(html, "html.parser")
+    nodes = []
+
     media_nodes = soup.find_all(["img", "video"])
     for node in media_nodes:
         container = node.find_parent("div", class_="col-md-4")
@@ -88,28 +175,13 @@ def parse_stories_request(raw: str):
         download_a = container.find("a", id="download-video")
         if download_a and download_a.get("href"):
             media_url = download_a["href"]
-        
-        if "media.php" not in media_url:
-            continue
-
 
         small = container.find("small")
         time_text = small.get_text(strip=True) if small else None
-        timestamp = parse_time_ago(time_text)
-
-        # ✅ CONVERT HERE
-        timestamp = parse_time_ago(time_text)
 
-        story_id = extract_story_id(media_url)
+        nodes.append((media_type, media_url, time_text))
 
-        stories.append({
-            "story_id": story_id,
-            "media_url": media_url,
-            "media_type": media_type,
-            "timestamp": timestamp,  # ✅ final value
-        })
-
-    return stories
+    return nodes
 
 
 def extract_story_id(media_url: str) -> str:
@@ -142,39 +214,34 @@ _TIME_RE = re.compile(
     re.I
 )
 
-def parse_time_ago(time_text: str) -> str:
+def parse_time_ago(time_text: str, now: datetime | None = None) -> datetime:
     """
     Converts:
       "20 hours ago"
       "5 minutes ago"
       "12 seconds ago"
       "1 day ago"
-    into:
-      "dd.mm.yy_HH.MM"
+    into an aware datetime relative to `now` (default: timezone.now()).
     """
-    now = timezone.localtime(timezone.now())
+    now = now or timezone.now()
 
     if not time_text:
-        return now.strftime("%d.%m.%y_%H.%M")
+        return now
 
-    text = time_text.strip().lower()
-    match = _TIME_RE.search(text)
+    match = _TIME_RE.search(time_text)
 
     if not match:
-        return now.strftime("%d.%m.%y_%H.%M")
+        return now
 
     value = int(match.group(1))
-    unit = match.group(2)
+    unit = match.group(2).lower()
 
     if "second" in unit:
-        upload_time = now - timedelta(seconds=value)
-    elif "minute" in unit:
-        upload_time = now - timedelta(minutes=value)
-    elif "hour" in unit:
-        upload_time = now - timedelta(hours=value)
-    elif "day" in unit:
-        upload_time = now - timedelta(days=value)
-    else:
-        upload_time = now
-
-    return upload_time.strftime("%d.%m.%y_%H.%M")
+        return now - timedelta(seconds=value)
+    if "minute" in unit:
+        return now - timedelta(minutes=value)
+    if "hour" in unit:
+        return now - timedelta(hours=value)
+    if "day" in unit:
+        return now - timedelta(days=value)
+    return now
@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import time
+
+
+def _wake(fut):
+    if not fut.done():
+        fut.set_result(None)
+
+
+class PauseGate:
+    """
+    Global "stop sending requests until T" window shared by all threads.
+    - Waiters block on a Condition and wake exactly when the window ends
+    - Extending or clearing the window re-arms / releases every waiter at once
+    - `wait_async` does the same for coroutines (any event loop, any thread)
+    - Tracks how long callers spent blocked
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._until = 0.0  # monotonic timestamp
+        self._async_waiters = set()  # (loop, future)
+        self._stats = {"pauses": 0, "waits": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0}
+
+    def remaining(self) -> float:
+        """Seconds left in the current pause (0.0 if none)."""
+        with self._cond:
+            return max(0.0, self._until - time.monotonic())
+
+    def trigger(self, seconds: float) -> bool:
+        """Start or extend the pause. Returns False if an existing pause already covers it."""
+        until = time.monotonic() + seconds
+        with self._cond:
+            if until <= self._until:
+                return False
+            self._until = until
+            self._stats["pauses"] += 1
+            self._notify()
+        return True
+
+    def clear(self) -> None:
+        """End the pause now and release every waiter."""
+        with self._cond:
+            self._until = 0.0
+            self._notify()
+
+    def _notify(self):
+        # caller holds self._cond
+        self._cond.notify_all()
+        for loop, fut in self._async_waiters:
+            loop.call_soon_threadsafe(_wake, fut)
+
+    def _record(self, waited: float):
+        with self._cond:
+            self._stats["waits"] += 1
+            self._stats["wait_seconds"] += waited
+            self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """
+        Block until the pause is over (True) or `timeout` seconds passed (False).
+        Returns immediately when there is no pause.
+        """
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        blocked = False
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                remaining = self._until - now
+                if remaining <= 0:
+                    over = True
+                    break
+                if deadline is not None and now >= deadline:
+                    over = False
+                    break
+                # woken early only by trigger()/clear(); the loop re-reads the deadline
+                blocked = True
+                self._cond.wait(remaining if deadline is None else min(remaining, deadline - now))
+        if blocked:
+            self._record(time.monotonic() - start)
+        return over
+
+    async def wait_async(self) -> None:
+        """Coroutine version of `wait()`: suspends the task, never blocks the event loop."""
+        loop = asyncio.get_running_loop()
+        start = time.monotonic()
+        blocked = False
+        while True:
+            with self._cond:
+                remaining = self._until - time.monotonic()
+                if remaining <= 0:
+                    break
+                fut = loop.create_future()
+                waiter = (loop, fut)
+                self._async_waiters.add(waiter)
+            blocked = True
+            try:
+                await asyncio.wait([fut], timeout=remaining)
+            finally:
+                with self._cond:
+                    self._async_waiters.discard(waiter)
+        if blocked:
+            self._record(time.monotonic() - start)
+
+    def stats(self) -> dict:
+        with self._cond:
+            stats = dict(self._stats)
+        stats["avg_wait_seconds"] = stats["wait_seconds"] / stats["waits"] if stats["waits"] else 0.0
+        return stats
@@ -0,0 +1,21 @@
+from dataclasses import dataclass
+from datetime import datetime
+from django.utils import timezone
+
+# Filename timestamp format (also used by InstagramStory.__str__)
+FILENAME_TS_FORMAT = "%d.%m.%y_%H.%M"
+
+
+@dataclass(frozen=True, slots=True)
+class StoryRecord:
+    """One parsed story as it moves from the parser to save_stories."""
+    story_id: str
+    media_url: str
+    media_type: str          # "image" | "video"
+    timestamp: datetime      # timezone-aware
+
+    def filename(self, username: str) -> str:
+        # string formatting happens only here, at the filename boundary
+        ts_str = timezone.localtime(self.timestamp).strftime(FILENAME_TS_FORMAT)
+        ext = "jpg" if self.media_type == "image" else "mp4"
+        return f"{username}-{ts_str}-{self.story_id}.{ext}"
@@ -0,0 +1,166 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+
+
+class RetryQueue:
+    """
+    Pending work for the scraper pool.
+    - Ready items in a deque (O(1) pop from the front)
+    - Delayed retries in a heap keyed by the monotonic time they become ready
+    Only the main (scheduling) thread touches it, so it is not locked.
+    """
+
+    def __init__(self, items=()):
+        self._ready = deque(items)
+        self._delayed = []  # (ready_at, seq, item)
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self._ready) + len(self._delayed)
+
+    def push(self, item) -> None:
+        self._ready.append(item)
+
+    def push_later(self, item, delay: float) -> None:
+        if delay <= 0:
+            self.push(item)
+            return
+        heapq.heappush(self._delayed, (time.monotonic() + delay, next(self._seq), item))
+
+    def _promote_due(self) -> None:
+        now = time.monotonic()
+        while self._delayed and self._delayed[0][0] <= now:
+            self._ready.append(heapq.heappop(self._delayed)[2])
+
+    def pop_ready(self):
+        """Next item whose time has come, or None."""
+        self._promote_due()
+        return self._ready.popleft() if self._ready else None
+
+    def next_delay(self) -> float | None:
+        """Seconds until the next item is ready (0 if one is ready now, None if empty)."""
+        if self._ready:
+            return 0.0
+        if not self._delayed:
+            return None
+        return max(0.0, self._delayed[0][0] - time.monotonic())
+
+    def next_retry_delay(self) -> float | None:
+        """Seconds until the next delayed item is due (> 0; due ones move to ready), None if none."""
+        self._promote_due()
+        if not self._delayed:
+            return None
+        return self._delayed[0][0] - time.monotonic()
+
+
+class UtilizationTracker:
+    """Busy time of pool workers vs. the wall time the pool was available."""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._busy = 0.0
+        self._jobs = 0
+        self._started = time.monotonic()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._busy += seconds
+            self._jobs += 1
+
+    def stats(self) -> dict:
+        wall = time.monotonic() - self._started
+        with self._lock:
+            busy, jobs = self._busy, self._jobs
+        return {
+            "jobs": jobs,
+            "wall_seconds": wall,
+            "busy_seconds": busy,
+            "utilization": busy / (self.workers * wall) if wall > 0 and self.workers else 0.0,
+        }
+
+
+class DueHeap:
+    """
+    Usernames keyed by the wall-clock time (epoch seconds) they are next due.
+    Rescheduling a queued user just records the new time; the stale heap
+    entry is skipped when it surfaces (lazy deletion).
+    """
+
+    def __init__(self):
+        self._heap = []  # (due_ts, seq, username)
+        self._due = {}   # username -> current due_ts
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self._due)
+
+    def __contains__(self, username):
+        return username in self._due
+
+    def schedule(self, username: str, due_ts: float) -> None:
+        self._due[username] = due_ts
+        heapq.heappush(self._heap, (due_ts, next(self._seq), username))
+
+    def _drop_stale(self):
+        while self._heap and self._due.get(self._heap[0][2]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def pop_due(self, now: float):
+        """Earliest user due at or before `now`, or None."""
+        self._drop_stale()
+        if not self._heap or self._heap[0][0] > now:
+            return None
+        _, _, username = heapq.heappop(self._heap)
+        del self._due[username]
+        return username
+
+    def next_delay(self, now: float) -> float | None:
+        self._drop_stale()
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - now)
+
+
+# Stories stay visible for STORY_LIFETIME, so one poll anywhere in that window sees a
+# story; polling faster than a user posts only helps with stories deleted early.
+# Public users are polled about once per observed posting gap, clamped to
+# [PUBLIC_MIN_INTERVAL, PUBLIC_MAX_INTERVAL] (the max leaves a margin for late or blocked polls).
+#
+# Request budget (one poll = profile request + stories request):
+#   busiest public user: 24h / 3h  = 8 polls/day
+#   quiet public user:   24h / 18h ~ 1.3 polls/day
+#   private / not found: 1/3 and 1/7 poll a day
+# e.g. 1,000 public users cost at most 8,000 polls (16,000 requests) a day, ~11 requests/min.
+STORY_LIFETIME = 24 * 3600
+PUBLIC_MIN_INTERVAL = STORY_LIFETIME // 8
+PUBLIC_MAX_INTERVAL = int(STORY_LIFETIME * 0.75)
+PRIVATE_INTERVAL = 3 * 24 * 3600
+NOT_FOUND_INTERVAL = 7 * 24 * 3600
+ERROR_INTERVAL = 10 * 60
+
+
+def next_poll_interval(profile: str, story_times: list[float], now: float) -> float:
+    """
+    Seconds until a user should be polled again.
+    profile: scrape_instagram's "profile" outcome (public / private / not_found / error / blocked ...)
+    story_times: epoch timestamps of the user's stories seen recently (any order)
+    """
+    if profile in ("error", "blocked"):
+        return ERROR_INTERVAL
+    if profile == "not_found":
+        return NOT_FOUND_INTERVAL
+    if profile != "public":
+        # private accounts can't show us stories; check now and then whether they opened up
+        return PRIVATE_INTERVAL
+
+    times = sorted(t for t in story_times if t <= now)
+    if len(times) < 2:
+        return PUBLIC_MAX_INTERVAL
+
+    # each story outlives the gap to the next one, so one poll per gap still sees them all
+    mean_gap = (times[-1] - times[0]) / (len(times) - 1)
+    return min(PUBLIC_MAX_INTERVAL, max(PUBLIC_MIN_INTERVAL, mean_gap))
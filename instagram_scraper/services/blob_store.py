@@ -0,0 +1,94 @@
+import hashlib
+from datetime import timedelta
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from instagram_scraper.models import MediaBlob
+
+BLOB_PREFIX = "blobs/"
+
+
+def blob_name(sha256: str, ext: str) -> str:
+    # two fan-out levels keep directories small: blobs/ab/cd/abcd....jpg
+    return f"{BLOB_PREFIX}{sha256[:2]}/{sha256[2:4]}/{sha256}.{ext.lstrip('.').lower()}"
+
+
+def is_blob_name(name: str) -> bool:
+    return bool(name) and name.startswith(BLOB_PREFIX)
+
+
+def sha256_of_name(name: str) -> str:
+    """SHA-256 encoded in a blob file name ('' for non-blob names)."""
+    if not is_blob_name(name):
+        return ""
+    return name.rsplit("/", 1)[-1].split(".", 1)[0]
+
+
+def store_blob(content, ext: str, sha256: str = "") -> str:
+    """
+    Store bytes (or a file-like object) once and take a reference on them.
+    Pass `sha256` if the caller already hashed the bytes.
+    Returns the storage name to assign to a FileField.
+    """
+    data = content.read() if hasattr(content, "read") else content
+    sha = sha256 or hashlib.sha256(data).hexdigest()
+
+    with transaction.atomic():
+        blob, _ = MediaBlob.objects.get_or_create(
+            sha256=sha,
+            defaults={"file": blob_name(sha, ext), "size": len(data)},
+        )
+        MediaBlob.objects.filter(pk=sha).update(ref_count=F("ref_count") + 1)
+
+    name = blob.file.name
+    if not default_storage.exists(name):
+        saved_name = default_storage.save(name, ContentFile(data))
+        # another thread wrote the same blob first; storage renamed ours
+        if saved_name != name:
+            default_storage.delete(saved_name)
+
+    return name
+
+
+def release_blob(name: str) -> None:
+    """Drop one reference; unreferenced blobs are removed later by collect_garbage."""
+    sha = sha256_of_name(name)
+    if not sha:
+        return
+    MediaBlob.objects.filter(pk=sha, ref_count__gt=0).update(
+        ref_count=F("ref_count") - 1,
+        released_at=timezone.now(),
+    )
+
+
+def collect_garbage(grace: timedelta = timedelta(hours=1), dry_run: bool = False) -> tuple[int, int]:
+    """
+    Delete blobs nobody references any more.
+    The grace period avoids racing a writer that is about to re-reference a blob.
+    Returns (blobs_deleted, bytes_reclaimed).
+    """
+    cutoff = timezone.now() - grace
+    deleted = 0
+    reclaimed = 0
+
+    candidates = (
+        MediaBlob.objects
+        .filter(ref_count=0, released_at__lt=cutoff)
+        .values_list("sha256", "file", "size")
+    )
+    for sha, name, size in candidates.iterator(chunk_size=1000):
+        if dry_run:
+            deleted += 1
+            reclaimed += size
+            continue
+
+        # conditional delete: skip blobs re-referenced since the query
+        count, _ = MediaBlob.objects.filter(pk=sha, ref_count=0).delete()
+        if count:
+            default_storage.delete(name)
+            deleted += 1
+            reclaimed += size
+
+    return deleted, reclaimed
@@ -0,0 +1,160 @@
+"""
+Full-text search over AI captions.
+- SQLite: FTS5 table (rowid = story id) kept in sync by `index_captions` / `remove_captions`
+- Postgres: GIN index on to_tsvector('english', ai_caption), always in sync
+Both created by migration 0013.
+"""
+import re
+from datetime import datetime
+from django.db import connection
+from instagram_scraper.models import InstagramStory, InstagramUser
+
+FTS_TABLE = "instagram_scraper_story_fts"
+STORY_TABLE = InstagramStory._meta.db_table
+USER_TABLE = InstagramUser._meta.db_table
+PG_CONFIG = "english"
+MAX_PAGE_SIZE = 100
+BACKFILL_BATCH_SIZE = 1000
+
+_TERM = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def _uses_fts5() -> bool:
+    return connection.vendor == "sqlite"
+
+
+def fts5_query(text: str) -> str:
+    """
+    User input -> FTS5 MATCH expression: every word / "quoted phrase" must match.
+    Terms are quoted, so FTS5 operators and punctuation in the input are taken literally.
+    """
+    terms = []
+    for phrase, word in _TERM.findall(text):
+        term = (phrase or word).replace('"', "").strip()
+        if term:
+            terms.append(f'"{term}"')
+    return " ".join(terms)
+
+
+# =========================
+# Index maintenance (SQLite only)
+# =========================
+
+def index_captions(stories) -> int:
+    """(Re)index the captions of `stories`; empty captions are removed from the index."""
+    if not _uses_fts5():
+        return 0
+    stories = list(stories)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"DELETE FROM {FTS_TABLE} WHERE rowid = %s",
+            [(s.id,) for s in stories if not s.ai_caption],
+        )
+        rows = [(s.id, s.ai_caption) for s in stories if s.ai_caption]
+        cursor.executemany(f"INSERT OR REPLACE INTO {FTS_TABLE}(rowid, caption) VALUES (%s, %s)", rows)
+    return len(rows)
+
+
+def remove_captions(story_ids) -> None:
+    if not _uses_fts5():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(i,) for i in story_ids])
+
+
+def rebuild_caption_index(batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """Re-index every captioned story in id-ordered batches. Returns stories indexed."""
+    if not _uses_fts5():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+
+    qs = InstagramStory.objects.exclude(ai_caption="").only("id", "ai_caption").order_by("id")
+    indexed = 0
+    last_id = 0
+    while True:
+        batch = list(qs.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            break
+        indexed += index_captions(batch)
+        last_id = batch[-1].id
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+    return indexed
+
+
+# =========================
+# Search
+# =========================
+
+def search_captions(
+    query: str,
+    page: int = 1,
+    page_size: int = 20,
+    usernames=None,
+    since: datetime | None = None,
+) -> dict:
+    """
+    Best matches first (bm25 / ts_rank), `page_size` per page.
+    Returns {"results": [{"story": InstagramStory, "rank": float, "snippet": str}], "has_next": bool}.
+    """
+    page = max(1, page)
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    empty = {"results": [], "has_next": False, "page": page, "page_size": page_size}
+
+    filters, params = [], []
+    if usernames is not None:
+        usernames = list(usernames)
+        if not usernames:
+            return empty
+        filters.append(f"u.username IN ({', '.join(['%s'] * len(usernames))})")
+        params.extend(usernames)
+    if since is not None:
+        filters.append("s.timestamp >= %s")
+        # what the ORM would send: UTC (SQLite stores naive UTC text and compares strings)
+        params.append(connection.ops.adapt_datetimefield_value(since))
+    where = "".join(f" AND {f}" for f in filters)
+    join = f" JOIN {USER_TABLE} u ON u.id = s.username_id" if usernames is not None else ""
+
+    if _uses_fts5():
+        match = fts5_query(query)
+        if not match:
+            return empty
+        # bm25() is lower-is-better; the story table is only joined for filters
+        stories_join = f" JOIN {STORY_TABLE} s ON s.id = {FTS_TABLE}.rowid{join}" if filters else ""
+        sql = (
+            f"SELECT {FTS_TABLE}.rowid, -bm25({FTS_TABLE}), snippet({FTS_TABLE}, 0, '[', ']', '…', 12) "
+            f"FROM {FTS_TABLE}{stories_join} "
+            f"WHERE {FTS_TABLE} MATCH %s{where} "
+            f"ORDER BY bm25({FTS_TABLE}), {FTS_TABLE}.rowid DESC LIMIT %s OFFSET %s"
+        )
+        params = [match, *params]
+    else:
+        if not query.strip():
+            return empty
+        vector = f"to_tsvector('{PG_CONFIG}', s.ai_caption)"
+        sql = (
+            f"SELECT s.id, ts_rank({vector}, q) AS rank, "
+            f"ts_headline('{PG_CONFIG}', s.ai_caption, q, 'StartSel=[, StopSel=], MaxWords=24, MinWords=8') "
+            f"FROM {STORY_TABLE} s{join}, websearch_to_tsquery('{PG_CONFIG}', %s) q "
+            f"WHERE {vector} @@ q{where} "
+            f"ORDER BY rank DESC, s.id DESC LIMIT %s OFFSET %s"
+        )
+        params = [query, *params]
+
+    # one extra row tells whether there is a next page (no COUNT over all matches)
+    params += [page_size + 1, (page - 1) * page_size]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+    stories = InstagramStory.objects.select_related("username").in_bulk([r[0] for r in rows])
+    results = [
+        {"story": stories[story_id], "rank": rank, "snippet": snippet}
+        for story_id, rank, snippet in rows
+        if story_id in stories
+    ]
+    return {"results": results, "has_next": has_next, "page": page, "page_size": page_size}
@@ -0,0 +1,100 @@
+from datetime import timedelta
+from pathlib import Path
+from django.utils import timezone
+from instagram_scraper.models import InstagramUser, ScrapeRun, ScrapeCheckpoint
+
+# keep IN (...) lists well under SQLite's bound-parameter limit
+CHUNK_SIZE = 900
+
+# outcomes a resumed run scrapes again
+RESUMABLE = (ScrapeCheckpoint.OUTCOME_PENDING, ScrapeCheckpoint.OUTCOME_FAILED)
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _add_checkpoints(run: ScrapeRun, usernames: list[str]) -> None:
+    ScrapeCheckpoint.objects.bulk_create(
+        (ScrapeCheckpoint(run=run, username=u) for u in usernames),
+        batch_size=CHUNK_SIZE,
+    )
+
+
+def start_or_resume_run(source: str, usernames: list[str], fresh: bool = False):
+    """
+    Return (run, usernames to scrape, attempts so far, resumed?).
+    Runs are keyed by the usernames file (resolved path), so editing the file doesn't
+    start over: the latest unfinished run over it is resumed unless `fresh`. A resumed
+    run scrapes its pending and failed users again, plus names added to the file since.
+    """
+    source = str(Path(source).resolve())
+    usernames = list(dict.fromkeys(usernames))
+
+    run = None
+    if not fresh:
+        run = (
+            ScrapeRun.objects
+            .filter(source=source, finished_at__isnull=True)
+            .order_by("-started_at")
+            .first()
+        )
+
+    if run is None:
+        run = ScrapeRun.objects.create(source=source)
+        _add_checkpoints(run, usernames)
+        return run, usernames, {}, False
+
+    known, attempts = set(), {}
+    rows = run.checkpoints.values_list("username", "outcome", "attempts")
+    for username, outcome, n in rows.iterator(chunk_size=5000):
+        known.add(username)
+        if outcome in RESUMABLE:
+            attempts[username] = n
+    added = [u for u in usernames if u not in known]
+    _add_checkpoints(run, added)
+    attempts.update(dict.fromkeys(added, 0))
+    # keep file order; names removed from the file are dropped
+    pending = [u for u in usernames if u in attempts]
+    return run, pending, attempts, True
+
+
+def skip_recently_scraped(run: ScrapeRun, usernames: list[str], min_interval: timedelta) -> list[str]:
+    """Mark users scraped within `min_interval` as done; return the ones still to scrape."""
+    if min_interval <= timedelta(0) or not usernames:
+        return usernames
+
+    cutoff = timezone.now() - min_interval
+    recent = set()
+    for chunk in _chunks(usernames):
+        recent.update(
+            InstagramUser.objects
+            .filter(username__in=chunk, last_scraped__gte=cutoff)
+            .values_list("username", flat=True)
+        )
+
+    recent_list = list(recent)
+    now = timezone.now()
+    for chunk in _chunks(recent_list):
+        run.checkpoints.filter(username__in=chunk).update(outcome=ScrapeCheckpoint.OUTCOME_RECENT, updated_at=now)
+
+    return [u for u in usernames if u not in recent]
+
+
+def record_attempt(run: ScrapeRun, username: str, attempts: int) -> None:
+    """Persist an attempt as it starts, so a run killed mid-retry resumes with the count."""
+    run.checkpoints.filter(username=username).update(attempts=attempts, updated_at=timezone.now())
+
+
+def record_checkpoint(run: ScrapeRun, username: str, outcome: str, attempts: int) -> None:
+    run.checkpoints.filter(username=username).update(
+        outcome=outcome,
+        attempts=attempts,
+        updated_at=timezone.now(),
+    )
+
+
+def finish_run(run: ScrapeRun) -> None:
+    run.finished_at = timezone.now()
+    run.save(update_fields=["finished_at"])
@@ -0,0 +1,91 @@
+import contextvars
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from django.db import close_old_connections
+from instagram_scraper import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ByteRateLimiter:
+    """
+    Token bucket shared by all download threads.
+    Callers may overdraw the bucket; they then sleep off the debt,
+    so large chunks are throttled as well as small ones.
+    """
+
+    def __init__(self, bytes_per_second: int):
+        self.rate = float(bytes_per_second)
+        self._tokens = self.rate
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, nbytes: int) -> None:
+        if self.rate <= 0:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= nbytes
+            debt = -self._tokens
+
+        if debt > 0:
+            time.sleep(debt / self.rate)
+
+
+class DownloadPool:
+    """
+    Bounded media download pool, separate from the scraper workers.
+    - Own concurrency (`workers`)
+    - Own byte-rate limit (`bytes_per_second`, 0 = unlimited)
+    - At most `max_pending` queued jobs; `submit` blocks when full (backpressure)
+    """
+
+    def __init__(self, workers: int = 4, max_pending: int = 200, bytes_per_second: int = 0):
+        self.workers = workers
+        self.rate_limiter = ByteRateLimiter(bytes_per_second) if bytes_per_second > 0 else None
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="download")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._stats_lock = threading.Lock()
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0}
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue `fn(*args, rate_limiter=..., **kwargs)`; `fn` returns True on success."""
+        self._slots.acquire()
+        with self._stats_lock:
+            self._stats["submitted"] += 1
+        metrics.DOWNLOAD_QUEUE_DEPTH.inc()
+        try:
+            # run in a copy of the caller's context so the job joins the caller's trace
+            return self._executor.submit(contextvars.copy_context().run, self._run, fn, args, kwargs)
+        except Exception:
+            metrics.DOWNLOAD_QUEUE_DEPTH.dec()
+            self._slots.release()
+            raise
+
+    def _run(self, fn, args, kwargs):
+        ok = False
+        try:
+            ok = bool(fn(*args, rate_limiter=self.rate_limiter, **kwargs))
+            return ok
+        except Exception as e:
+            logger.warning(f"[DOWNLOAD] job failed: {e}")
+            return False
+        finally:
+            with self._stats_lock:
+                self._stats["completed" if ok else "failed"] += 1
+            metrics.DOWNLOAD_QUEUE_DEPTH.dec()
+            self._slots.release()
+            # download threads are long-lived; don't keep stale DB connections around
+            close_old_connections()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
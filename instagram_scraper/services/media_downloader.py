@@ -1,12 +1,62 @@
+import time
+from typing import NamedTuple
 import requests
 from django.core.files.base import ContentFile
+from instagram_scraper import metrics
 
-def download_media(url: str, filename: str):
+CHUNK_SIZE = 64 * 1024
+
+
+class MediaFetch(NamedTuple):
+    file: ContentFile | None      # None when the server answered 304
+    etag: str
+    last_modified: str
+    not_modified: bool
+
+
+def fetch_media(url: str, filename: str, etag: str = "", last_modified: str = "", rate_limiter=None):
+    """
+    Conditional GET (If-None-Match / If-Modified-Since when validators are given).
+    Returns a MediaFetch, or None on any error.
+    """
+    started = time.monotonic()
     try:
         # Adding a UA sometimes helps with media endpoints
         headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
-        return ContentFile(response.content, name=filename)
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        with requests.get(url, headers=headers, timeout=30, stream=True) as response:
+            if response.status_code == 304:
+                metrics.MEDIA_REQUESTS.inc(result="not_modified")
+                return MediaFetch(None, etag, last_modified, True)
+
+            response.raise_for_status()
+            chunks = []
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                # throttle against the shared byte budget of the download pool
+                if rate_limiter:
+                    rate_limiter.consume(len(chunk))
+                chunks.append(chunk)
+
+            data = b"".join(chunks)
+            metrics.MEDIA_REQUESTS.inc(result="ok")
+            metrics.MEDIA_BYTES.inc(len(data))
+            metrics.MEDIA_SIZE.observe(len(data))
+            metrics.MEDIA_SECONDS.observe(time.monotonic() - started)
+            return MediaFetch(
+                ContentFile(data, name=filename),
+                response.headers.get("ETag", ""),
+                response.headers.get("Last-Modified", ""),
+                False,
+            )
     except Exception:
+        metrics.MEDIA_REQUESTS.inc(result="error")
         return None
+
+
+def download_media(url: str, filename: str, rate_limiter=None):
+    fetched = fetch_media(url, filename, rate_limiter=rate_limiter)
+    return fetched.file if fetched else None
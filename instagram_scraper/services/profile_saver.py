@@ -1,6 +1,40 @@
+import hashlib
+import threading
+from collections import Counter
+from urllib.parse import urlparse, parse_qs, unquote
+from django.core.files.storage import default_storage
 from django.utils import timezone
 from instagram_scraper.models import InstagramUser
-from .media_downloader import download_media
+from .media_downloader import fetch_media
+from .blob_store import store_blob, release_blob, is_blob_name, sha256_of_name
+
+# Profile picture outcomes across all scraper threads (replaced / unchanged_url / not_modified / same_content / failed)
+_PIC_STATS_LOCK = threading.Lock()
+_PIC_STATS = Counter()
+
+
+def _count_pic(outcome: str):
+    with _PIC_STATS_LOCK:
+        _PIC_STATS[outcome] += 1
+
+
+def profile_pic_stats() -> dict:
+    with _PIC_STATS_LOCK:
+        return dict(_PIC_STATS)
+
+
+def profile_pic_key(url: str) -> str:
+    """
+    Stable identifier of a profile picture URL.
+    The proxied CDN URL (media=...) carries signature/expiry query params that
+    change on every request, so only its host + path identify the image.
+    """
+    parsed = urlparse(url)
+    qs = parse_qs(parsed.query)
+    if "media" in qs and qs["media"]:
+        parsed = urlparse(unquote(qs["media"][0]))
+    return f"{parsed.netloc}{parsed.path}"[:500]
+
 
 def save_profile(username: str, profile_data: dict):
     is_private = (profile_data.get("status") == "private")
@@ -18,19 +52,58 @@ def save_profile(username: str, profile_data: dict):
     user.is_private = is_private
     user.last_scraped = timezone.now()
 
-    # Replace profile pic only if we got one
+    # Replace profile pic only if we got one and it actually changed
     if profile_pic_url:
-        filename = f"{username}_profile.jpg"
-        file_content = download_media(profile_pic_url, filename)
-
-        if file_content:
-            # ✅ delete previous file so we don't accumulate files
-            if user.profile_pic and user.profile_pic.name:
-                user.profile_pic.delete(save=False)
-
-            # ✅ save new file (same filename is fine; storage will handle it)
-            user.profile_pic.save(filename, file_content, save=False)
+        _update_profile_pic(user, profile_pic_url)
 
     user.save()
     return user
 
+
+def _update_profile_pic(user: InstagramUser, profile_pic_url: str):
+    key = profile_pic_key(profile_pic_url)
+    has_pic = bool(user.profile_pic and user.profile_pic.name)
+
+    # ✅ same image as last time -> no request at all
+    if has_pic and key and key == user.profile_pic_source:
+        _count_pic("unchanged_url")
+        return
+
+    filename = f"{user.username}_profile.jpg"
+    fetched = fetch_media(
+        profile_pic_url,
+        filename,
+        etag=user.profile_pic_etag if has_pic else "",
+        last_modified=user.profile_pic_last_modified if has_pic else "",
+    )
+    if fetched is None:
+        _count_pic("failed")
+        return
+
+    user.profile_pic_source = key
+    if fetched.not_modified:
+        _count_pic("not_modified")
+        return
+
+    user.profile_pic_etag = fetched.etag[:200]
+    user.profile_pic_last_modified = fetched.last_modified[:64]
+
+    data = fetched.file.read()
+    sha = hashlib.sha256(data).hexdigest()
+    current_sha = user.profile_pic_sha256 or sha256_of_name(user.profile_pic.name if has_pic else "")
+    user.profile_pic_sha256 = sha
+
+    # ✅ bytes identical -> keep the stored file
+    if has_pic and sha == current_sha:
+        _count_pic("same_content")
+        return
+
+    # ✅ store by content hash, then drop our reference on the previous blob
+    previous = user.profile_pic.name if has_pic else ""
+    user.profile_pic.name = store_blob(data, "jpg", sha256=sha)
+    if is_blob_name(previous):
+        release_blob(previous)
+    elif previous:
+        # pre-blob avatar (profile_pics/...): nobody else points at it
+        default_storage.delete(previous)
+    _count_pic("replaced")
@@ -0,0 +1,235 @@
+"""
+Story retention (apply_retention command).
+Each policy selects old stories and either moves their media into zip files under
+STORY_ARCHIVE_ROOT, deletes the media, or deletes the rows. A thumbnail is made first
+so archived stories stay browsable. Zips are never rewritten: deleting archived stories
+removes a zip once no story points at it, a zip still holding other stories keeps the
+deleted ones' media (reported as archive_bytes_kept). Work is done in small id-ordered chunks, one short
+transaction each, so the scraper and analysis service keep getting the write lock.
+"""
+import os
+import time
+import zipfile
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from instagram_scraper.models import InstagramStory, MediaBlob
+from .blob_store import release_blob, sha256_of_name
+from .thumbnails import make_thumbnail, save_thumbnail
+
+ARCHIVE = "archive"
+DELETE_MEDIA = "delete_media"
+DELETE = "delete"
+ACTIONS = (ARCHIVE, DELETE_MEDIA, DELETE)
+
+CHUNK_SIZE = 200
+
+
+@dataclass
+class RetentionPolicy:
+    name: str
+    older_than_days: int
+    action: str
+    analyzed: bool | None = None       # None = either
+    interesting: bool | None = None    # None = either; False excludes not-yet-analysed stories
+
+    def __post_init__(self):
+        if self.action not in ACTIONS:
+            raise ValueError(f"retention policy {self.name!r}: unknown action {self.action!r} (use one of {ACTIONS})")
+
+    def queryset(self, now: datetime):
+        qs = InstagramStory.objects.filter(timestamp__lt=now - timedelta(days=self.older_than_days))
+        if self.analyzed is not None:
+            qs = qs.filter(ai_analyzed_at__isnull=not self.analyzed)
+        if self.interesting is not None:
+            qs = qs.filter(ai_is_interesting=self.interesting)
+        if self.action != DELETE:
+            # only stories that still have media in the hot store
+            qs = qs.filter(archived_at__isnull=True, media_file__isnull=False).exclude(media_file="")
+        return qs
+
+
+@dataclass
+class RetentionResult:
+    policy: str
+    action: str
+    stories: int = 0
+    media_bytes: int = 0          # size of the media that left the hot store
+    archived_bytes: int = 0       # compressed size written to the archive
+    released_bytes: int = 0       # blobs left without references (freed by the blob GC)
+    thumbnails: int = 0
+    archives: list = field(default_factory=list)
+    archives_deleted: list = field(default_factory=list)   # zips left without stories (delete)
+    archive_bytes_freed: int = 0
+    archive_bytes_kept: int = 0   # zips that still hold other stories besides deleted ones
+
+
+def load_policies(names=None) -> list[RetentionPolicy]:
+    policies = [RetentionPolicy(**p) for p in getattr(settings, "STORY_RETENTION_POLICIES", [])]
+    if names:
+        unknown = set(names) - {p.name for p in policies}
+        if unknown:
+            raise ValueError(f"unknown retention policies: {', '.join(sorted(unknown))}")
+        policies = [p for p in policies if p.name in names]
+    return policies
+
+
+def _media_sizes(names: list[str]) -> dict[str, int]:
+    """Storage name -> size; blob sizes come from MediaBlob instead of stat() calls."""
+    shas = {sha256_of_name(n): n for n in names if sha256_of_name(n)}
+    sizes = {shas[sha]: size for sha, size in MediaBlob.objects.filter(pk__in=shas).values_list("sha256", "size")}
+    for name in names:
+        if name not in sizes:
+            sizes[name] = default_storage.size(name) if default_storage.exists(name) else 0
+    return sizes
+
+
+def _released_bytes(names) -> int:
+    shas = sorted({sha256_of_name(n) for n in names} - {""})
+    total = 0
+    for i in range(0, len(shas), 900):  # stay under SQLite's bound-parameter limit
+        rows = MediaBlob.objects.filter(pk__in=shas[i:i + 900], ref_count=0)
+        total += rows.aggregate(total=Sum("size"))["total"] or 0
+    return total
+
+
+def _delete_unreferenced_archives(names, archive_root: Path, result: RetentionResult) -> None:
+    """Remove the zips among `names` that no story points at any more."""
+    names = sorted(set(names) - {""})
+    still_used = set()
+    for i in range(0, len(names), 900):
+        still_used.update(
+            InstagramStory.objects.filter(archive_file__in=names[i:i + 900])
+            .values_list("archive_file", flat=True)
+            .distinct()
+        )
+    for name in names:
+        path = archive_root / name
+        size = path.stat().st_size if path.exists() else 0
+        if name in still_used:
+            result.archive_bytes_kept += size
+            continue
+        path.unlink(missing_ok=True)
+        result.archives_deleted.append(name)
+        result.archive_bytes_freed += size
+
+
+def _write_archive(path: Path, stories: list[InstagramStory]) -> set[int]:
+    """Zip the media of `stories` into a new file; returns ids of the stories written."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    written = set()
+    tmp = path.with_suffix(".zip.tmp")
+    with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+        for s in stories:
+            name = s.media_file.name
+            if not default_storage.exists(name):
+                continue
+            ext = os.path.splitext(name)[1]
+            with default_storage.open(name, "rb") as src, zf.open(f"{s.username_id}/{s.story_id}{ext}", "w") as dst:
+                for chunk in iter(lambda: src.read(1 << 20), b""):
+                    dst.write(chunk)
+            written.add(s.id)
+    # the rows will point at this file; make sure it is on disk before they do
+    with open(tmp, "rb+") as fh:
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+    return written
+
+
+def _retire_media(policy, stories, result, archive_root: Path, stamp: str, chunk_no: int, now) -> list[str]:
+    """Archive / delete the media of one chunk; returns the media names released."""
+    # thumbnails first, outside the transaction (decoding is slow)
+    thumbs = {}
+    for s in stories:
+        if not s.thumbnail:
+            data = make_thumbnail(s.media_file.name, s.media_type)
+            if data:
+                thumbs[s.id] = save_thumbnail(s.story_id, data)
+
+    archive_file = ""
+    keep = {s.id for s in stories}
+    if policy.action == ARCHIVE:
+        archive_file = f"{now:%Y/%m}/{policy.name}-{stamp}-{chunk_no:05d}.zip"
+        keep = _write_archive(archive_root / archive_file, stories)
+        if keep:
+            result.archives.append(archive_file)
+            result.archived_bytes += (archive_root / archive_file).stat().st_size
+        else:
+            (archive_root / archive_file).unlink()
+
+    retired = [s for s in stories if s.id in keep]
+    sizes = _media_sizes([s.media_file.name for s in retired])
+    released = []
+    with transaction.atomic():
+        for s in retired:
+            fields = {"media_file": None, "archived_at": now, "archive_file": archive_file}
+            if s.id in thumbs:
+                fields["thumbnail"] = thumbs[s.id]
+            # skip rows changed since the chunk was read (e.g. re-downloaded media)
+            if InstagramStory.objects.filter(id=s.id, media_file=s.media_file.name).update(**fields):
+                release_blob(s.media_file.name)
+                released.append(s.media_file.name)
+                result.stories += 1
+                result.media_bytes += sizes.get(s.media_file.name, 0)
+    result.thumbnails += len(thumbs)
+    return released
+
+
+def apply_policy(
+    policy: RetentionPolicy,
+    chunk_size: int = CHUNK_SIZE,
+    pause: float = 0.05,
+    dry_run: bool = False,
+    archive_root: str | None = None,
+    log_callback=None,
+) -> RetentionResult:
+    now = timezone.now()
+    result = RetentionResult(policy=policy.name, action=policy.action)
+    archive_root = Path(archive_root or settings.STORY_ARCHIVE_ROOT)
+    stamp = f"{now:%Y%m%d-%H%M%S}"
+    qs = policy.queryset(now)
+
+    touched = set()  # media names released; their blobs are summed once at the end
+    archives = set()  # zips holding deleted stories; removed at the end if nothing else is in them
+    last_id = 0
+    chunk_no = 0
+    while True:
+        stories = list(
+            qs.filter(id__gt=last_id)
+            .order_by("id")
+            .only("id", "story_id", "username_id", "media_file", "media_type", "thumbnail", "archive_file")[:chunk_size]
+        )
+        if not stories:
+            result.released_bytes = _released_bytes(touched)
+            _delete_unreferenced_archives(archives, archive_root, result)
+            return result
+        last_id = stories[-1].id
+        chunk_no += 1
+
+        if dry_run:
+            result.stories += len(stories)
+            names = [s.media_file.name for s in stories if s.media_file]
+            result.media_bytes += sum(_media_sizes(names).values())
+        elif policy.action == DELETE:
+            names = [s.media_file.name for s in stories if s.media_file]
+            sizes = _media_sizes(names)
+            with transaction.atomic():
+                # post_delete signals release blobs, thumbnails and caption index rows
+                InstagramStory.objects.filter(id__in=[s.id for s in stories]).delete()
+            result.stories += len(stories)
+            result.media_bytes += sum(sizes.values())
+            touched.update(names)
+            archives.update(s.archive_file for s in stories)
+        else:
+            touched.update(_retire_media(policy, stories, result, archive_root, stamp, chunk_no, now))
+
+        if log_callback:
+            log_callback(f"[{policy.name}] chunk {chunk_no}: {result.stories} stories so far")
+        # let the scraper / analysis service take the write lock between chunks
+        if pause > 0:
+            time.sleep(pause)
@@ -0,0 +1,238 @@
+"""
+Per-day dashboard rollups: DailyStats, UserDailyStats, KeywordDailyStats.
+Bumped in the same transaction as the writes they count (save_stories, the analysis
+service, story deletion); `rebuild_rollups` recomputes them from the story table.
+Days are local dates of the story timestamp, as TruncDate gives.
+"""
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from instagram_scraper.models import (
+    InstagramStory,
+    InstagramUser,
+    StoryHit,
+    DailyStats,
+    UserDailyStats,
+    KeywordDailyStats,
+)
+from .stats_cache import invalidate_stats
+from .story_hits import normalize_keyword
+
+COUNTERS = ("stories", "analyzed", "interesting", "hits")
+
+
+def story_day(timestamp) -> date:
+    return timezone.localtime(timestamp).date()
+
+
+def _bump(model, keys: dict, deltas: dict, create: bool = True) -> None:
+    """Add `deltas` to the row at `keys`, creating it if needed (safe against a concurrent create)."""
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not deltas:
+        return
+    updates = {k: F(k) + v for k, v in deltas.items()}
+    if model.objects.filter(**keys).update(**updates) or not create:
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**keys, **deltas)
+    except IntegrityError:
+        model.objects.filter(**keys).update(**updates)
+
+
+def _bump_story_counts(user_id: int, day: date, sign: int = 1, **counts) -> None:
+    # decrements never create rows: a missing user row was cascade-deleted with its user
+    deltas = {k: sign * v for k, v in counts.items()}
+    _bump(DailyStats, {"day": day}, deltas, create=sign > 0)
+    _bump(UserDailyStats, {"username_id": user_id, "day": day}, deltas, create=sign > 0)
+
+
+def record_new_stories(user_id: int, timestamps) -> None:
+    """Count newly inserted stories (call inside the insert's transaction)."""
+    for day, n in Counter(story_day(ts) for ts in timestamps).items():
+        _bump_story_counts(user_id, day, stories=n)
+    invalidate_stats()
+
+
+def record_analysis(story: InstagramStory, keywords) -> None:
+    """Count a first analysis result of `story` (call inside the transaction that stores it)."""
+    keywords = {normalize_keyword(k) for k in keywords} - {""}
+    day = story_day(story.timestamp)
+    _bump_story_counts(story.username_id, day, analyzed=1, interesting=int(bool(story.ai_is_interesting)), hits=len(keywords))
+    for keyword in keywords:
+        _bump(KeywordDailyStats, {"keyword": keyword, "day": day}, {"stories": 1})
+    invalidate_stats()
+
+
+def record_deleted_story(story: InstagramStory) -> None:
+    day = story_day(story.timestamp)
+    analyzed = story.ai_analyzed_at is not None
+    keywords = {normalize_keyword(k) for k in (story.ai_hits or [])} - {""} if analyzed else set()
+    _bump_story_counts(
+        story.username_id,
+        day,
+        sign=-1,
+        stories=1,
+        analyzed=int(analyzed),
+        interesting=int(analyzed and bool(story.ai_is_interesting)),
+        hits=len(keywords),
+    )
+    for keyword in keywords:
+        _bump(KeywordDailyStats, {"keyword": keyword, "day": day}, {"stories": -1}, create=False)
+    invalidate_stats()
+
+
+# =========================
+# Rebuild / consistency check
+# =========================
+
+def compute_rollups() -> dict:
+    """Rollup rows recomputed from InstagramStory / StoryHit: {"user": {...}, "keyword": {...}, "daily": {...}}."""
+    users = {}
+    rows = (
+        InstagramStory.objects
+        .annotate(day=TruncDate("timestamp"))
+        .values("username_id", "day")
+        .annotate(
+            stories=Count("id"),
+            analyzed=Count("id", filter=Q(ai_analyzed_at__isnull=False)),
+            interesting=Count("id", filter=Q(ai_analyzed_at__isnull=False, ai_is_interesting=True)),
+        )
+    )
+    for r in rows.iterator(chunk_size=2000):
+        users[(r["username_id"], r["day"])] = {k: r[k] for k in COUNTERS if k != "hits"} | {"hits": 0}
+
+    keywords = {}
+    hit_rows = (
+        StoryHit.objects
+        .annotate(day=TruncDate("timestamp"))
+        .values("username_id", "day", "keyword")
+        .annotate(stories=Count("story_id", distinct=True))
+    )
+    for r in hit_rows.iterator(chunk_size=2000):
+        key = (r["username_id"], r["day"])
+        if key in users:
+            users[key]["hits"] += r["stories"]
+        kw_key = (r["keyword"], r["day"])
+        keywords[kw_key] = keywords.get(kw_key, 0) + r["stories"]
+
+    daily = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for (_, day), counts in users.items():
+        for k in COUNTERS:
+            daily[day][k] += counts[k]
+    return {"user": users, "keyword": keywords, "daily": dict(daily)}
+
+
+def current_rollups() -> dict:
+    return {
+        "user": {
+            (r["username_id"], r["day"]): {k: r[k] for k in COUNTERS}
+            for r in UserDailyStats.objects.values("username_id", "day", *COUNTERS).iterator(chunk_size=2000)
+        },
+        "keyword": {
+            (r["keyword"], r["day"]): r["stories"]
+            for r in KeywordDailyStats.objects.values("keyword", "day", "stories").iterator(chunk_size=2000)
+        },
+        "daily": {r["day"]: {k: r[k] for k in COUNTERS} for r in DailyStats.objects.values("day", *COUNTERS)},
+    }
+
+
+def _is_zero(value) -> bool:
+    return not any(value.values()) if isinstance(value, dict) else not value
+
+
+def diff_rollups(expected: dict, actual: dict) -> dict:
+    """table -> number of rows that differ (missing all-zero rows don't count)."""
+    diffs = {}
+    for table in ("daily", "user", "keyword"):
+        exp, act = expected[table], actual[table]
+        keys = set(exp) | set(act)
+        empty = dict.fromkeys(COUNTERS, 0) if table != "keyword" else 0
+        diffs[table] = sum(
+            1 for k in keys
+            if exp.get(k, empty) != act.get(k, empty) and not (_is_zero(exp.get(k, empty)) and _is_zero(act.get(k, empty)))
+        )
+    return diffs
+
+
+def rebuild_rollups(expected: dict | None = None) -> dict:
+    """Replace all rollup rows with freshly computed ones (one transaction). Returns row counts."""
+    expected = expected or compute_rollups()
+    with transaction.atomic():
+        DailyStats.objects.all().delete()
+        UserDailyStats.objects.all().delete()
+        KeywordDailyStats.objects.all().delete()
+        DailyStats.objects.bulk_create(
+            (DailyStats(day=day, **counts) for day, counts in expected["daily"].items()), batch_size=500
+        )
+        UserDailyStats.objects.bulk_create(
+            (UserDailyStats(username_id=u, day=day, **counts) for (u, day), counts in expected["user"].items()),
+            batch_size=500,
+        )
+        KeywordDailyStats.objects.bulk_create(
+            (KeywordDailyStats(keyword=k, day=day, stories=n) for (k, day), n in expected["keyword"].items()),
+            batch_size=500,
+        )
+        invalidate_stats()
+    return {table: len(rows) for table, rows in expected.items()}
+
+
+# =========================
+# Dashboard queries (rollup rows only)
+# =========================
+
+def totals() -> dict:
+    """All-time story counters, summed over one row per day."""
+    agg = DailyStats.objects.aggregate(**{k: Sum(k) for k in COUNTERS})
+    return {k: agg[k] or 0 for k in COUNTERS}
+
+
+def daily_series(days: int = 30, username: str | None = None) -> list[dict]:
+    """Per-day counters for the last `days` days (oldest first, missing days as zeros)."""
+    today = timezone.localdate()
+    start = today - timedelta(days=days - 1)
+    if username is None:
+        qs = DailyStats.objects.filter(day__gte=start)
+    else:
+        qs = UserDailyStats.objects.filter(username__username=username, day__gte=start)
+    by_day = {r["day"]: r for r in qs.values("day", *COUNTERS)}
+    series = []
+    for i in range(days):
+        day = start + timedelta(days=i)
+        row = by_day.get(day, {})
+        series.append({"day": day.isoformat(), **{k: row.get(k, 0) for k in COUNTERS}})
+    return series
+
+
+def keyword_totals(days: int | None = None) -> dict[str, int]:
+    """Stories per keyword (optionally over the last `days` days), most hit first."""
+    qs = KeywordDailyStats.objects.all()
+    if days is not None:
+        qs = qs.filter(day__gte=timezone.localdate() - timedelta(days=days - 1))
+    rows = qs.values("keyword").annotate(n=Sum("stories")).filter(n__gt=0).order_by("-n", "keyword")
+    return {r["keyword"]: r["n"] for r in rows}
+
+
+def top_users(days: int = 7, limit: int = 10) -> list[dict]:
+    start = timezone.localdate() - timedelta(days=days - 1)
+    rows = (
+        UserDailyStats.objects
+        .filter(day__gte=start)
+        .values("username__username")
+        .annotate(stories=Sum("stories"), interesting=Sum("interesting"))
+        .order_by("-interesting", "-stories")[:limit]
+    )
+    return [{"username": r["username__username"], "stories": r["stories"], "interesting": r["interesting"]} for r in rows]
+
+
+def dashboard_stats() -> dict:
+    now = timezone.now()
+    return {
+        "usernames": InstagramUser.objects.count(),
+        **totals(),
+        # rolling window: an index range count on ig_story_ts_idx
+        "stories_24h": InstagramStory.objects.filter(timestamp__gte=now - timedelta(hours=24)).count(),
+    }
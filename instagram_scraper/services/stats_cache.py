@@ -0,0 +1,66 @@
+"""
+Cached dashboard stats (the /scraper/api/stats/ views).
+One "stats version" in the cache is the time of the last write that can change a stat;
+the scraper, the analysis service and deletions move it (`invalidate_stats`, after
+commit). Responses are cached under (endpoint, params, version, time bucket), and the
+same tuple is the ETag, so a poll while nothing changed is one cache read and a 304.
+The bucket (STATS_CACHE_SECONDS) caps how stale rolling-window numbers can get.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = "ig:stats:version"
+
+
+def _bucket_seconds() -> int:
+    return max(1, getattr(settings, "STATS_CACHE_SECONDS", 60))
+
+
+def stats_version() -> float:
+    """Time of the last stats-changing write (set to now if the cache lost it: invalidates)."""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = time.time()
+        cache.add(VERSION_KEY, version, timeout=None)
+        version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def _set_version() -> None:
+    cache.set(VERSION_KEY, time.time(), timeout=None)
+
+
+def invalidate_stats() -> None:
+    """Mark cached stats stale once the current transaction commits (now, outside one)."""
+    transaction.on_commit(_set_version)
+
+
+def _state() -> tuple[float, int]:
+    bucket = int(time.time()) // _bucket_seconds()
+    return stats_version(), bucket
+
+
+def stats_etag(name: str, params: dict) -> str:
+    version, bucket = _state()
+    raw = f"{name}|{sorted(params.items())}|{version!r}|{bucket}"
+    return hashlib.sha1(raw.encode()).hexdigest()[:20]
+
+
+def stats_last_modified() -> datetime:
+    """The later of the last write and the start of the current bucket."""
+    version, bucket = _state()
+    return datetime.fromtimestamp(max(version, bucket * _bucket_seconds()), tz=dt_timezone.utc)
+
+
+def cached_stats(name: str, params: dict, compute):
+    """compute() once per (name, params, version, bucket); later calls read the cache."""
+    key = f"ig:stats:{stats_etag(name, params)}"
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, timeout=2 * _bucket_seconds())
+    return value
@@ -0,0 +1,106 @@
+"""
+Story listing for the JSON API: newest first, keyset-paginated on (timestamp, id).
+The cursor is the (timestamp, id) of the last story of the previous page, so every
+page is an index range scan from that point (ig_story_ts_idx, ig_story_user_ts_idx,
+ig_story_interesting_ts_idx) and page 1000 costs the same as page 1.
+"""
+import base64
+import binascii
+from datetime import datetime
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from instagram_scraper.models import InstagramStory, StoryHit
+from .story_hits import normalize_keyword
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# what story_json() reads; everything else (media_url, caption JSON, ...) stays in the DB
+LIST_FIELDS = (
+    "id",
+    "story_id",
+    "timestamp",
+    "media_type",
+    "media_file",
+    "thumbnail",
+    "ai_caption",
+    "ai_hits",
+    "ai_is_interesting",
+    "username__username",
+)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(story: InstagramStory) -> str:
+    raw = f"{story.timestamp.isoformat()}|{story.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, story_id = raw.rsplit("|", 1)
+        timestamp = parse_datetime(ts)
+        if timestamp is None:
+            raise ValueError(ts)
+        return timestamp, int(story_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidCursor(f"bad cursor: {cursor!r}") from e
+
+
+def story_queryset(
+    usernames=None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    interesting: bool | None = None,
+    keyword: str | None = None,
+    before: tuple[datetime, int] | None = None,
+):
+    """
+    Filtered stories, newest first, with the user joined and only LIST_FIELDS loaded.
+    `before`: (timestamp, id) keyset bound, only stories that sort after it.
+    """
+    qs = InstagramStory.objects.select_related("username").only(*LIST_FIELDS)
+    if before is not None:
+        ts, story_id = before
+        # the plain range keeps it an index range scan; the OR only resolves timestamp ties
+        qs = qs.filter(timestamp__lte=ts).filter(Q(timestamp__lt=ts) | Q(id__lt=story_id))
+    if usernames is not None:
+        qs = qs.filter(username__username__in=list(usernames))
+    if since is not None:
+        qs = qs.filter(timestamp__gte=since)
+    if until is not None:
+        qs = qs.filter(timestamp__lt=until)
+    if interesting is not None:
+        qs = qs.filter(ai_is_interesting=interesting)
+    if keyword:
+        # a story can have several hit rows per keyword (one per frame); IN keeps it one row.
+        # SQLite drives this from ig_hit_keyword_ts_idx and sorts the matches, so the
+        # time bounds are repeated here to keep that set small on deep pages
+        hits = StoryHit.objects.filter(keyword=normalize_keyword(keyword))
+        if since is not None:
+            hits = hits.filter(timestamp__gte=since)
+        if until is not None:
+            hits = hits.filter(timestamp__lt=until)
+        if before is not None:
+            hits = hits.filter(timestamp__lte=before[0])
+        qs = qs.filter(id__in=hits.values("story_id"))
+    return qs.order_by("-timestamp", "-id")
+
+
+def list_stories(cursor: str | None = None, page_size: int = DEFAULT_PAGE_SIZE, **filters) -> dict:
+    """
+    One page of story_queryset(**filters) after `cursor`.
+    Returns {"results": [InstagramStory], "next_cursor": str | None, "page_size": int}.
+    Raises InvalidCursor for a cursor that wasn't made by encode_cursor.
+    """
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    qs = story_queryset(before=decode_cursor(cursor) if cursor else None, **filters)
+
+    # one extra row tells whether there is a next page (no COUNT)
+    stories = list(qs[:page_size + 1])
+    next_cursor = encode_cursor(stories[page_size - 1]) if len(stories) > page_size else None
+    return {"results": stories[:page_size], "next_cursor": next_cursor, "page_size": page_size}
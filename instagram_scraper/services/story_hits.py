@@ -0,0 +1,110 @@
+from datetime import datetime
+from django.db import transaction
+from django.db.models import Count
+from instagram_scraper.models import InstagramStory, StoryHit
+
+BACKFILL_BATCH_SIZE = 500
+
+
+def normalize_keyword(keyword: str) -> str:
+    # the analysis stores keywords lower-cased (classify_media.normalize_token)
+    return " ".join(keyword.strip().lower().split())
+
+
+def _rows(story: InstagramStory, hits) -> list[StoryHit]:
+    """`hits`: keywords, or (keyword, frame_t, score) tuples."""
+    rows = []
+    for hit in hits:
+        keyword, frame_t, score = (hit, None, None) if isinstance(hit, str) else hit
+        rows.append(StoryHit(
+            story=story,
+            keyword=normalize_keyword(keyword),
+            frame_t=frame_t,
+            score=score,
+            username_id=story.username_id,
+            timestamp=story.timestamp,
+        ))
+    return rows
+
+
+def replace_story_hits(story: InstagramStory, hits) -> int:
+    """Make `hits` the story's only hit rows (re-analysis replaces the old ones)."""
+    rows = _rows(story, hits)
+    with transaction.atomic():
+        StoryHit.objects.filter(story=story).delete()
+        StoryHit.objects.bulk_create(rows)
+    return len(rows)
+
+
+def backfill_story_hits(batch_size: int = BACKFILL_BATCH_SIZE, rebuild: bool = False) -> tuple[int, int]:
+    """
+    Create hit rows from ai_hits for analysed stories that have none (all of them with `rebuild`).
+    Walks stories by id so each batch is one short transaction.
+    Returns (stories, hits) written.
+    """
+    qs = InstagramStory.objects.filter(ai_analyzed_at__isnull=False).exclude(ai_hits=[])
+    if not rebuild:
+        qs = qs.filter(hit_rows__isnull=True)
+
+    stories = hits = 0
+    last_id = 0
+    while True:
+        batch = list(
+            qs.filter(id__gt=last_id)
+            .order_by("id")
+            .only("id", "username_id", "timestamp", "ai_hits")[:batch_size]
+        )
+        if not batch:
+            return stories, hits
+        last_id = batch[-1].id
+
+        rows = [row for s in batch for row in _rows(s, s.ai_hits or [])]
+        with transaction.atomic():
+            if rebuild:
+                StoryHit.objects.filter(story_id__in=[s.id for s in batch]).delete()
+            StoryHit.objects.bulk_create(rows)
+        stories += len(batch)
+        hits += len(rows)
+
+
+# =========================
+# Queries (index range scans on StoryHit)
+# =========================
+
+def keyword_hits(keyword: str, since: datetime | None = None, until: datetime | None = None, usernames=None):
+    """Hit rows for one keyword, newest first, optionally for a time range / set of usernames."""
+    qs = StoryHit.objects.filter(keyword=normalize_keyword(keyword))
+    if usernames is not None:
+        qs = qs.filter(username__username__in=list(usernames))
+    if since is not None:
+        qs = qs.filter(timestamp__gte=since)
+    if until is not None:
+        qs = qs.filter(timestamp__lt=until)
+    return qs.order_by("-timestamp")
+
+
+def stories_with_keyword(keyword: str, since: datetime | None = None, until: datetime | None = None, usernames=None):
+    """Stories that hit `keyword` (e.g. "tank" this week for these users), newest first."""
+    story_ids = keyword_hits(keyword, since, until, usernames).values("story_id")
+    return InstagramStory.objects.filter(id__in=story_ids).select_related("username").order_by("-timestamp")
+
+
+def user_hits(username: str, since: datetime | None = None, keyword: str | None = None):
+    """Hit rows of one user, newest first."""
+    qs = StoryHit.objects.filter(username__username=username)
+    if keyword is not None:
+        qs = qs.filter(keyword=normalize_keyword(keyword))
+    if since is not None:
+        qs = qs.filter(timestamp__gte=since)
+    return qs.order_by("-timestamp")
+
+
+def keyword_counts(since: datetime | None = None, usernames=None) -> dict[str, int]:
+    """Stories per keyword, most hit first."""
+    qs = StoryHit.objects.all()
+    if usernames is not None:
+        qs = qs.filter(username__username__in=list(usernames))
+    if since is not None:
+        qs = qs.filter(timestamp__gte=since)
+    rows = qs.values("keyword").annotate(n=Count("story_id", distinct=True)).order_by("-n", "keyword")
+    return {r["keyword"]: r["n"] for r in rows}
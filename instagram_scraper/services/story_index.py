@@ -0,0 +1,145 @@
+import sys
+import math
+import hashlib
+import threading
+from instagram_scraper.models import InstagramStory
+
+LOAD_CHUNK_SIZE = 10_000
+
+# hex story ids (sha1 fallback) are tagged above the numeric id range so the two never collide
+_HEX_TAG = 1 << 160
+
+
+def _compact_key(story_id: str):
+    """
+    Store ids as ints where that is lossless:
+    a 19-digit numeric id is ~36 bytes as int vs ~68 bytes as str.
+    """
+    if story_id.isdigit() and not story_id.startswith("0"):
+        return int(story_id)
+    if len(story_id) == 32:
+        try:
+            return int(story_id, 16) | _HEX_TAG
+        except ValueError:
+            pass
+    return story_id
+
+
+class KnownStoryIndex:
+    """
+    Exact in-memory set of story ids already stored.
+    Loaded once per run and shared by all scraper threads.
+    Lookups don't take the lock (set membership is atomic under the GIL), only inserts do.
+    """
+
+    exact = True
+
+    def __init__(self):
+        self._ids = set()
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"lookups": 0, "hits": 0, "db_checks": 0, "false_positives": 0}
+
+    def __len__(self):
+        return len(self._ids)
+
+    def might_contain(self, story_id: str) -> bool:
+        return _compact_key(story_id) in self._ids
+
+    def add_many(self, story_ids) -> None:
+        keys = [_compact_key(i) for i in story_ids]
+        with self._lock:
+            self._ids.update(keys)
+
+    def record(self, lookups: int, hits: int, db_checks: int = 0, false_positives: int = 0) -> None:
+        with self._stats_lock:
+            self._stats["lookups"] += lookups
+            self._stats["hits"] += hits
+            self._stats["db_checks"] += db_checks
+            self._stats["false_positives"] += false_positives
+
+    def memory_bytes(self) -> int:
+        with self._lock:
+            return sys.getsizeof(self._ids) + sum(sys.getsizeof(k) for k in self._ids)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        negatives = stats["lookups"] - stats["hits"]
+        stats["entries"] = len(self)
+        stats["memory_bytes"] = self.memory_bytes()
+        # false positive rate = FP / (FP + true negatives); an exact set never has any
+        stats["false_positive_rate"] = (
+            stats["false_positives"] / (stats["false_positives"] + negatives)
+            if stats["false_positives"] + negatives else 0.0
+        )
+        return stats
+
+
+class BloomStoryIndex(KnownStoryIndex):
+    """
+    Compact Bloom filter variant for very large tables (memory, not DB lookups).
+    Positives may be false and failed downloads are left out, so callers check every
+    id against the DB; the index only feeds the hit / false-positive stats.
+    """
+
+    exact = False
+
+    def __init__(self, capacity: int, fp_rate: float = 0.001):
+        super().__init__()
+        capacity = max(capacity, 1000)
+        self.num_bits = int(math.ceil(-capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def _positions(self, story_id: str):
+        # double hashing: h1 + i*h2 over one 128-bit digest
+        digest = hashlib.blake2b(story_id.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def might_contain(self, story_id: str) -> bool:
+        bits = self._bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(story_id))
+
+    def add_many(self, story_ids) -> None:
+        positions = [self._positions(i) for i in story_ids]
+        with self._lock:
+            for pos in positions:
+                for p in pos:
+                    self._bits[p >> 3] |= 1 << (p & 7)
+            self._count += len(positions)
+
+    def memory_bytes(self) -> int:
+        return sys.getsizeof(self._bits)
+
+
+def load_known_story_index(kind: str = "set", fp_rate: float = 0.001):
+    """
+    Build the index from every stored story except failed downloads
+    (those must stay visible to save_stories so they get retried).
+    kind: "set" (exact) or "bloom" (compact, every id is still checked against the DB).
+    """
+    qs = InstagramStory.objects.exclude(media_status=InstagramStory.MEDIA_FAILED)
+
+    if kind == "bloom":
+        # leave headroom for the stories saved during this run
+        index = BloomStoryIndex(capacity=int(qs.count() * 1.5), fp_rate=fp_rate)
+    else:
+        index = KnownStoryIndex()
+
+    chunk = []
+    for story_id in qs.values_list("story_id", flat=True).iterator(chunk_size=LOAD_CHUNK_SIZE):
+        chunk.append(story_id)
+        if len(chunk) >= LOAD_CHUNK_SIZE:
+            index.add_many(chunk)
+            chunk = []
+    if chunk:
+        index.add_many(chunk)
+
+    return index
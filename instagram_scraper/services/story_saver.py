@@ -1,46 +1,240 @@
-from datetime import datetime
-from django.utils import timezone
+import logging
+import time
+from django.db import IntegrityError, connection, transaction
+from instagram_scraper import metrics, tracing
 from instagram_scraper.models import InstagramUser, InstagramStory
 from .media_downloader import download_media
+from .blob_store import store_blob, release_blob
+from .thumbnails import image_thumbnail, save_thumbnail
+from .rollups import record_new_stories
+from instagram_scraper.scraper.records import StoryRecord
 
-def save_stories(username: str, stories: list[dict], log_callback=None):
+logger = logging.getLogger(__name__)
+
+
+def download_story_media(
+    story_id: str,
+    media_url: str,
+    filename: str,
+    media_type: str = "image",
+    rate_limiter=None,
+    log_callback=None,
+    known_index=None,
+):
+    """
+    Fetch the media of an already recorded story and attach it.
+    Runs inline or inside a DownloadPool worker. The story joins `known_index` only
+    once its media is in, so a failed download is looked up (and retried) next poll.
+    """
+    with tracing.span("download_media", filename=filename) as sp:
+        file = download_media(media_url, filename, rate_limiter=rate_limiter)
+        sp.set(bytes=file.size if file else 0)
+    if not file:
+        metrics.STORY_DOWNLOADS.inc(result="failed")
+        InstagramStory.objects.filter(story_id=story_id).update(media_status=InstagramStory.MEDIA_FAILED)
+        return False
+
+    # ✅ identical bytes (reshared media) are stored once
+    with tracing.span("store_blob"):
+        blob = store_blob(file, filename.rsplit(".", 1)[-1])
+    with tracing.span("attach media"):
+        updated = InstagramStory.objects.filter(story_id=story_id).update(
+            media_file=blob,
+            media_status=InstagramStory.MEDIA_READY,
+        )
+    if not updated:
+        metrics.STORY_DOWNLOADS.inc(result="orphaned")
+        release_blob(blob)
+        return False
+
+    metrics.STORY_DOWNLOADS.inc(result="ok")
+    if known_index is not None:
+        known_index.add_many([story_id])
+    # ✅ images: thumbnail from the bytes already in memory
+    # (video posters come from the analysis service's first frame)
+    if media_type == "image":
+        file.seek(0)
+        attach_thumbnail(story_id, file.read())
+    if log_callback:
+        log_callback(f"downloaded {filename}")
+    return True
+
+
+def attach_thumbnail(story_id: str, data: bytes) -> bool:
+    """Make and attach a thumbnail; a failure never fails the download."""
+    try:
+        with tracing.span("thumbnail"):
+            name = save_thumbnail(story_id, image_thumbnail(data))
+            InstagramStory.objects.filter(story_id=story_id).update(thumbnail=name)
+    except Exception as e:
+        metrics.THUMBNAILS.inc(result="failed")
+        logger.warning(f"[THUMB] {story_id}: {e}")
+        return False
+    metrics.THUMBNAILS.inc(result="ok")
+    return True
+
+
+INSERT_BATCH_SIZE = 500
+
+
+def insert_new_stories(rows: list[InstagramStory]) -> set[str]:
+    """
+    Insert `rows`, skipping story_ids another scraper inserted first.
+    Returns the story_ids this call actually inserted (ON CONFLICT DO NOTHING RETURNING;
+    bulk_create(ignore_conflicts=True) can't tell which rows were dropped).
+    """
+    if connection.vendor not in ("sqlite", "postgresql"):
+        created = set()
+        for row in rows:
+            try:
+                with transaction.atomic():
+                    row.save(force_insert=True)
+                created.add(row.story_id)
+            except IntegrityError:
+                pass
+        return created
+
+    qn = connection.ops.quote_name
+    fields = [f for f in InstagramStory._meta.concrete_fields if not f.primary_key]
+    columns = ", ".join(qn(f.column) for f in fields)
+    placeholder = "(" + ", ".join(["%s"] * len(fields)) + ")"
+    created = set()
+    with connection.cursor() as cursor:
+        for i in range(0, len(rows), INSERT_BATCH_SIZE):
+            batch = rows[i:i + INSERT_BATCH_SIZE]
+            params = [f.get_db_prep_save(f.pre_save(row, True), connection) for row in batch for f in fields]
+            cursor.execute(
+                f"INSERT INTO {qn(InstagramStory._meta.db_table)} ({columns}) "
+                f"VALUES {', '.join([placeholder] * len(batch))} "
+                f"ON CONFLICT ({qn('story_id')}) DO NOTHING RETURNING {qn('story_id')}",
+                params,
+            )
+            created.update(r[0] for r in cursor.fetchall())
+    return created
+
+
+def reset_pending_downloads() -> int:
+    """
+    Mark every PENDING download FAILED so the next save_stories of its user retries it.
+    Only safe when no other scrape_users / scrape_daemon is downloading (--reset-pending).
+    """
+    return InstagramStory.objects.unready().filter(media_status=InstagramStory.MEDIA_PENDING).update(
+        media_status=InstagramStory.MEDIA_FAILED
+    )
+
+
+def pending_download_count() -> int:
+    return InstagramStory.objects.unready().filter(media_status=InstagramStory.MEDIA_PENDING).count()
+
+
+def save_stories(username: str, stories: list[StoryRecord], log_callback=None, download_pool=None, known_index=None):
     if not stories:
         return 0
 
-    user = InstagramUser.objects.get(username=username)
-    saved = 0
-    
+    started = time.monotonic()
+    try:
+        with tracing.span("save_stories", stories=len(stories)) as sp:
+            saved = _save_stories(username, stories, log_callback, download_pool, known_index)
+            sp.set(saved=saved)
+    finally:
+        metrics.STORY_SAVE_SECONDS.observe(time.monotonic() - started)
+    metrics.STORIES_SAVED.inc(saved)
+    return saved
+
+
+def _save_stories(username, stories, log_callback, download_pool, known_index):
+    story_ids = {story.story_id for story in stories}
+
+    # ✅ stories already in the shared index are skipped without touching the DB
+    if known_index is not None:
+        unknown = {i for i in story_ids if not known_index.might_contain(i)}
+        maybe_known = story_ids - unknown
+        if known_index.exact:
+            story_ids = unknown
+        if not story_ids:
+            known_index.record(lookups=len(maybe_known), hits=len(maybe_known))
+            return 0
+
+    # ✅ one lookup for the whole batch instead of one .exists() per story.
+    # A Bloom index can't skip any: its positives may be false, and its negatives may be
+    # failed downloads (left out of it) that must come back through the status check
+    existing = dict(
+        InstagramStory.objects
+        .filter(story_id__in=story_ids)
+        .values_list("story_id", "media_status")
+    )
+
+    if known_index is not None:
+        known_index.record(
+            lookups=len(unknown) + len(maybe_known),
+            hits=len(maybe_known),
+            db_checks=0 if known_index.exact else len(story_ids),
+            false_positives=0 if known_index.exact else len(maybe_known - existing.keys()),
+        )
+
+    new_rows = []
+    retry_ids = []
+    downloads = []
+
     for story in stories:
-        story_id = story["story_id"]
+        story_id = story.story_id
 
-        if InstagramStory.objects.filter(story_id=story_id).exists():
+        # known / duplicate ids are gone from story_ids; failed downloads are retried,
+        # anything else already recorded is skipped
+        if story_id not in story_ids:
             continue
-        saved += 1
+        story_ids.discard(story_id)
+        status = existing.get(story_id)
+        if status is not None and status != InstagramStory.MEDIA_FAILED:
+            continue
+
+        filename = story.filename(username)
 
-        ts_str = story["timestamp"]  # "dd.mm.yy_HH.MM"
-        ts_dt = datetime.strptime(ts_str, "%d.%m.%y_%H.%M")
-        tz = timezone.get_current_timezone()
-        ts_dt = timezone.make_aware(ts_dt, tz)
+        if status is None:
+            new_rows.append(InstagramStory(
+                story_id=story_id,
+                media_url=story.media_url,
+                media_type=story.media_type,
+                timestamp=story.timestamp,
+                media_status=InstagramStory.MEDIA_PENDING,
+            ))
+        else:
+            retry_ids.append(story_id)
 
+        downloads.append((story_id, story.media_url, filename, story.media_type))
 
-        ext = "jpg" if story["media_type"] == "image" else "mp4"
-        filename = f"{user.username}-{ts_str}-{story_id}.{ext}"
+    if not downloads:
+        return 0
 
-        # Log download start
-        if log_callback:
-            log_callback(f"downloaded {filename}")
+    if new_rows:
+        user = InstagramUser.objects.get(username=username)
+        for row in new_rows:
+            row.username = user     # ✅ FK field name in your model
 
-        file = download_media(story["media_url"], filename)
-        if not file:
-            continue
+    # ✅ record metadata right away (one write transaction per user),
+    # media follows when the download lands
+    with transaction.atomic():
+        if new_rows:
+            # rows a concurrent scraper inserted first are theirs to count and download
+            created = insert_new_stories(new_rows)
+            lost = {row.story_id for row in new_rows} - created
+            if lost:
+                new_rows = [row for row in new_rows if row.story_id in created]
+                downloads = [d for d in downloads if d[0] not in lost]
+            record_new_stories(user.id, [row.timestamp for row in new_rows])
+        if retry_ids:
+            InstagramStory.objects.filter(story_id__in=retry_ids).update(media_status=InstagramStory.MEDIA_PENDING)
 
-        InstagramStory.objects.create(
-            username=user,      # ✅ FK field name in your model
-            story_id=story_id,
-            media_url=story["media_url"],
-            media_type=story["media_type"],
-            timestamp=ts_dt,
-            media_file=file,
-        )
+    # queued only after commit so download threads always see the rows
+    for story_id, media_url, filename, media_type in downloads:
+        if download_pool:
+            download_pool.submit(
+                download_story_media, story_id, media_url, filename, media_type,
+                log_callback=log_callback, known_index=known_index,
+            )
+        else:
+            download_story_media(
+                story_id, media_url, filename, media_type, log_callback=log_callback, known_index=known_index
+            )
 
-    return saved
+    return len(new_rows)
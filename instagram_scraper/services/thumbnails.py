@@ -0,0 +1,68 @@
+import io
+import logging
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+THUMB_SIZE = (320, 320)
+THUMB_QUALITY = 70
+
+
+def thumbnail_name(story_id: str) -> str:
+    return f"thumbs/{story_id}.webp"
+
+
+def image_to_webp(image: Image.Image) -> bytes:
+    """Downscale to fit THUMB_SIZE and encode as WebP."""
+    image = image.convert("RGB")
+    image.thumbnail(THUMB_SIZE)
+    out = io.BytesIO()
+    image.save(out, "WEBP", quality=THUMB_QUALITY, method=4)
+    return out.getvalue()
+
+
+def image_thumbnail(data: bytes) -> bytes:
+    with Image.open(io.BytesIO(data)) as image:
+        image.draft("RGB", THUMB_SIZE)  # JPEG: decode at reduced scale
+        return image_to_webp(image)
+
+
+def video_poster(path: str) -> bytes | None:
+    """WebP of the first decodable frame, or None."""
+    import cv2  # opencv-python; only needed for videos
+
+    capture = cv2.VideoCapture(path)
+    try:
+        ok, frame = capture.read()
+    finally:
+        capture.release()
+    if not ok:
+        return None
+    return image_to_webp(Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)))
+
+
+def render_thumbnail(path: str, media_type: str) -> bytes | None:
+    """Thumbnail / poster bytes for a media file on disk. Needs no Django setup (process-pool safe)."""
+    if media_type == "video":
+        return video_poster(path)
+    with open(path, "rb") as fh:
+        return image_thumbnail(fh.read())
+
+
+def make_thumbnail(media_name: str, media_type: str) -> bytes | None:
+    """Thumbnail / poster bytes for a stored media file, or None if it can't be decoded."""
+    try:
+        return render_thumbnail(default_storage.path(media_name), media_type)
+    except Exception as e:
+        logger.warning(f"[THUMB] {media_name}: {e}")
+        return None
+
+
+def save_thumbnail(story_id: str, data: bytes) -> str:
+    """Store thumbnail bytes for a story (replacing an older one); returns the storage name."""
+    name = thumbnail_name(story_id)
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    return default_storage.save(name, ContentFile(data))
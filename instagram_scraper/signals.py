@@ -0,0 +1,53 @@
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from instagram_scraper.models import InstagramUser, InstagramStory
+from instagram_scraper.services.blob_store import release_blob
+from instagram_scraper.services.caption_search import remove_captions
+from instagram_scraper.services.rollups import record_deleted_story
+from instagram_scraper.services.stats_cache import invalidate_stats
+
+
+@receiver(post_delete, sender=InstagramStory)
+def release_story_media(sender, instance, **kwargs):
+    if instance.media_file:
+        release_blob(instance.media_file.name)
+
+
+@receiver(post_delete, sender=InstagramStory)
+def unindex_story_caption(sender, instance, **kwargs):
+    if instance.ai_caption:
+        remove_captions([instance.id])
+
+
+@receiver(post_delete, sender=InstagramStory)
+def uncount_story(sender, instance, **kwargs):
+    record_deleted_story(instance)
+
+
+@receiver(post_delete, sender=InstagramUser)
+def release_profile_pic(sender, instance, **kwargs):
+    if instance.profile_pic:
+        release_blob(instance.profile_pic.name)
+
+
+@receiver(post_delete, sender=InstagramStory)
+def delete_story_thumbnail(sender, instance, **kwargs):
+    # thumbnails are per story (not blobs); drop the file once the delete is committed
+    if instance.thumbnail:
+        name = instance.thumbnail.name
+        transaction.on_commit(lambda: default_storage.delete(name))
+
+
+@receiver(post_save, sender=InstagramUser)
+def invalidate_stats_on_new_user(sender, created, **kwargs):
+    # the user count; profile_saver re-saves every scraped user, which changes no stat
+    if created:
+        invalidate_stats()
+
+
+@receiver(post_delete, sender=InstagramUser)
+def invalidate_stats_on_deleted_user(sender, **kwargs):
+    # story counters invalidate via rollups
+    invalidate_stats()
@@ -1,3 +1,1131 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import logging
+import math
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import timedelta, timezone as dt_timezone
+from pathlib import Path
+from unittest import mock
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import OutputWrapper
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from instagram_scraper.scraper import parsers
+from instagram_scraper.scraper.pause_gate import PauseGate
+from instagram_scraper.scraper import scheduler
+from instagram_scraper.scraper.scheduler import DueHeap, RetryQueue, next_poll_interval
+from instagram_scraper.scraper.event_log import EventLog
+from instagram_scraper.management.commands import dedupe_media, scrape_users
+from instagram_scraper import metrics, tracing
+from instagram_scraper.services.download_pool import DownloadPool
+from instagram_scraper.benchmarks.parsers import (
+    load_corpus,
+    run_parser_benchmark,
+    find_regressions,
+    time_per_call,
+    BATCH_BYTES,
+    MIN_SAMPLES,
+)
+from instagram_scraper.benchmarks.upstream import StandInUpstream, UpstreamConfig
+from instagram_scraper.management.commands.explain_queries import hot_queries, plan_problems
+from instagram_scraper.models import InstagramUser, InstagramStory, StoryHit
+from instagram_scraper.services import story_hits, caption_search
+from instagram_scraper.services.blob_store import store_blob, release_blob, collect_garbage
+from instagram_scraper.services.retention import RetentionPolicy, apply_policy
+from instagram_scraper.services import checkpoints, profile_saver, story_saver
+from instagram_scraper.services.media_downloader import MediaFetch
+from instagram_scraper.services.story_saver import attach_thumbnail
+from instagram_scraper.services.story_index import KnownStoryIndex, BloomStoryIndex, load_known_story_index
+from instagram_scraper.scraper.records import StoryRecord
+from instagram_scraper.services.thumbnails import THUMB_SIZE
+from instagram_scraper.services import rollups
+from instagram_scraper.services.story_feed import list_stories, decode_cursor, InvalidCursor
+from instagram_scraper.models import MediaBlob
 
-# Create your tests here.
+TESTDATA = Path(__file__).resolve().parent / "testdata"
+
+# for tests whose writes invalidate or read the stats cache (settings default to a shared file cache)
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+def load_fixture(name: str) -> str:
+    return (TESTDATA / name).read_text(encoding="utf-8")
+
+
+def make_story(user, story_id, **fields):
+    """An image story of `user` posted now; `fields` override any column."""
+    fields.setdefault("media_url", f"https://example.com/{story_id}.jpg")
+    fields.setdefault("media_type", "image")
+    fields.setdefault("timestamp", timezone.now())
+    return InstagramStory.objects.create(username=user, story_id=story_id, **fields)
+
+
+class StoryParserEquivalenceTests(SimpleTestCase):
+    def test_lxml_matches_beautifulsoup_on_fixtures(self):
+        for path in sorted(TESTDATA.glob("stories_*.json")):
+            html = json.loads(path.read_text(encoding="utf-8")).get("html", "")
+            if not html:
+                continue
+            with self.subTest(fixture=path.name):
+                self.assertEqual(parsers._story_nodes_lxml(html), parsers._story_nodes_bs(html))
+
+    def test_profile_pic_matches_beautifulsoup(self):
+        raw = load_fixture("profile_public.json")
+        html = json.loads(raw)["html"]
+        soup_src = parsers.BeautifulSoup(html, "html.parser").find("img").get("src", "")
+        self.assertEqual(parsers.parse_profile_request(raw)["profile_pic_url"], soup_src)
+
+    def test_falls_back_to_beautifulsoup_when_lxml_refuses(self):
+        # lxml rejects str input carrying an XML encoding declaration
+        html = '<?xml version="1.0" encoding="utf-8"?>' + json.loads(load_fixture("stories_small.json"))["html"]
+        self.assertEqual(parsers.story_nodes(html), parsers._story_nodes_bs(html))
+
+
+
+class ProfileCorpusTests(SimpleTestCase):
+    EXPECTED = {
+        "profile_public": ("public", ""),
+        "profile_private": ("private", ""),
+        "profile_error_not_found": ("error", "User not found. Please check the username and try again."),
+        "profile_blocked": ("error", "Your IP has been temporarily blocked. Please try again later."),
+        "profile_unavailable": ("error", "Service Temporarily Unavailable, please retry in a few minutes."),
+        "profile_invalid": ("error", "invalid json response"),
+    }
+
+    def test_profile_fixtures(self):
+        corpus = load_corpus()
+        for name, (status, msg) in self.EXPECTED.items():
+            with self.subTest(fixture=name):
+                result = parsers.parse_profile_request(corpus[name])
+                self.assertEqual(result["status"], status)
+                self.assertEqual(result["msg"], msg)
+
+    def test_public_profile_pic(self):
+        result = parsers.parse_profile_request(load_fixture("profile_public.json"))
+        self.assertTrue(result["profile_pic_url"].startswith("https://scontent.cdninstagram.com/"))
+        self.assertIn("&oh=", result["profile_pic_url"])
+
+
+class StoriesCorpusTests(SimpleTestCase):
+    def test_small_page(self):
+        stories = parsers.parse_stories_request(load_fixture("stories_small.json"))
+        self.assertEqual(
+            [(s.story_id, s.media_type) for s in stories],
+            [
+                ("3796214496960974769", "video"),
+                ("3796214496960974770", "image"),
+                ("3796214496960974771", "image"),
+                ("635fe728958e88cd6f2d846f40acd66c", "video"),
+                ("3796214496960974772", "image"),
+            ],
+        )
+        # "Download HD" link wins over the <source> url
+        self.assertTrue(stories[0].media_url.endswith("&dl=1"))
+
+    def test_no_stories(self):
+        for name in ("stories_none.json", "stories_empty.json"):
+            with self.subTest(fixture=name):
+                self.assertEqual(parsers.parse_stories_request(load_fixture(name)), [])
+
+    def test_huge_page(self):
+        stories = parsers.parse_stories_request(load_corpus()["stories_huge"])
+        self.assertEqual(len(stories), 1000)
+        self.assertEqual(len({s.story_id for s in stories}), 1000)
+
+    def test_single_now_per_response(self):
+        now = parsers.timezone.now()
+        stories = parsers.parse_stories_request(load_fixture("stories_small.json"), now=now)
+        self.assertEqual(
+            [now - s.timestamp for s in stories],
+            [
+                parsers.timedelta(hours=20),
+                parsers.timedelta(minutes=5),
+                parsers.timedelta(seconds=12),
+                parsers.timedelta(days=1),
+                parsers.timedelta(hours=3),
+            ],
+        )
+
+    def test_parse_time_ago(self):
+        now = parsers.timezone.now()
+        self.assertEqual(parsers.parse_time_ago(None, now), now)
+        self.assertEqual(parsers.parse_time_ago("garbage", now), now)
+        self.assertEqual(parsers.parse_time_ago("12 Seconds ago", now), now - parsers.timedelta(seconds=12))
+        self.assertEqual(parsers.parse_time_ago("1 day ago", now), now - parsers.timedelta(days=1))
+        self.assertIsNotNone(parsers.parse_time_ago("5 minutes ago").tzinfo)
+
+
+class ParserBenchmarkTests(SimpleTestCase):
+    def test_benchmark_covers_corpus(self):
+        rows = run_parser_benchmark(min_seconds=0.01)
+        measured = {(r["fixture"], r["function"]) for r in rows}
+        for name in load_corpus():
+            with self.subTest(fixture=name):
+                self.assertTrue(any(fixture == name for fixture, _ in measured))
+        self.assertIn(("stories_huge", "extract_story_id"), measured)
+        self.assertTrue(all(r["mb_per_s"] > 0 and r["relative"] > 0 for r in rows))
+
+    def test_find_regressions(self):
+        # relative to the reference parser timed in the same run, so the machine doesn't matter
+        rows = [
+            {"fixture": "stories_small", "function": "parse_stories_request", "bytes": 5000, "relative": 6.0},
+            {"fixture": "profile_public", "function": "parse_profile_request", "bytes": 300, "relative": 5.0},
+        ]
+        baseline = {"stories_small:parse_stories_request": 8.0, "profile_public:parse_profile_request": 6.0}
+        self.assertEqual(find_regressions(rows, baseline, tolerance=0.3), [])
+        baseline["stories_small:parse_stories_request"] = 10.0
+        baseline["profile_public:parse_profile_request"] = 8.0  # small responses are gated too
+        self.assertEqual(len(find_regressions(rows, baseline, tolerance=0.3)), 2)
+
+    def test_small_responses_are_timed_in_batches(self):
+        calls = []
+        time_per_call(lambda: calls.append(1), size=300, min_seconds=0)
+        self.assertEqual(len(calls), MIN_SAMPLES * math.ceil(BATCH_BYTES / 300))
+
+
+class RetryQueueTests(SimpleTestCase):
+    def test_ready_items_fifo_then_retries_when_due(self):
+        queue = RetryQueue(["a", "b"])
+        queue.push_later("retry-late", 0.2)
+        queue.push_later("retry-soon", 0.05)
+        queue.push_later("now", 0)  # no delay -> straight to the ready deque
+        self.assertEqual([queue.pop_ready() for _ in range(3)], ["a", "b", "now"])
+        self.assertIsNone(queue.pop_ready())
+        self.assertEqual(len(queue), 2)
+
+        time.sleep(0.25)
+        self.assertEqual([queue.pop_ready(), queue.pop_ready()], ["retry-soon", "retry-late"])
+        self.assertIsNone(queue.next_delay())
+
+    def test_next_retry_delay_ignores_ready_items(self):
+        queue = RetryQueue(["ready"])
+        self.assertEqual(queue.next_delay(), 0.0)
+        self.assertIsNone(queue.next_retry_delay())
+
+        queue.push_later("due", 0.01)
+        queue.push_later("later", 5)
+        time.sleep(0.02)
+        # the due retry is promoted instead of reported as 0 (a 0 timeout would spin during a pause)
+        delay = queue.next_retry_delay()
+        self.assertGreater(delay, 4)
+        self.assertEqual([queue.pop_ready(), queue.pop_ready()], ["ready", "due"])
+
+
+class DueHeapTests(SimpleTestCase):
+    def test_pops_in_due_order_and_reschedule_replaces_the_old_time(self):
+        heap = DueHeap()
+        heap.schedule("a", 300)
+        heap.schedule("b", 100)
+        heap.schedule("c", 200)
+        heap.schedule("b", 400)  # rescheduled: the entry at 100 is stale
+
+        self.assertEqual(len(heap), 3)
+        self.assertEqual(heap.next_delay(now=50), 150)
+        self.assertIsNone(heap.pop_due(now=150))
+        self.assertEqual([heap.pop_due(now=1000) for _ in range(3)], ["c", "a", "b"])
+        self.assertNotIn("b", heap)
+        self.assertIsNone(heap.next_delay(now=1000))
+
+
+class NextPollIntervalTests(SimpleTestCase):
+    now = 1_000_000.0
+
+    def posting_every(self, gap, count=6):
+        return [self.now - i * gap for i in range(count)]
+
+    def test_public_users_are_polled_once_per_posting_gap_within_bounds(self):
+        self.assertEqual(next_poll_interval("public", self.posting_every(6 * 3600), self.now), 6 * 3600)
+        # frequent posters: every story still lives 24h, so never more often than the floor
+        self.assertEqual(next_poll_interval("public", self.posting_every(600), self.now), scheduler.PUBLIC_MIN_INTERVAL)
+        self.assertEqual(scheduler.PUBLIC_MIN_INTERVAL, scheduler.STORY_LIFETIME // 8)
+        # quiet users and users without history: the story-lifetime bound
+        self.assertEqual(next_poll_interval("public", self.posting_every(3 * 86400), self.now), scheduler.PUBLIC_MAX_INTERVAL)
+        self.assertEqual(next_poll_interval("public", [self.now - 60], self.now), scheduler.PUBLIC_MAX_INTERVAL)
+        self.assertLess(scheduler.PUBLIC_MAX_INTERVAL, scheduler.STORY_LIFETIME)
+
+    def test_other_profiles(self):
+        self.assertEqual(next_poll_interval("blocked", [], self.now), scheduler.ERROR_INTERVAL)
+        self.assertEqual(next_poll_interval("private", [], self.now), scheduler.PRIVATE_INTERVAL)
+        self.assertEqual(next_poll_interval("not_found", [], self.now), scheduler.NOT_FOUND_INTERVAL)
+
+
+class PauseGateTests(SimpleTestCase):
+    def test_no_pause_returns_immediately(self):
+        gate = PauseGate()
+        self.assertTrue(gate.wait())
+        self.assertEqual(gate.stats()["waits"], 0)
+
+    def test_waiters_wake_when_pause_expires(self):
+        gate = PauseGate()
+        gate.trigger(0.2)
+        start = time.monotonic()
+        self.assertTrue(gate.wait())
+        waited = time.monotonic() - start
+        # woken by the deadline itself, not by a 1s polling tick
+        self.assertGreaterEqual(waited, 0.15)
+        self.assertLess(waited, 0.6)
+        self.assertEqual(gate.stats()["waits"], 1)
+
+    def test_extension_and_clear(self):
+        gate = PauseGate()
+        gate.trigger(0.1)
+        self.assertFalse(gate.trigger(0.05))  # already covered
+        self.assertTrue(gate.trigger(30))
+
+        threads = [threading.Thread(target=gate.wait) for _ in range(4)]
+        for t in threads:
+            t.start()
+        time.sleep(0.2)
+        self.assertFalse(gate.wait(timeout=0.05))
+
+        gate.clear()
+        for t in threads:
+            t.join(timeout=1)
+        self.assertFalse(any(t.is_alive() for t in threads))
+        self.assertEqual(gate.stats()["pauses"], 2)
+
+    def test_async_waiters(self):
+        gate = PauseGate()
+        gate.trigger(30)
+
+        async def main():
+            waiter = asyncio.create_task(gate.wait_async())
+            await asyncio.sleep(0.05)
+            self.assertFalse(waiter.done())
+            # released from another thread
+            threading.Timer(0.05, gate.clear).start()
+            await asyncio.wait_for(waiter, timeout=1)
+
+        asyncio.run(main())
+        self.assertEqual(gate.stats()["waits"], 1)
+
+
+class StandInUpstreamTests(SimpleTestCase):
+    def test_responses_parse_like_the_real_site(self):
+        upstream = StandInUpstream(UpstreamConfig(private_rate=0.3, not_found_rate=0.2, stories_per_user=3))
+        kinds = set()
+        try:
+            for i in range(40):
+                username = f"user_{i}"
+                kind = upstream.account_kind(username)
+                kinds.add(kind)
+                profile = parsers.parse_profile_request(json.dumps(upstream.profile_body(username)))
+                expected = {"public": "public", "private": "private", "not_found": "error"}[kind]
+                self.assertEqual(profile["status"], expected)
+
+                stories = parsers.parse_stories_request(json.dumps(upstream.stories_body(username)))
+                self.assertEqual(
+                    [(s.story_id, s.media_type) for s in stories],
+                    [(story_id, media_type) for story_id, media_type, _ in upstream.user_stories(username)]
+                    if kind == "public" else [],
+                )
+        finally:
+            upstream.stop()
+        self.assertEqual(kinds, {"public", "private", "not_found"})
+
+
+class TracingTests(SimpleTestCase):
+    def tearDown(self):
+        tracing.configure()
+
+    def test_spans_are_noops_without_a_trace(self):
+        tracing.configure(sample_rate=1.0)
+        with tracing.span("orphan") as sp:
+            sp.set(x=1)
+        self.assertEqual(tracing.get_tracer().trace_count(), 0)
+
+    def test_sampled_trace_includes_download_pool_jobs(self):
+        tracer = tracing.configure(sample_rate=1.0)
+        pool = DownloadPool(workers=1)
+
+        def job(rate_limiter=None):
+            with tracing.span("download_media"):
+                return True
+
+        with tracing.trace("scrape_instagram", username="someone"):
+            with tracing.span("ScraperClient.get", url="http://x/"):
+                pass
+            pool.submit(job)
+        pool.shutdown(wait=True)
+
+        path = Path(self.enterContext(tempfile.TemporaryDirectory())) / "trace.json"
+        self.assertEqual(tracer.write(str(path)), 1)
+        events = json.loads(path.read_text())["traceEvents"]
+        spans = {e["name"]: e for e in events if e["ph"] == "X"}
+        self.assertEqual(set(spans), {"scrape_instagram", "ScraperClient.get", "download_media"})
+        self.assertEqual(len({e["pid"] for e in spans.values()}), 1)
+        self.assertNotEqual(spans["download_media"]["tid"], spans["scrape_instagram"]["tid"])
+
+    def test_tail_sampling_keeps_only_slow_traces(self):
+        tracer = tracing.configure(sample_rate=0.0, slow_seconds=0.05)
+        with tracing.trace("fast"):
+            pass
+        with tracing.trace("slow"):
+            time.sleep(0.06)
+        self.assertEqual(tracer.trace_count(), 1)
+
+
+class QueryPlanTests(TestCase):
+    def test_plan_problems_flags_scans_and_sorts(self):
+        self.assertEqual(plan_problems("2 0 0 SCAN instagram_scraper_instagramstory", "sqlite"),
+                         ["2 0 0 SCAN instagram_scraper_instagramstory"])
+        self.assertEqual(plan_problems("2 0 0 SCAN t USING INDEX ig_story_ts_idx", "sqlite"), [])
+        self.assertTrue(plan_problems("3 0 0 USE TEMP B-TREE FOR ORDER BY", "sqlite"))
+        self.assertTrue(plan_problems("Seq Scan on instagram_scraper_instagramstory", "postgresql"))
+
+    def test_hot_queries_use_indexes(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("plan text checked for SQLite only")
+        for name, qs in hot_queries().items():
+            with self.subTest(query=name):
+                self.assertEqual(plan_problems(qs.explain(), "sqlite"), [])
+
+
+class StoryHitTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.alice = InstagramUser.objects.create(username="alice")
+        self.bob = InstagramUser.objects.create(username="bob")
+
+    def story(self, user, story_id, hits, days_ago=0):
+        return make_story(
+            user,
+            story_id,
+            timestamp=self.now - timedelta(days=days_ago),
+            ai_hits=hits,
+            ai_is_interesting=bool(hits),
+            ai_analyzed_at=self.now,
+        )
+
+    def test_backfill_and_queries(self):
+        recent = self.story(self.alice, "1", ["tank", "soldier"])
+        old = self.story(self.alice, "2", ["tank"], days_ago=30)
+        other = self.story(self.bob, "3", ["tank"])
+        self.story(self.bob, "4", [])
+
+        self.assertEqual(story_hits.backfill_story_hits(batch_size=2), (3, 4))
+        self.assertEqual(story_hits.backfill_story_hits(), (0, 0))  # nothing left without hit rows
+        self.assertEqual(StoryHit.objects.get(story=recent, keyword="soldier").username, self.alice)
+
+        week_ago = self.now - timedelta(days=7)
+        self.assertCountEqual(story_hits.stories_with_keyword("Tank", since=week_ago), [recent, other])
+        self.assertEqual(list(story_hits.stories_with_keyword("tank", usernames=["alice"])), [recent, old])
+        self.assertEqual(story_hits.user_hits("alice", since=week_ago).count(), 2)
+        self.assertEqual(story_hits.keyword_counts(), {"tank": 3, "soldier": 1})
+
+    def test_replace_story_hits_keeps_frames(self):
+        s = self.story(self.bob, "5", ["drone"])
+        story_hits.replace_story_hits(s, ["drone"])
+        story_hits.replace_story_hits(s, [("drone", 3.0, None), ("jet", 6.0, 0.5)])
+        rows = sorted(s.hit_rows.values_list("keyword", "frame_t", "score"))
+        self.assertEqual(rows, [("drone", 3.0, None), ("jet", 6.0, 0.5)])
+        self.assertEqual(StoryHit.objects.filter(story=s).first().timestamp, s.timestamp)
+
+
+class CaptionSearchTests(TestCase):
+    def setUp(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("index maintenance is explicit on SQLite only")
+        self.user = InstagramUser.objects.create(username="carol")
+        self.stories = {}
+        for story_id, caption in [
+            ("1", "a tank on a parade street"),
+            ("2", "soldiers in camouflage near a tank tank"),
+            ("3", "a dog on the beach"),
+        ]:
+            self.stories[story_id] = make_story(self.user, story_id, ai_caption=caption)
+        caption_search.index_captions(self.stories.values())
+
+    def ids(self, found):
+        return [r["story"].story_id for r in found["results"]]
+
+    def test_ranking_phrases_and_pagination(self):
+        self.assertEqual(self.ids(caption_search.search_captions("tank")), ["2", "1"])
+        self.assertEqual(self.ids(caption_search.search_captions('"parade street"')), ["1"])
+        self.assertEqual(self.ids(caption_search.search_captions("soldier")), ["2"])  # porter stemming
+        self.assertEqual(self.ids(caption_search.search_captions('tank OR "dog')), [])  # operators are literal
+
+        first = caption_search.search_captions("tank", page_size=1)
+        second = caption_search.search_captions("tank", page=2, page_size=1)
+        self.assertEqual((self.ids(first), first["has_next"]), (["2"], True))
+        self.assertEqual((self.ids(second), second["has_next"]), (["1"], False))
+
+    def test_index_follows_updates_and_deletes(self):
+        dog = self.stories["3"]
+        dog.ai_caption = "a tank on the beach"
+        caption_search.index_captions([dog])
+        self.assertIn("3", self.ids(caption_search.search_captions("tank")))
+
+        dog.delete()
+        self.assertEqual(self.ids(caption_search.search_captions("beach")), [])
+        self.assertEqual(caption_search.rebuild_caption_index(), 2)
+
+    def test_since_in_another_timezone(self):
+        noon_utc = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0)
+        InstagramStory.objects.filter(pk=self.stories["1"].pk).update(timestamp=noon_utc)
+        InstagramStory.objects.filter(pk=self.stories["2"].pk).update(timestamp=noon_utc - timedelta(hours=1))
+        # 14:30+03:00 is 11:30 UTC: story 1 is after it, story 2 before
+        since = noon_utc.astimezone(dt_timezone(timedelta(hours=3))) - timedelta(minutes=30)
+        self.assertEqual(self.ids(caption_search.search_captions("tank", since=since)), ["1"])
+
+    def test_search_api(self):
+        url = reverse("instagram_scraper:search_stories")
+        response = self.client.get(url, {"q": "tank", "username": "carol", "page_size": 1})
+        body = response.json()
+        self.assertEqual([r["story_id"] for r in body["results"]], ["2"])
+        self.assertTrue(body["has_next"])
+        self.assertIn("[tank]", body["results"][0]["snippet"])
+        self.assertEqual(self.client.get(url).status_code, 400)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RetentionTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.media_root = Path(tmp.name) / "media"
+        self.archive_root = Path(tmp.name) / "archive"
+        settings_override = override_settings(MEDIA_ROOT=str(self.media_root))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        from PIL import Image
+        buf = io.BytesIO()
+        Image.new("RGB", (800, 600), "red").save(buf, "JPEG")
+        self.jpeg = buf.getvalue()
+
+        user = InstagramUser.objects.create(username="dave")
+        old = timezone.now() - timedelta(days=60)
+        self.stories = []
+        for i, interesting in enumerate([False, False, True]):
+            self.stories.append(make_story(
+                user,
+                f"r{i}",
+                media_file=store_blob(self.jpeg, "jpg"),   # all three share one blob
+                timestamp=old,
+                ai_analyzed_at=old,
+                ai_is_interesting=interesting,
+            ))
+
+    def test_archive_keeps_thumbnail_and_releases_blob(self):
+        policy = RetentionPolicy("boring", older_than_days=30, analyzed=True, interesting=False, action="archive")
+        self.assertEqual(apply_policy(policy, dry_run=True, archive_root=self.archive_root).stories, 2)
+
+        r = apply_policy(policy, chunk_size=1, pause=0, archive_root=self.archive_root)
+        self.assertEqual((r.stories, r.thumbnails, len(r.archives)), (2, 2, 2))
+        self.assertEqual(r.released_bytes, 0)  # the interesting story still references the blob
+        self.assertEqual(MediaBlob.objects.get().ref_count, 1)
+
+        boring = InstagramStory.objects.get(story_id="r0")
+        self.assertFalse(boring.media_file)
+        self.assertIsNotNone(boring.archived_at)
+        self.assertTrue((self.media_root / boring.thumbnail.name).exists())
+        with zipfile.ZipFile(self.archive_root / boring.archive_file) as zf:
+            self.assertEqual(zf.read(zf.namelist()[0]), self.jpeg)
+        self.assertEqual(apply_policy(policy, archive_root=self.archive_root).stories, 0)  # already archived
+
+    def test_delete_rows_in_chunks(self):
+        policy = RetentionPolicy("old", older_than_days=30, action="delete")
+        with self.captureOnCommitCallbacks(execute=True):
+            r = apply_policy(policy, chunk_size=2, pause=0, archive_root=self.archive_root)
+        self.assertEqual((r.stories, r.released_bytes), (3, len(self.jpeg)))
+        self.assertFalse(InstagramStory.objects.exists())
+        self.assertEqual(MediaBlob.objects.get().ref_count, 0)
+
+    def test_delete_removes_archives_left_without_stories(self):
+        archive = RetentionPolicy("all", older_than_days=30, action="archive")
+        apply_policy(archive, chunk_size=2, pause=0, archive_root=self.archive_root)
+        shared, alone = (InstagramStory.objects.get(story_id=i).archive_file for i in ("r0", "r2"))
+        self.assertNotEqual(shared, alone)  # r0 + r1 in one zip, r2 in the other
+
+        delete = RetentionPolicy("drop", older_than_days=30, interesting=True, action="delete")
+        alone_size = (self.archive_root / alone).stat().st_size
+        with self.captureOnCommitCallbacks(execute=True):
+            r = apply_policy(delete, pause=0, archive_root=self.archive_root)
+        self.assertEqual((r.stories, r.archives_deleted, r.archive_bytes_freed), (1, [alone], alone_size))
+        self.assertFalse((self.archive_root / alone).exists())
+        self.assertTrue((self.archive_root / shared).exists())
+
+        delete = RetentionPolicy("drop", older_than_days=30, action="delete")
+        r = apply_policy(delete, chunk_size=1, pause=0, archive_root=self.archive_root)
+        self.assertEqual(r.archives_deleted, [shared])
+        self.assertFalse((self.archive_root / shared).exists())
+
+    def test_unknown_action_is_rejected(self):
+        with self.assertRaises(ValueError):
+            RetentionPolicy("x", older_than_days=1, action="shred")
+
+
+class ThumbnailTests(TestCase):
+    def test_ingest_thumbnail_is_small_webp(self):
+        from PIL import Image
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            buf = io.BytesIO()
+            Image.new("RGB", (1080, 1920), "blue").save(buf, "JPEG")
+            story = make_story(InstagramUser.objects.create(username="erin"), "t1")
+            self.assertTrue(attach_thumbnail("t1", buf.getvalue()))
+            self.assertFalse(attach_thumbnail("t1", b"not an image"))
+
+            story.refresh_from_db()
+            self.assertEqual(story.thumbnail.name, "thumbs/t1.webp")
+            with Image.open(story.thumbnail.path) as thumb:
+                self.assertEqual(thumb.format, "WEBP")
+                self.assertLessEqual(thumb.size[1], THUMB_SIZE[1])
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.user = InstagramUser.objects.create(username="frank")
+        self.now = timezone.now()
+
+    def add_story(self, story_id, days_ago=0, hits=None):
+        story = make_story(self.user, story_id, timestamp=self.now - timedelta(days=days_ago))
+        rollups.record_new_stories(self.user.id, [story.timestamp])
+        if hits is not None:
+            # what the analysis service does in one transaction
+            story.ai_hits = hits
+            story.ai_is_interesting = bool(hits)
+            story.ai_analyzed_at = self.now
+            story.save()
+            story_hits.replace_story_hits(story, hits)
+            rollups.record_analysis(story, hits)
+        return story
+
+    def assertConsistent(self):
+        self.assertEqual(rollups.diff_rollups(rollups.compute_rollups(), rollups.current_rollups()),
+                         {"daily": 0, "user": 0, "keyword": 0})
+
+    def test_incremental_updates_match_a_rebuild(self):
+        self.add_story("a", hits=["tank", "soldier"])
+        self.add_story("b", hits=[])
+        self.add_story("c", days_ago=1)
+        old = self.add_story("d", days_ago=1, hits=["tank"])
+        self.assertConsistent()
+
+        self.assertEqual(rollups.totals(), {"stories": 4, "analyzed": 3, "interesting": 2, "hits": 3})
+        self.assertEqual(rollups.keyword_totals(), {"tank": 2, "soldier": 1})
+        series = rollups.daily_series(days=2, username="frank")
+        self.assertEqual([d["stories"] for d in series], [2, 2])
+
+        old.delete()
+        self.assertConsistent()
+        self.assertEqual(rollups.keyword_totals(), {"tank": 1, "soldier": 1})
+        self.assertEqual(rollups.dashboard_stats()["stories_24h"], 2)
+
+    def test_rebuild_repairs_drift(self):
+        self.add_story("a", hits=["jet"])
+        rollups.DailyStats.objects.update(stories=99)
+        self.assertEqual(rollups.diff_rollups(rollups.compute_rollups(), rollups.current_rollups())["daily"], 1)
+        rollups.rebuild_rollups()
+        self.assertConsistent()
+        self.assertEqual(rollups.totals()["stories"], 1)
+
+    def test_deleting_a_user_drops_its_counts(self):
+        self.add_story("a", hits=["jet"])
+        self.user.delete()  # story post_delete runs after the user rows are gone
+        self.assertConsistent()
+        self.assertEqual(rollups.totals()["stories"], 0)
+
+
+class StoryFeedTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now().replace(microsecond=0)
+        self.alice = InstagramUser.objects.create(username="alice")
+        self.bob = InstagramUser.objects.create(username="bob")
+        self.stories = []
+        for i in range(7):
+            user = self.alice if i % 2 else self.bob
+            story = make_story(
+                user,
+                f"f{i}",
+                # pairs of stories share a timestamp: the id breaks the tie
+                timestamp=self.now - timedelta(hours=i // 2),
+                ai_is_interesting=i % 3 == 0,
+            )
+            if i % 3 == 0:
+                story_hits.replace_story_hits(story, [("tank", 1.0, None), ("tank", 2.0, None)])
+            self.stories.append(story)
+
+    def walk(self, page_size, **filters):
+        ids, cursor, pages = [], None, 0
+        while True:
+            page = list_stories(cursor=cursor, page_size=page_size, **filters)
+            ids += [s.story_id for s in page["results"]]
+            pages += 1
+            cursor = page["next_cursor"]
+            if not cursor:
+                return ids, pages
+
+    def test_cursor_walk_is_complete_and_ordered(self):
+        expected = [s.story_id for s in sorted(self.stories, key=lambda s: (s.timestamp, s.id), reverse=True)]
+        self.assertEqual(self.walk(2), (expected, 4))
+        self.assertEqual(self.walk(7)[0], expected)
+        self.assertEqual(self.walk(2, usernames=["alice"])[0], ["f1", "f3", "f5"])
+        self.assertEqual(self.walk(1, keyword="Tank")[0], ["f0", "f3", "f6"])  # one row per story
+        self.assertEqual(self.walk(3, interesting=False, since=self.now - timedelta(hours=1))[0], ["f1", "f2"])
+
+        with self.assertRaises(InvalidCursor):
+            decode_cursor("not-a-cursor")
+
+    def test_api_is_one_query_per_page(self):
+        url = reverse("instagram_scraper:stories")
+        with self.assertNumQueries(1):
+            body = self.client.get(url, {"page_size": 3}).json()
+        self.assertEqual(len(body["results"]), 3)
+        self.assertLessEqual({"username", "media_url", "thumbnail_url"}, set(body["results"][0]))
+
+        nxt = self.client.get(url, {"page_size": 3, "cursor": body["next_cursor"]}).json()
+        self.assertEqual(nxt["results"][0]["story_id"], "f2")
+        self.assertEqual(self.client.get(url, {"cursor": "%%%"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"since": "yesterday"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"interesting": "maybe"}).status_code, 400)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class StatsApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = InstagramUser.objects.create(username="gina")
+        self.url = reverse("instagram_scraper:stats")
+
+    def add_story(self, story_id):
+        with self.captureOnCommitCallbacks(execute=True):
+            story = make_story(self.user, story_id)
+            rollups.record_new_stories(self.user.id, [story.timestamp])
+
+    def test_polls_are_cached_until_a_write(self):
+        self.add_story("s1")
+        first = self.client.get(self.url)
+        self.assertEqual(first.json()["stories"], 1)
+        self.assertTrue(first.has_header("Last-Modified"))
+        etag = first["ETag"]
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            self.assertEqual(self.client.get(self.url).json()["stories"], 1)  # served from the cache
+
+        self.add_story("s2")
+        fresh = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(fresh.status_code, 200)
+        self.assertEqual(fresh.json()["stories"], 2)
+        self.assertNotEqual(fresh["ETag"], etag)
+
+    def test_only_adding_or_deleting_users_invalidates(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.last_scraped = timezone.now()
+            self.user.save()  # what profile_saver does on every scrape
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            InstagramUser.objects.create(username="hugo")
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_params_are_part_of_the_etag(self):
+        daily = reverse("instagram_scraper:stats_daily")
+        week = self.client.get(daily, {"days": 7})
+        self.assertEqual(len(week.json()["days"]), 7)
+        month = self.client.get(daily, {"days": 30}, HTTP_IF_NONE_MATCH=week["ETag"])
+        self.assertEqual((month.status_code, len(month.json()["days"])), (200, 30))
+        self.assertEqual(self.client.get(reverse("instagram_scraper:stats_keywords")).json(), {"keywords": []})
+
+
+class PendingSweepTests(TestCase):
+    def setUp(self):
+        user = InstagramUser.objects.create(username="hana")
+        self.story = make_story(user, "p1", media_status=InstagramStory.MEDIA_PENDING)
+
+    def status(self):
+        self.story.refresh_from_db()
+        return self.story.media_status
+
+    def test_pending_downloads_are_only_reset_on_request(self):
+        command = scrape_users.Command(stdout=io.StringIO())
+        command.check_pending(reset=False)  # may be another process's download in flight
+        self.assertEqual(self.status(), InstagramStory.MEDIA_PENDING)
+        command.check_pending(reset=True)
+        self.assertEqual(self.status(), InstagramStory.MEDIA_FAILED)
+
+
+class SaveStoriesTests(TestCase):
+    def test_rows_lost_to_a_concurrent_insert_are_not_counted_or_queued(self):
+        user = InstagramUser.objects.create(username="ivan")
+        now = timezone.now()
+        queued = []
+
+        class Pool:
+            def submit(self, fn, story_id, *args, **kwargs):
+                queued.append(story_id)
+
+        def racing_insert(rows):
+            # another scraper inserts r1 between our lookup and our insert
+            make_story(user, "r1", timestamp=now)
+            return real_insert(rows)
+
+        real_insert = story_saver.insert_new_stories
+        index = KnownStoryIndex()
+        records = [StoryRecord(i, f"https://example.com/{i}.jpg", "image", now) for i in ("r1", "r2")]
+        with mock.patch.object(story_saver, "insert_new_stories", side_effect=racing_insert):
+            saved = story_saver.save_stories("ivan", records, download_pool=Pool(), known_index=index)
+
+        self.assertEqual(saved, 1)
+        self.assertEqual(queued, ["r2"])
+        self.assertFalse(index.might_contain("r2"))  # joins the index once its media is in
+        self.assertEqual(rollups.totals()["stories"], 1)  # only r2 was ours to count
+        r2 = InstagramStory.objects.get(story_id="r2")
+        self.assertEqual((r2.media_status, r2.ai_hits, r2.username), (InstagramStory.MEDIA_PENDING, [], user))
+
+
+    def test_query_count_does_not_grow_with_the_number_of_stories(self):
+        InstagramUser.objects.create(username="ivan")
+        now = timezone.now()
+
+        class Pool:
+            def submit(self, fn, story_id, *args, **kwargs):
+                pass
+
+        def save(prefix, count):
+            records = [StoryRecord(f"{prefix}{i}", f"https://example.com/{prefix}{i}.jpg", "image", now) for i in range(count)]
+            return story_saver.save_stories("ivan", records, download_pool=Pool(), known_index=KnownStoryIndex())
+
+        save("warm", 1)  # creates the user's rollup rows
+        with CaptureQueriesContext(connection) as five:
+            self.assertEqual(save("a", 5), 5)
+        with self.assertNumQueries(len(five)):
+            self.assertEqual(save("b", 50), 50)
+
+    def test_failed_downloads_are_retried_with_either_index(self):
+        user = InstagramUser.objects.create(username="ivan")
+        now = timezone.now()
+        make_story(user, "f1", timestamp=now, media_status=InstagramStory.MEDIA_FAILED)
+        make_story(user, "ok1", timestamp=now, media_status=InstagramStory.MEDIA_READY)
+        records = [StoryRecord(i, f"https://example.com/{i}.jpg", "image", now) for i in ("f1", "ok1")]
+
+        for kind in ("set", "bloom"):
+            with self.subTest(kind=kind):
+                InstagramStory.objects.filter(story_id="f1").update(media_status=InstagramStory.MEDIA_FAILED)
+                index = load_known_story_index(kind)
+                queued = []
+
+                class Pool:
+                    def submit(self, fn, story_id, *args, **kwargs):
+                        queued.append(story_id)
+
+                story_saver.save_stories("ivan", records, download_pool=Pool(), known_index=index)
+                self.assertEqual(queued, ["f1"])
+                self.assertEqual(InstagramStory.objects.get(story_id="f1").media_status, InstagramStory.MEDIA_PENDING)
+
+    def test_a_failed_download_stays_out_of_the_index(self):
+        user = InstagramUser.objects.create(username="ivan")
+        make_story(user, "d1", media_status=InstagramStory.MEDIA_PENDING)
+        index = KnownStoryIndex()
+        with mock.patch.object(story_saver, "download_media", return_value=None):
+            ok = story_saver.download_story_media("d1", "https://example.com/d1.jpg", "d1.jpg", known_index=index)
+        self.assertFalse(ok)
+        self.assertFalse(index.might_contain("d1"))  # the next poll looks it up and retries it
+        self.assertEqual(InstagramStory.objects.get(story_id="d1").media_status, InstagramStory.MEDIA_FAILED)
+
+
+class BlobStoreTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=tmp.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def blob(self, name):
+        return MediaBlob.objects.get(file=name)
+
+    def test_shared_blob_is_stored_once_and_collected_after_the_last_release(self):
+        first = store_blob(b"same bytes", "jpg")
+        second = store_blob(io.BytesIO(b"same bytes"), ".JPG")
+        self.assertEqual(first, second)
+        self.assertEqual((self.blob(first).ref_count, self.blob(first).size), (2, 10))
+        path = Path(settings.MEDIA_ROOT) / first
+        self.assertTrue(path.exists())
+
+        release_blob(first)
+        self.assertEqual(collect_garbage(grace=timedelta(0)), (0, 0))  # still referenced once
+        release_blob(first)
+        release_blob(first)  # never goes below zero
+        self.assertEqual(self.blob(first).ref_count, 0)
+
+        self.assertEqual(collect_garbage(), (0, 0))  # inside the grace period
+        self.assertEqual(collect_garbage(grace=timedelta(0), dry_run=True), (1, 10))
+        self.assertTrue(path.exists())
+        self.assertEqual(collect_garbage(grace=timedelta(0)), (1, 10))
+        self.assertFalse(path.exists())
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def test_rereferenced_blob_survives_gc(self):
+        name = store_blob(b"reshared", "mp4")
+        release_blob(name)
+        self.assertEqual(store_blob(b"reshared", "mp4"), name)
+        self.assertEqual(collect_garbage(grace=timedelta(0)), (0, 0))
+        self.assertEqual(self.blob(name).ref_count, 1)
+
+    def test_deleting_stories_releases_their_blob(self):
+        user = InstagramUser.objects.create(username="jane")
+        name = store_blob(b"story media", "jpg")
+        store_blob(b"story media", "jpg")
+        for i in range(2):
+            make_story(user, f"b{i}", media_file=name)
+        InstagramStory.objects.filter(story_id="b0").delete()
+        self.assertEqual(self.blob(name).ref_count, 1)
+        release_blob("stories/not-a-blob.jpg")  # legacy names are ignored
+        user.delete()
+        self.assertEqual(self.blob(name).ref_count, 0)
+
+
+    def test_dedupe_media_migrates_legacy_files_into_shared_blobs(self):
+        user = InstagramUser.objects.create(
+            username="jane", profile_pic=default_storage.save("profile_pics/jane.jpg", ContentFile(b"avatar"))
+        )
+        for i in range(2):
+            make_story(user, f"d{i}", media_file=default_storage.save(f"stories/d{i}.jpg", ContentFile(b"reshared")))
+        orphan = default_storage.save("stories/orphan.jpg", ContentFile(b"nobody"))
+
+        out = io.StringIO()
+        with mock.patch.object(dedupe_media, "BATCH_SIZE", 1):  # one row per keyset batch
+            call_command("dedupe_media", "--delete-orphans", stdout=out)
+
+        names = set(InstagramStory.objects.values_list("media_file", flat=True))
+        self.assertEqual(len(names), 1)
+        shared = names.pop()
+        self.assertEqual(self.blob(shared).ref_count, 2)
+        user.refresh_from_db()
+        self.assertEqual(self.blob(user.profile_pic.name).ref_count, 1)
+        for legacy in ("stories/d0.jpg", "stories/d1.jpg", "profile_pics/jane.jpg", orphan):
+            self.assertFalse(default_storage.exists(legacy))
+        self.assertIn("Migrated 3 files", out.getvalue())
+        self.assertIn("Deleted 1 orphan files", out.getvalue())
+
+
+class DownloadPoolTests(SimpleTestCase):
+    def test_submit_blocks_when_the_queue_is_full(self):
+        pool = DownloadPool(workers=1, max_pending=1)
+        self.addCleanup(pool.shutdown)
+        release = threading.Event()
+        pool.submit(lambda rate_limiter: release.wait(5))
+
+        second_queued = threading.Event()
+        threading.Thread(target=lambda: (pool.submit(lambda rate_limiter: True), second_queued.set())).start()
+        self.assertFalse(second_queued.wait(0.1))  # backpressure: the one slot is taken
+        release.set()
+        self.assertTrue(second_queued.wait(5))
+
+    def test_stats_and_rate_limiter(self):
+        pool = DownloadPool(workers=2, bytes_per_second=1024)
+        seen = []
+
+        def job(ok, rate_limiter):
+            seen.append(rate_limiter)
+            if ok is None:
+                raise RuntimeError("network down")
+            return ok
+
+        for ok in (True, False, None):
+            pool.submit(job, ok)
+        pool.shutdown(wait=True)
+        self.assertEqual(pool.stats(), {"submitted": 3, "completed": 1, "failed": 2})
+        self.assertTrue(all(r is pool.rate_limiter for r in seen))
+
+
+class KnownStoryIndexTests(TestCase):
+    def test_bloom_has_no_false_negatives_and_a_bounded_fp_rate(self):
+        index = BloomStoryIndex(capacity=5000, fp_rate=0.01)
+        members = [f"{3_000_000_000_000_000_000 + i}" for i in range(5000)]
+        index.add_many(members)
+        self.assertTrue(all(index.might_contain(i) for i in members))
+        false_positives = sum(index.might_contain(f"other-{i}") for i in range(20000))
+        self.assertLess(false_positives / 20000, 0.03)
+
+    def test_load_skips_failed_downloads(self):
+        user = InstagramUser.objects.create(username="kim")
+        for story_id, status in (("k1", InstagramStory.MEDIA_READY), ("k2", InstagramStory.MEDIA_FAILED)):
+            make_story(user, story_id, media_status=status)
+        for kind in ("set", "bloom"):
+            with self.subTest(kind=kind):
+                index = load_known_story_index(kind)
+                self.assertTrue(index.might_contain("k1"))
+                self.assertFalse(index.might_contain("k2"))  # failed ones must reach save_stories again
+
+
+class EventLogTests(SimpleTestCase):
+    def test_rate_limit_keeps_warnings_and_jsonl_gets_everything(self):
+        buffer = io.StringIO()
+        out = OutputWrapper(buffer)  # what BaseCommand.stdout is: adds the newlines
+        with tempfile.TemporaryDirectory() as tmp:
+            jsonl = Path(tmp) / "events.jsonl"
+            with EventLog(out, jsonl_path=jsonl, summary_every=0, max_lines_per_second=2, total=5) as events:
+                events.attach_logging()
+                for i in range(5):
+                    events.emit("user", user=f"u{i}", outcome="ok", duration_s=0.5, msg=f"u{i} done")
+                events.emit("retry", level="warning", msg="u1 -> will retry")
+                logging.getLogger("instagram_scraper.test").warning("download failed")
+            rows = [json.loads(line) for line in jsonl.read_text(encoding="utf-8").splitlines()]
+
+        self.assertEqual([r["event"] for r in rows], ["user"] * 5 + ["retry", "log"])
+        lines = buffer.getvalue().splitlines()
+        self.assertEqual(sum("[USER]" in line for line in lines), 2)  # 3 info lines dropped this second
+        self.assertTrue(any("will retry" in line for line in lines))
+        self.assertTrue(any("download failed" in line for line in lines))
+        self.assertIn("[SUMMARY] 5/5 users {'ok': 5} retries=1", lines[-1])
+        self.assertIn("3 lines suppressed", lines[-1])
+
+
+class MetricsTests(SimpleTestCase):
+    def metric(self, cls, *args, **kwargs):
+        metric = cls(*args, **kwargs)
+        self.addCleanup(metrics._REGISTRY.remove, metric)
+        return metric
+
+    def test_counter_and_histogram_render_as_prometheus_text(self):
+        responses = self.metric(metrics.Counter, "test_responses_total", "Responses.", ["status"])
+        responses.inc(status=200)
+        responses.inc(2, status=429)
+        responses.inc(status=200)
+        latency = self.metric(metrics.Histogram, "test_seconds", "Latency.", buckets=(0.1, 1))
+        for value in (0.05, 0.5, 0.5, 3):
+            latency.observe(value)
+
+        self.assertEqual(responses.render(), [
+            "# HELP test_responses_total Responses.",
+            "# TYPE test_responses_total counter",
+            'test_responses_total{status="200"} 2',
+            'test_responses_total{status="429"} 2',
+        ])
+        # buckets are cumulative; +Inf is the count
+        self.assertEqual(latency.render()[2:], [
+            'test_seconds_bucket{le="0.1"} 1',
+            'test_seconds_bucket{le="1.0"} 3',
+            'test_seconds_bucket{le="+Inf"} 4',
+            "test_seconds_sum 4.05",
+            "test_seconds_count 4",
+        ])
+
+    def test_view_serves_the_metrics_file_or_the_own_registry(self):
+        gauge = self.metric(metrics.Gauge, "test_queue_depth", "Queue depth.", callback=lambda: 7)
+        with override_settings(SCRAPER_METRICS_FILE=""):
+            response = self.client.get(reverse("instagram_scraper:metrics"))
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+        self.assertIn("test_queue_depth 7", response.content.decode())
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "scraper.prom"
+            metrics.write_metrics_file(str(path))
+            gauge.callback = lambda: 9  # the view must not re-render this process's registry
+            with override_settings(SCRAPER_METRICS_FILE=str(path)):
+                body = self.client.get(reverse("instagram_scraper:metrics")).content.decode()
+        self.assertIn("test_queue_depth 7", body)
+        self.assertFalse(Path(f"{path}.tmp").exists())
+
+
+class CheckpointTests(TestCase):
+    def test_resume_retries_failed_users_and_follows_the_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = str(Path(tmp) / "users.txt")
+            run, pending, _, resumed = checkpoints.start_or_resume_run(path, ["a", "b", "c", "d"])
+            self.assertEqual((pending, resumed), (["a", "b", "c", "d"], False))
+            checkpoints.record_checkpoint(run, "a", "ok", 1)
+            checkpoints.record_checkpoint(run, "b", "failed", 3)
+            checkpoints.record_attempt(run, "c", 2)  # killed while c was being retried
+
+            # "e" was appended to the file before the restart
+            again, pending, attempts, resumed = checkpoints.start_or_resume_run(path, ["a", "b", "c", "d", "e"])
+            self.assertEqual((again, resumed), (run, True))
+            self.assertEqual(pending, ["b", "c", "d", "e"])
+            self.assertEqual(attempts, {"b": 3, "c": 2, "d": 0, "e": 0})
+            self.assertEqual(run.checkpoints.count(), 5)
+
+            checkpoints.finish_run(run)
+            fresh, pending, _, resumed = checkpoints.start_or_resume_run(path, ["a", "b"])
+            self.assertNotEqual(fresh, run)
+            self.assertEqual((pending, resumed), (["a", "b"], False))
+
+
+class ProfilePicTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.media_root = Path(tmp.name)
+        settings_override = override_settings(MEDIA_ROOT=tmp.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        patcher = mock.patch.object(profile_saver, "fetch_media")
+        self.fetch = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def url(self, path):
+        # the proxied CDN URL: the signature changes on every request, the media path doesn't
+        return f"https://proxy.example.com/img?media=https%3A%2F%2Fcdn.example.com%2F{path}&sig={time.time()}"
+
+    def serve(self, data=None, etag="", not_modified=False):
+        self.fetch.return_value = MediaFetch(None if data is None else ContentFile(data), etag, "", not_modified)
+
+    def save(self, url):
+        before = profile_saver.profile_pic_stats()
+        user = profile_saver.save_profile("lena", {"status": "public", "profile_pic_url": url})
+        after = profile_saver.profile_pic_stats()
+        outcomes = {k: v - before.get(k, 0) for k, v in after.items() if v != before.get(k, 0)}
+        return user, outcomes
+
+    def test_unchanged_url_not_modified_same_content_and_replaced(self):
+        self.serve(b"avatar-1", etag='"e1"')
+        user, outcomes = self.save(self.url("a.jpg"))
+        self.assertEqual(outcomes, {"replaced": 1})
+        first = user.profile_pic.name
+        self.assertEqual(MediaBlob.objects.get(file=first).ref_count, 1)
+
+        # same picture behind a freshly signed URL: no request
+        self.fetch.reset_mock()
+        user, outcomes = self.save(self.url("a.jpg"))
+        self.assertEqual(outcomes, {"unchanged_url": 1})
+        self.fetch.assert_not_called()
+
+        # new URL, the server says 304 for our validators
+        self.serve(etag='"e1"', not_modified=True)
+        user, outcomes = self.save(self.url("b.jpg"))
+        self.assertEqual(outcomes, {"not_modified": 1})
+        self.assertEqual(self.fetch.call_args.kwargs["etag"], '"e1"')
+        self.assertEqual(user.profile_pic_source, "cdn.example.com/b.jpg")
+
+        # new URL, same bytes
+        self.serve(b"avatar-1", etag='"e2"')
+        user, outcomes = self.save(self.url("c.jpg"))
+        self.assertEqual(outcomes, {"same_content": 1})
+        self.assertEqual(user.profile_pic.name, first)
+
+        # new picture: the old blob loses our reference
+        self.serve(b"avatar-2", etag='"e3"')
+        user, outcomes = self.save(self.url("d.jpg"))
+        self.assertEqual(outcomes, {"replaced": 1})
+        self.assertNotEqual(user.profile_pic.name, first)
+        self.assertEqual(MediaBlob.objects.get(file=first).ref_count, 0)
+
+    def test_replacing_a_legacy_file_deletes_it(self):
+        legacy = default_storage.save("profile_pics/lena_profile.jpg", ContentFile(b"old avatar"))
+        InstagramUser.objects.create(username="lena", profile_pic=legacy)
+        self.serve(b"avatar-1")
+        user, outcomes = self.save(self.url("a.jpg"))
+        self.assertEqual(outcomes, {"replaced": 1})
+        self.assertFalse((self.media_root / legacy).exists())
+        self.assertTrue((self.media_root / user.profile_pic.name).exists())
+
+    def test_failed_fetch_keeps_the_current_picture(self):
+        self.fetch.return_value = None
+        user, outcomes = self.save(self.url("a.jpg"))
+        self.assertEqual(outcomes, {"failed": 1})
+        self.assertFalse(user.profile_pic)
@@ -0,0 +1,200 @@
+"""
+Lightweight span tracing, exported as Chrome trace JSON (open in ui.perfetto.dev or chrome://tracing).
+
+    with tracing.trace("scrape_instagram", username=u):   # root: sampling decision
+        with tracing.span("ScraperClient.get", url=url):  # no-op unless the root is traced
+            ...
+
+The current trace lives in a ContextVar, so work handed to DownloadPool threads
+(which copy the submitting context) lands in the same trace. Each kept trace is
+shown as its own process row named after the root span.
+"""
+import contextvars
+from collections import deque
+import itertools
+import json
+import os
+import random
+import threading
+import time
+
+_CURRENT = contextvars.ContextVar("scraper_trace", default=None)
+_PID = os.getpid()
+
+
+def _now_us() -> float:
+    return time.perf_counter_ns() / 1000
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Trace:
+    def __init__(self, trace_id: int, name: str):
+        self.id = trace_id
+        self.name = name
+        self.events = []
+        self.threads = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, start_us: float, end_us: float, args: dict) -> None:
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "ph": "X",
+            "ts": start_us,
+            "dur": end_us - start_us,
+            "pid": self.id,
+            "tid": thread.ident,
+            "args": args,
+        }
+        with self._lock:
+            self.events.append(event)
+            self.threads.setdefault(thread.ident, thread.name)
+
+    def chrome_events(self) -> list[dict]:
+        with self._lock:
+            events = list(self.events)
+            threads = dict(self.threads)
+        meta = [{"name": "process_name", "ph": "M", "pid": self.id, "args": {"name": self.name}}]
+        meta += [
+            {"name": "thread_name", "ph": "M", "pid": self.id, "tid": tid, "args": {"name": tname}}
+            for tid, tname in threads.items()
+        ]
+        return meta + events
+
+
+class Span:
+    def __init__(self, trace: Trace, name: str, args: dict):
+        self.trace = trace
+        self.name = name
+        self.args = args
+        self.start = 0.0
+
+    def set(self, **args):
+        self.args.update(args)
+
+    def __enter__(self):
+        self.start = _now_us()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args["error"] = f"{exc_type.__name__}: {exc}"
+        self.trace.add(self.name, self.start, _now_us(), self.args)
+        return False
+
+
+class _RootSpan(Span):
+    """Opens a trace; on exit keeps it if it was sampled or turned out slow."""
+
+    def __init__(self, tracer, trace: Trace, name: str, args: dict, sampled: bool):
+        super().__init__(trace, name, args)
+        self.tracer = tracer
+        self.sampled = sampled
+        self._token = None
+
+    def __enter__(self):
+        self._token = _CURRENT.set(self.trace)
+        return super().__enter__()
+
+    def __exit__(self, exc_type, exc, tb):
+        super().__exit__(exc_type, exc, tb)
+        _CURRENT.reset(self._token)
+        seconds = (_now_us() - self.start) / 1e6
+        self.tracer.finish(self.trace, keep=self.sampled or self.tracer.is_slow(seconds))
+        return False
+
+
+class Tracer:
+    """
+    sample_rate: share of root spans traced (0..1)
+    slow_seconds: also keep any trace whose root took at least this long (tail sampling)
+    max_traces: kept traces held in memory for `write()`; the oldest are evicted first
+    """
+
+    def __init__(self, sample_rate: float = 0.0, slow_seconds: float | None = None, max_traces: int = 1000):
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self.max_traces = max_traces
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._kept = deque(maxlen=max_traces)
+        self.dropped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 or self.slow_seconds is not None
+
+    def is_slow(self, seconds: float) -> bool:
+        return self.slow_seconds is not None and seconds >= self.slow_seconds
+
+    def root(self, name: str, args: dict):
+        if not self.enabled or _CURRENT.get() is not None:
+            return span(name, **args)
+        sampled = random.random() < self.sample_rate
+        if not sampled and self.slow_seconds is None:
+            return _NOOP
+        label = f"{name} {' '.join(str(v) for v in args.values())}".strip()
+        return _RootSpan(self, Trace(next(self._ids), label), name, args, sampled)
+
+    def finish(self, trace: Trace, keep: bool) -> None:
+        if not keep:
+            return
+        with self._lock:
+            if len(self._kept) == self.max_traces:
+                self.dropped += 1
+            self._kept.append(trace)
+
+    def trace_count(self) -> int:
+        with self._lock:
+            return len(self._kept)
+
+    def write(self, path: str) -> int:
+        """Write every kept trace (including spans that finished after their root) to `path`."""
+        with self._lock:
+            traces = list(self._kept)
+        events = [e for t in traces for e in t.chrome_events()]
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"pid": _PID}}, f, default=str)
+        os.replace(tmp, path)
+        return len(traces)
+
+
+_TRACER = Tracer()
+
+
+def configure(sample_rate: float = 0.0, slow_seconds: float | None = None, max_traces: int = 1000) -> Tracer:
+    """Replace the process-wide tracer (called by the commands / analysis service at startup)."""
+    global _TRACER
+    _TRACER = Tracer(sample_rate=sample_rate, slow_seconds=slow_seconds, max_traces=max_traces)
+    return _TRACER
+
+
+def get_tracer() -> Tracer:
+    return _TRACER
+
+
+def trace(name: str, **args):
+    """Root span: starts a (possibly sampled-out) trace, or a child span if one is active."""
+    return _TRACER.root(name, args)
+
+
+def span(name: str, **args):
+    """Child span of the current trace; a shared no-op when nothing is being traced."""
+    current = _CURRENT.get()
+    if current is None:
+        return _NOOP
+    return Span(current, name, args)
@@ -0,0 +1,13 @@
+from django.urls import path
+from . import views
+
+app_name = "instagram_scraper"
+
+urlpatterns = [
+    path("metrics/", views.metrics, name="metrics"),
+    path("api/stories/", views.stories, name="stories"),
+    path("api/search/", views.search_stories, name="search_stories"),
+    path("api/stats/", views.stats, name="stats"),
+    path("api/stats/daily/", views.stats_daily, name="stats_daily"),
+    path("api/stats/keywords/", views.stats_keywords, name="stats_keywords"),
+]
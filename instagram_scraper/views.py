@@ -1,3 +1,208 @@
-from django.shortcuts import render
+from pathlib import Path
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from datetime import datetime, time, timedelta
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET
+from instagram_scraper.metrics import render_prometheus
+from instagram_scraper.services import rollups
+from instagram_scraper.services.caption_search import search_captions
+from instagram_scraper.services.stats_cache import cached_stats, stats_etag, stats_last_modified
+from instagram_scraper.services.story_feed import DEFAULT_PAGE_SIZE, InvalidCursor, list_stories
 
-# Create your views here.
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@require_GET
+def metrics(request):
+    """
+    Prometheus scrape endpoint.
+    Scraping runs in management commands, not in the web process, so serve the file
+    they write (--metrics-file = settings.SCRAPER_METRICS_FILE) when there is one.
+    """
+    path = getattr(settings, "SCRAPER_METRICS_FILE", "")
+    if path and Path(path).exists():
+        body = Path(path).read_text(encoding="utf-8")
+    else:
+        body = render_prometheus()
+    return HttpResponse(body, content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+def _int_param(request, name, default):
+    try:
+        return int(request.GET.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _datetime_param(request, name, end_of_day=False):
+    """
+    ISO datetime or date -> aware datetime; None if absent, ValueError if malformed.
+    A date is local midnight, or the next midnight with `end_of_day` (exclusive upper bounds).
+    """
+    value = request.GET.get(name, "").strip()
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"{name} must be an ISO date or datetime")
+        parsed = datetime.combine(day + timedelta(days=1) if end_of_day else day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _bool_param(request, name):
+    value = request.GET.get(name, "").strip().lower()
+    if not value:
+        return None
+    if value in ("1", "true", "yes"):
+        return True
+    if value in ("0", "false", "no"):
+        return False
+    raise ValueError(f"{name} must be true or false")
+
+
+def story_json(story) -> dict:
+    return {
+        "id": story.id,
+        "story_id": story.story_id,
+        "username": story.username.username,
+        "timestamp": story.timestamp.isoformat(),
+        "media_type": story.media_type,
+        "media_url": story.media_file.url if story.media_file else None,
+        "thumbnail_url": story.thumbnail.url if story.thumbnail else None,
+        "ai_caption": story.ai_caption,
+        "ai_hits": story.ai_hits,
+        "ai_is_interesting": story.ai_is_interesting,
+    }
+
+
+@require_GET
+def search_stories(request):
+    """
+    GET ?q=<words or "a phrase">&page=1&page_size=20[&username=a&username=b][&since=<ISO datetime>]
+    Caption full-text search, best matches first.
+    """
+    query = request.GET.get("q", "").strip()
+    if not query:
+        return JsonResponse({"error": "missing q"}, status=400)
+
+    try:
+        since = _datetime_param(request, "since")
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    found = search_captions(
+        query,
+        page=_int_param(request, "page", 1),
+        page_size=_int_param(request, "page_size", 20),
+        usernames=request.GET.getlist("username") or None,
+        since=since,
+    )
+    return JsonResponse({
+        "query": query,
+        "page": found["page"],
+        "page_size": found["page_size"],
+        "has_next": found["has_next"],
+        "results": [
+            {**story_json(r["story"]), "rank": r["rank"], "snippet": r["snippet"]}
+            for r in found["results"]
+        ],
+    })
+
+
+@require_GET
+def stories(request):
+    """
+    GET ?[username=a&username=b][&since=][&until=][&interesting=true|false][&keyword=tank]
+        [&page_size=50][&cursor=<next_cursor of the previous page>]
+    Stories newest first; follow next_cursor until it is null.
+    """
+    try:
+        filters = {
+            "since": _datetime_param(request, "since"),
+            "until": _datetime_param(request, "until", end_of_day=True),
+            "interesting": _bool_param(request, "interesting"),
+        }
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    try:
+        page = list_stories(
+            cursor=request.GET.get("cursor") or None,
+            page_size=_int_param(request, "page_size", DEFAULT_PAGE_SIZE),
+            usernames=request.GET.getlist("username") or None,
+            keyword=request.GET.get("keyword", "").strip() or None,
+            **filters,
+        )
+    except InvalidCursor as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    return JsonResponse({
+        "page_size": page["page_size"],
+        "next_cursor": page["next_cursor"],
+        "results": [story_json(s) for s in page["results"]],
+    })
+
+
+# =========================
+# Stats (rollup tables, cached; see services/stats_cache.py)
+# =========================
+
+def _stats_params(request) -> dict:
+    return {k: request.GET.getlist(k) for k in sorted(request.GET)}
+
+
+def _days_param(request, default):
+    return max(1, min(_int_param(request, "days", default), 366))
+
+
+# ETag / Last-Modified come from the cached stats version: an unchanged poll is a 304
+# without touching the database
+stats_conditional = condition(
+    etag_func=lambda request, *args, **kwargs: stats_etag(request.path, _stats_params(request)),
+    last_modified_func=lambda request, *args, **kwargs: stats_last_modified(),
+)
+
+
+@require_GET
+@cache_control(private=True, no_cache=True)
+@stats_conditional
+def stats(request):
+    """GET [?days=7] -> dashboard counters + the most interesting users of the last `days` days."""
+    days = _days_param(request, 7)
+    body = cached_stats(request.path, _stats_params(request), lambda: {
+        **rollups.dashboard_stats(),
+        "top_users": rollups.top_users(days=days),
+    })
+    return JsonResponse(body)
+
+
+@require_GET
+@cache_control(private=True, no_cache=True)
+@stats_conditional
+def stats_daily(request):
+    """GET [?days=30][&username=a] -> per-day counters, oldest first."""
+    days = _days_param(request, 30)
+    username = request.GET.get("username") or None
+    body = cached_stats(request.path, _stats_params(request), lambda: {
+        "days": rollups.daily_series(days=days, username=username),
+    })
+    return JsonResponse(body)
+
+
+@require_GET
+@cache_control(private=True, no_cache=True)
+@stats_conditional
+def stats_keywords(request):
+    """GET [?days=30] -> stories per keyword (all time without days), most hit first."""
+    days = _days_param(request, 30) if request.GET.get("days") else None
+    body = cached_stats(request.path, _stats_params(request), lambda: {
+        "keywords": [{"keyword": k, "stories": n} for k, n in rollups.keyword_totals(days=days).items()],
+    })
+    return JsonResponse(body)